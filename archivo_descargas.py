@@ -0,0 +1,27 @@
+import threading
+
+class ArchivoDescargas:
+    """Índice en memoria de videos ya descargados, por clave canónica
+
+    Se carga una vez desde el historial y luego se consulta en O(1) antes de
+    tocar la red, de modo que un video repetido en otro lote se omite sin
+    extraerlo ni transcodificarlo otra vez.
+    """
+    def __init__(self, claves=()):
+        self._claves = set(claves)
+        self._bloqueo = threading.Lock()
+
+    @classmethod
+    def desde_historial(cls, historial):
+        """Crea el índice con todas las claves registradas en el historial"""
+        return cls(historial.claves_video())
+
+    def contiene(self, clave):
+        return clave in self._claves
+
+    def agregar(self, *claves):
+        with self._bloqueo:
+            self._claves.update(c for c in claves if c)
+
+    def __len__(self):
+        return len(self._claves)
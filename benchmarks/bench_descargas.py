@@ -0,0 +1,209 @@
+"""Benchmark del pipeline de descarga, sin conexión a internet.
+
+Genera archivos de audio sintéticos, los sirve con un servidor HTTP local y
+los descarga con el pipeline real (descargador.ejecutar_lote), que los
+resuelve con el extractor genérico de yt-dlp. Recorre combinaciones de
+descargas paralelas y calidad y guarda los resultados en JSON para poder
+comparar entre versiones.
+
+Uso:
+    python benchmarks/bench_descargas.py --archivos 20 --mb 5 --paralelas 1,4,8 --calidades 128,192
+    python benchmarks/bench_descargas.py --salida nuevo.json --comparar anterior.json
+
+--formato wav ejercita la transcodificación (requiere ffmpeg); --formato mp3
+genera MP3 silenciosos que pasan sin convertir y miden solo la red.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import descargador  # noqa: E402
+from servidor_local import ServidorLocal  # noqa: E402
+
+# Trama MPEG-1 Layer III, 128 kbps, 44.1 kHz, sin relleno: 417 bytes
+CABECERA_MP3 = bytes([0xFF, 0xFB, 0x90, 0x00])
+TAMAÑO_TRAMA_MP3 = 417
+
+def generar_wav(ruta, bytes_objetivo):
+    """WAV estéreo de 16 bits a 44.1 kHz con ruido, de unos bytes_objetivo"""
+    bytes_por_cuadro = 4
+    cuadros = max(1, bytes_objetivo // bytes_por_cuadro)
+    with wave.open(ruta, "wb") as archivo:
+        archivo.setnchannels(2)
+        archivo.setsampwidth(2)
+        archivo.setframerate(44100)
+        restantes = cuadros
+        while restantes:
+            bloque = min(restantes, 1 << 16)
+            archivo.writeframes(os.urandom(bloque * bytes_por_cuadro))
+            restantes -= bloque
+
+def generar_mp3(ruta, bytes_objetivo):
+    """MP3 de silencio válido (tramas vacías), de unos bytes_objetivo"""
+    trama = CABECERA_MP3 + bytes(TAMAÑO_TRAMA_MP3 - len(CABECERA_MP3))
+    with open(ruta, "wb") as archivo:
+        for _ in range(max(1, bytes_objetivo // TAMAÑO_TRAMA_MP3)):
+            archivo.write(trama)
+
+def percentiles(valores):
+    """p50, p90, p99 y máximo de una lista de segundos"""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    def p(q):
+        return round(ordenados[min(len(ordenados) - 1, int(round(q * (len(ordenados) - 1))))], 4)
+    return {"p50": p(0.50), "p90": p(0.90), "p99": p(0.99), "max": round(ordenados[-1], 4),
+            "media": round(statistics.fmean(ordenados), 4)}
+
+def rss_pico_mb():
+    """Pico de memoria residente del proceso y de sus hijos (ffmpeg), en MB
+
+    ru_maxrss es el pico de toda la vida del proceso: solo es el de un
+    escenario si este corre en su propio proceso (escenario_aislado).
+    """
+    # ru_maxrss viene en KB en Linux y en bytes en macOS
+    divisor = 1024 * 1024 if platform.system() == "Darwin" else 1024
+    propio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor
+    hijos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / divisor
+    return {"proceso": round(propio, 1), "hijos": round(hijos, 1)}
+
+def ejecutar_escenario(urls, paralelas, calidad, separar_transcodificacion):
+    """Descarga urls en un directorio de trabajo nuevo y devuelve las métricas"""
+    directorio_trabajo = tempfile.mkdtemp(prefix="bench_descargas_")
+    directorio_salida = os.path.join(directorio_trabajo, "salida")
+    anterior = os.getcwd()
+    # ARCHIVO_CONFIG y las cachés son relativos: cada escenario empieza en frío
+    os.chdir(directorio_trabajo)
+    try:
+        config = descargador.cargar_configuracion()
+        config.update({
+            "descargas_paralelas": paralelas,
+            "calidad_audio": calidad,
+            "omitir_descargados": False,
+            "expandir_listas": False,
+            "transcodificacion_separada": separar_transcodificacion,
+        })
+        trabajos = []
+
+        def al_cambiar(trabajo, pool):
+            if trabajo.estado in ("completado", "error") and trabajo not in trabajos:
+                trabajos.append(trabajo)
+
+        inicio = time.perf_counter()
+        resumen = descargador.ejecutar_lote(urls, directorio_salida, config, calidad, al_cambiar=al_cambiar)
+        segundos = time.perf_counter() - inicio
+    finally:
+        os.chdir(anterior)
+        shutil.rmtree(directorio_trabajo, ignore_errors=True)
+
+    completados = [t for t in trabajos if t.estado == "completado"]
+    bytes_descargados = resumen["etapas"]["descarga"]["bytes"]
+    etapas = {
+        nombre: percentiles([t.tiempos[nombre] for t in completados if nombre in t.tiempos])
+        for nombre in ("extraccion", "descarga", "transcodificacion")
+    }
+    etapas["total"] = percentiles([t.duracion for t in completados])
+    return {
+        "paralelas": paralelas,
+        "calidad": calidad,
+        "transcodificacion_separada": separar_transcodificacion,
+        "archivos": len(completados),
+        "errores": [error for _, error in resumen["errores"]],
+        "segundos": round(segundos, 3),
+        "archivos_por_segundo": round(len(completados) / segundos, 3),
+        "mb_por_segundo": round(bytes_descargados / segundos / 1e6, 3),
+        "latencias": etapas,
+        "rss_pico_mb": rss_pico_mb(),
+    }
+
+def escenario_aislado(*argumentos):
+    """ejecutar_escenario en un proceso nuevo, para que el pico de memoria sea solo suyo"""
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as ejecutor:
+        return ejecutor.submit(ejecutar_escenario, *argumentos).result()
+
+def comparar(resultados, ruta_anterior):
+    """Imprime la variación de archivos/s frente a un JSON anterior"""
+    with open(ruta_anterior, encoding="utf-8") as archivo:
+        anteriores = json.load(archivo)["escenarios"]
+    indice = {(e["paralelas"], e["calidad"], e["transcodificacion_separada"]): e for e in anteriores}
+    for escenario in resultados:
+        clave = (escenario["paralelas"], escenario["calidad"], escenario["transcodificacion_separada"])
+        previo = indice.get(clave)
+        if not previo or not previo["archivos_por_segundo"]:
+            continue
+        cambio = (escenario["archivos_por_segundo"] / previo["archivos_por_segundo"] - 1) * 100
+        print(f"  paralelas={clave[0]:>2} calidad={clave[1]}: {cambio:+.1f}% archivos/s")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--archivos", type=int, default=20, help="número de archivos sintéticos")
+    parser.add_argument("--mb", type=float, default=5.0, help="tamaño de cada archivo en MB")
+    parser.add_argument("--formato", choices=("wav", "mp3"), default="wav")
+    parser.add_argument("--paralelas", default="1,2,4,8", help="lista de valores a probar")
+    parser.add_argument("--calidades", default="192", help="lista de calidades MP3 a probar")
+    parser.add_argument("--en-linea", action="store_true",
+                        help="transcodificar dentro del hilo de descarga (como antes de la etapa separada)")
+    parser.add_argument("--limite-conexion-kbps", type=int, default=0,
+                        help="frenar cada conexión del servidor local a esta tasa")
+    parser.add_argument("--salida", default="resultados_bench.json")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior")
+    argumentos = parser.parse_args(argv)
+
+    if argumentos.formato == "wav" and not shutil.which("ffmpeg"):
+        parser.error("--formato wav necesita ffmpeg en el PATH (o usa --formato mp3)")
+
+    directorio_medios = tempfile.mkdtemp(prefix="bench_medios_")
+    generar = generar_wav if argumentos.formato == "wav" else generar_mp3
+    for i in range(argumentos.archivos):
+        generar(os.path.join(directorio_medios, f"pista_{i:03d}.{argumentos.formato}"),
+                int(argumentos.mb * 1024 * 1024))
+
+    resultados = []
+    try:
+        with ServidorLocal(directorio_medios, argumentos.limite_conexion_kbps * 1024) as servidor:
+            urls = [servidor.url(nombre) for nombre in sorted(os.listdir(directorio_medios))]
+            for calidad in argumentos.calidades.split(","):
+                for paralelas in (int(p) for p in argumentos.paralelas.split(",")):
+                    escenario = escenario_aislado(urls, paralelas, calidad.strip(), not argumentos.en_linea)
+                    resultados.append(escenario)
+                    total = escenario["latencias"]["total"] or {}
+                    print(
+                        f"paralelas={paralelas:>2} calidad={calidad}: "
+                        f"{escenario['archivos_por_segundo']:.2f} archivos/s, "
+                        f"{escenario['mb_por_segundo']:.1f} MB/s, "
+                        f"p90 total {total.get('p90', 0):.2f}s, "
+                        f"errores {len(escenario['errores'])}"
+                    )
+    finally:
+        shutil.rmtree(directorio_medios, ignore_errors=True)
+
+    informe = {
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "maquina": {"sistema": platform.platform(), "python": platform.python_version(),
+                    "nucleos": os.cpu_count()},
+        "parametros": vars(argumentos),
+        "escenarios": resultados,
+    }
+    with open(argumentos.salida, "w", encoding="utf-8") as archivo:
+        json.dump(informe, archivo, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {argumentos.salida}")
+
+    if argumentos.comparar:
+        print(f"Comparación con {argumentos.comparar}:")
+        comparar(resultados, argumentos.comparar)
+
+if __name__ == "__main__":
+    main()
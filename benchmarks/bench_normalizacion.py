@@ -0,0 +1,95 @@
+"""Benchmark de la medición de sonoridad con pistas largas.
+
+Por defecto mide un flujo PCM sintético de la duración pedida (un tono con
+tramos de silencio) que se genera a medida que se lee, así que no necesita
+ffmpeg ni ocupa disco: mide solo el coste de normalizacion.medir_flujo y
+comprueba que la memoria no crece con la duración. Con --archivo mide una
+pista real de principio a fin (decodificación con ffmpeg incluida).
+
+Uso:
+    python benchmarks/bench_normalizacion.py --horas 1,2,4
+    python benchmarks/bench_normalizacion.py --archivo concierto.mp3
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import normalizacion  # noqa: E402
+from bench_descargas import rss_pico_mb  # noqa: E402
+
+class FlujoSintetico(io.RawIOBase):
+    """PCM float32 de 4 canales (original + ponderado) generado bajo demanda
+
+    Alterna 50 s de tono de 997 Hz a -20 dBFS y 10 s de silencio, de modo
+    que la puerta relativa tiene algo que descartar.
+    """
+    def __init__(self, segundos, frecuencia=normalizacion.FRECUENCIA):
+        import numpy as np
+
+        self.np = np
+        self.frecuencia = frecuencia
+        self.total = int(segundos * frecuencia)
+        self.posicion = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        np = self.np
+        muestras = min(len(buffer) // 16, self.total - self.posicion)
+        if muestras <= 0:
+            return 0
+        indices = np.arange(self.posicion, self.posicion + muestras)
+        tono = 0.1 * np.sin(2 * np.pi * 997 * indices / self.frecuencia)
+        tono[(indices // self.frecuencia) % 60 >= 50] = 0.0
+        bloque = np.repeat(tono.astype("<f4")[:, None], 4, axis=1)
+        buffer[:muestras * 16] = bloque.tobytes()
+        self.posicion += muestras
+        return muestras * 16
+
+def medir(funcion, segundos_audio):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    transcurrido = time.perf_counter() - inicio
+    return {
+        "segundos_audio": round(segundos_audio or resultado["segundos"], 1),
+        "segundos": round(transcurrido, 2),
+        "veces_tiempo_real": round((segundos_audio or resultado["segundos"]) / transcurrido, 1),
+        "lufs": round(resultado["lufs"], 2) if resultado["lufs"] is not None else None,
+        "pico_db": round(resultado["pico_db"], 2),
+        "rss_mb": rss_pico_mb(),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--horas", default="1,2", help="duraciones sintéticas a probar")
+    parser.add_argument("--archivo", help="pista real a medir con ffmpeg en lugar del flujo sintético")
+    parser.add_argument("--salida", default="resultados_bench_normalizacion.json")
+    argumentos = parser.parse_args(argv)
+
+    resultados = []
+    if argumentos.archivo:
+        resultados.append(medir(lambda: normalizacion.analizar_volumen(argumentos.archivo), None))
+    else:
+        for horas in (float(h) for h in argumentos.horas.split(",")):
+            segundos = horas * 3600
+            resultados.append(medir(
+                lambda: normalizacion.medir_flujo(io.BufferedReader(FlujoSintetico(segundos), 1 << 20)), segundos
+            ))
+
+    for resultado in resultados:
+        print(f"{resultado['segundos_audio'] / 3600:.2f} h de audio en {resultado['segundos']} s "
+              f"({resultado['veces_tiempo_real']}x tiempo real) · {resultado['lufs']} LUFS · "
+              f"RSS pico {resultado['rss_mb']['proceso']} MB")
+    with open(argumentos.salida, "w", encoding="utf-8") as archivo:
+        json.dump(resultados, archivo, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Benchmark de la descarga segmentada por rangos HTTP, sin conexión a internet.
+
+Sirve un archivo grande con el servidor local limitando cada conexión (como
+los servidores reales) y lo descarga con el pipeline real
+(descargador.ejecutar_lote) con 1 segmento y con los indicados. Después
+corta una descarga segmentada a mitad, la reanuda y comprueba que el
+archivo final es idéntico al original.
+
+Uso:
+    python benchmarks/bench_segmentada.py --mb 60 --segmentos 1,4,8 --limite-conexion-kbps 2000
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import descargador  # noqa: E402
+from bench_descargas import generar_mp3  # noqa: E402
+from descarga_segmentada import DescargaSegmentada  # noqa: E402
+from servidor_local import ServidorLocal  # noqa: E402
+
+def sha256(ruta):
+    resumen = hashlib.sha256()
+    with open(ruta, "rb") as archivo:
+        for bloque in iter(lambda: archivo.read(1 << 20), b""):
+            resumen.update(bloque)
+    return resumen.hexdigest()
+
+def medir_lote(url, segmentos, umbral_mb):
+    """Descarga url con `segmentos` conexiones en un directorio de trabajo nuevo"""
+    directorio_trabajo = tempfile.mkdtemp(prefix="bench_segmentada_")
+    anterior = os.getcwd()
+    # ARCHIVO_CONFIG y las cachés son relativos: cada escenario empieza en frío
+    os.chdir(directorio_trabajo)
+    try:
+        config = descargador.cargar_configuracion()
+        config.update({
+            "segmentos_por_descarga": segmentos,
+            "umbral_segmentos_mb": umbral_mb,
+            "omitir_descargados": False,
+            "expandir_listas": False,
+        })
+        inicio = time.perf_counter()
+        resumen = descargador.ejecutar_lote([url], os.path.join(directorio_trabajo, "salida"), config)
+        segundos = time.perf_counter() - inicio
+    finally:
+        os.chdir(anterior)
+        shutil.rmtree(directorio_trabajo, ignore_errors=True)
+    if resumen["errores"]:
+        raise RuntimeError(resumen["errores"][0])
+    bytes_descargados = resumen["etapas"]["descarga"]["bytes"]
+    return {"segmentos": segmentos, "segundos": round(segundos, 2),
+            "mb_s": round(bytes_descargados / segundos / 1e6, 2)}
+
+def probar_reanudacion(url, ruta_original, segmentos):
+    """Corta la descarga al llegar a la mitad y la reanuda desde el estado guardado"""
+    destino = tempfile.mkdtemp(prefix="bench_segmentada_")
+    tamaño = os.path.getsize(ruta_original)
+    ruta = os.path.join(destino, "reanudada.mp3")
+
+    def cortar_a_la_mitad(nuevos, descargados):
+        if descargados >= tamaño // 2:
+            raise KeyboardInterrupt("corte simulado")
+
+    try:
+        try:
+            DescargaSegmentada(url, ruta, tamaño, al_avanzar=cortar_a_la_mitad).descargar(segmentos)
+        except KeyboardInterrupt:
+            pass
+        with open(ruta + ".segmentos.json", encoding="utf-8") as archivo:
+            guardado = sum(segmento[2] for segmento in json.load(archivo)["segmentos"])
+        reanudada = DescargaSegmentada(url, ruta, tamaño)
+        reanudada.descargar(segmentos)
+        return {
+            "guardado_al_cortar_mb": round(guardado / 1e6, 1),
+            "identico": sha256(ruta) == sha256(ruta_original),
+        }
+    finally:
+        shutil.rmtree(destino, ignore_errors=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=float, default=60.0, help="tamaño del archivo en MB")
+    parser.add_argument("--segmentos", default="1,4,8", help="lista de valores a probar")
+    parser.add_argument("--limite-conexion-kbps", type=int, default=2000,
+                        help="límite del servidor por conexión (0 = sin límite)")
+    parser.add_argument("--salida", default="resultados_bench_segmentada.json")
+    argumentos = parser.parse_args(argv)
+
+    directorio = tempfile.mkdtemp(prefix="bench_segmentada_origen_")
+    try:
+        ruta_original = os.path.join(directorio, "mezcla.mp3")
+        generar_mp3(ruta_original, int(argumentos.mb * 1e6))
+        with ServidorLocal(directorio, argumentos.limite_conexion_kbps * 1024) as servidor:
+            url = servidor.url("mezcla.mp3")
+            umbral_mb = max(1, int(argumentos.mb / 2))
+            resultados = {
+                "mb": argumentos.mb,
+                "limite_conexion_kbps": argumentos.limite_conexion_kbps,
+                "lotes": [medir_lote(url, int(n), umbral_mb) for n in argumentos.segmentos.split(",")],
+                "reanudacion": probar_reanudacion(url, ruta_original, max(int(n) for n in argumentos.segmentos.split(","))),
+            }
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    for lote in resultados["lotes"]:
+        print(f"{lote['segmentos']} segmentos: {lote['segundos']} s ({lote['mb_s']} MB/s)")
+    reanudacion = resultados["reanudacion"]
+    print(f"Reanudación tras cortar con {reanudacion['guardado_al_cortar_mb']} MB guardados: "
+          f"{'archivo idéntico' if reanudacion['identico'] else 'EL ARCHIVO NO COINCIDE'}")
+    with open(argumentos.salida, "w", encoding="utf-8") as archivo:
+        json.dump(resultados, archivo, indent=2)
+    return 0 if reanudacion["identico"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
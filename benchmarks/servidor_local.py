@@ -0,0 +1,129 @@
+"""Servidor HTTP local que sirve un directorio, con soporte de Range.
+
+Sustituye al servidor de medios en los benchmarks: sirve archivos
+sintéticos por 127.0.0.1, responde peticiones Range con 206 y puede frenar
+cada conexión para imitar el límite por conexión de los servidores reales.
+"""
+import functools
+import os
+import re
+import sys
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+TAMAÑO_BLOQUE = 64 * 1024
+
+class _LectorAcotado:
+    """Archivo abierto del que solo se leen `restantes` bytes"""
+    def __init__(self, archivo, restantes):
+        self.archivo = archivo
+        self.restantes = restantes
+
+    def read(self, cantidad=-1):
+        if self.restantes <= 0:
+            return b""
+        if cantidad < 0 or cantidad > self.restantes:
+            cantidad = self.restantes
+        datos = self.archivo.read(cantidad)
+        self.restantes -= len(datos)
+        return datos
+
+    def close(self):
+        self.archivo.close()
+
+class ManejadorRangos(SimpleHTTPRequestHandler):
+    """SimpleHTTPRequestHandler con Range y límite opcional por conexión"""
+    limite_por_conexion = 0  # bytes por segundo; 0 = sin límite
+
+    def log_message(self, formato, *args):
+        pass
+
+    def end_headers(self):
+        if not getattr(self, "_rango_enviado", False):
+            self.send_header("Accept-Ranges", "bytes")
+        super().end_headers()
+
+    def send_head(self):
+        self._rango_enviado = False
+        rango = self.headers.get("Range")
+        ruta = self.translate_path(self.path)
+        if not rango or not os.path.isfile(ruta):
+            return super().send_head()
+
+        tamaño = os.path.getsize(ruta)
+        coincidencia = re.fullmatch(r"bytes=(\d*)-(\d*)", rango.strip())
+        if not coincidencia or coincidencia.groups() == ("", ""):
+            self.send_error(416, "Range inválido")
+            return None
+        inicio_txt, fin_txt = coincidencia.groups()
+        if inicio_txt:
+            inicio = int(inicio_txt)
+            fin = min(int(fin_txt), tamaño - 1) if fin_txt else tamaño - 1
+        else:
+            inicio = max(0, tamaño - int(fin_txt))
+            fin = tamaño - 1
+        if inicio >= tamaño or inicio > fin:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{tamaño}")
+            self.end_headers()
+            return None
+
+        archivo = open(ruta, "rb")
+        archivo.seek(inicio)
+        self._rango_enviado = True
+        self.send_response(206)
+        self.send_header("Content-Type", self.guess_type(ruta))
+        self.send_header("Content-Range", f"bytes {inicio}-{fin}/{tamaño}")
+        self.send_header("Content-Length", str(fin - inicio + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        return _LectorAcotado(archivo, fin - inicio + 1)
+
+    def copyfile(self, origen, destino):
+        if not self.limite_por_conexion:
+            return super().copyfile(origen, destino)
+        inicio = time.monotonic()
+        enviados = 0
+        while True:
+            bloque = origen.read(TAMAÑO_BLOQUE)
+            if not bloque:
+                break
+            destino.write(bloque)
+            enviados += len(bloque)
+            adelanto = enviados / self.limite_por_conexion - (time.monotonic() - inicio)
+            if adelanto > 0:
+                time.sleep(adelanto)
+
+class _ServidorSilencioso(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, peticion, direccion):
+        # yt-dlp cierra a propósito conexiones a medio leer (sondeos del extractor)
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(peticion, direccion)
+
+class ServidorLocal:
+    """Sirve `directorio` en 127.0.0.1 en un puerto libre mientras dure el with"""
+    def __init__(self, directorio, limite_por_conexion=0):
+        manejador = type("Manejador", (ManejadorRangos,), {"limite_por_conexion": limite_por_conexion})
+        self._servidor = _ServidorSilencioso(
+            ("127.0.0.1", 0), functools.partial(manejador, directory=directorio)
+        )
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+
+    @property
+    def base(self):
+        host, puerto = self._servidor.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def url(self, nombre):
+        return f"{self.base}/{nombre}"
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._servidor.shutdown()
+        self._servidor.server_close()
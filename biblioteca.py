@@ -0,0 +1,305 @@
+import os
+import re
+import sqlite3
+import struct
+import threading
+
+from utilidades_url import clave_canonica
+
+# yt-dlp nombra por defecto los archivos como "Título [id].ext"
+PATRON_ID_EN_NOMBRE = re.compile(r'\[([0-9A-Za-z_-]{11})\]')
+EXTENSIONES_AUDIO = {".mp3", ".m4a", ".opus", ".ogg", ".webm", ".flac", ".wav", ".aac"}
+PATRON_URL = re.compile(r'https?://\S+')
+
+# =========================
+# Lectura de MP3 (ID3v2 + cabecera MPEG)
+# =========================
+BITRATES_MPEG1 = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+BITRATES_MPEG2 = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+FRECUENCIAS = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+MAX_ETIQUETA = 256 * 1024  # las portadas van después del título; no hace falta leerlas
+
+def _entero_sincronizado(datos):
+    return (datos[0] << 21) | (datos[1] << 14) | (datos[2] << 7) | datos[3]
+
+def _texto_id3(datos):
+    if not datos:
+        return ""
+    codificacion = {0: "latin-1", 1: "utf-16", 2: "utf-16-be", 3: "utf-8"}.get(datos[0], "latin-1")
+    return datos[1:].decode(codificacion, "replace").replace("\x00", " ").strip()
+
+def _marcos_id3(etiqueta, version):
+    """Genera (id, datos) de los marcos de una etiqueta ID3v2.2/2.3/2.4"""
+    largo_id, largo_tamaño = (3, 3) if version == 2 else (4, 4)
+    cabecera = largo_id + largo_tamaño + (0 if version == 2 else 2)
+    posicion = 0
+    while posicion + cabecera <= len(etiqueta):
+        id_marco = etiqueta[posicion:posicion + largo_id]
+        if not id_marco.strip(b"\x00"):
+            break
+        crudo = etiqueta[posicion + largo_id:posicion + largo_id + largo_tamaño]
+        if version == 4:
+            tamaño = _entero_sincronizado(crudo)
+        else:
+            tamaño = int.from_bytes(crudo, "big")
+        posicion += cabecera
+        yield id_marco.decode("latin-1"), etiqueta[posicion:posicion + tamaño]
+        posicion += tamaño
+
+def leer_datos_mp3(ruta):
+    """Título, clave de origen, duración (s) y bitrate (kbps) de un MP3
+
+    Solo lee la etiqueta ID3v2 (hasta MAX_ETIQUETA) y la primera trama de
+    audio: la duración sale de la cabecera Xing/Info si existe y, si no, del
+    tamaño del audio a bitrate constante. Los valores que no se puedan leer
+    quedan en None.
+    """
+    datos = {"titulo": None, "id_fuente": None, "duracion": None, "bitrate": None}
+    tamaño_archivo = os.path.getsize(ruta)
+    with open(ruta, "rb") as archivo:
+        cabecera = archivo.read(10)
+        inicio_audio = 0
+        if cabecera[:3] == b"ID3" and len(cabecera) == 10:
+            version = cabecera[3]
+            tamaño_etiqueta = _entero_sincronizado(cabecera[6:10])
+            inicio_audio = 10 + tamaño_etiqueta + (10 if cabecera[5] & 0x10 else 0)
+            for id_marco, contenido in _marcos_id3(archivo.read(min(tamaño_etiqueta, MAX_ETIQUETA)), version):
+                if id_marco in ("TIT2", "TT2") and not datos["titulo"]:
+                    datos["titulo"] = _texto_id3(contenido) or None
+                elif id_marco in ("COMM", "TXXX", "WOAS", "WXXX", "COM", "TXX") and not datos["id_fuente"]:
+                    url = PATRON_URL.search(contenido.decode("latin-1", "replace"))
+                    if url:
+                        datos["id_fuente"] = clave_canonica(url.group(0).rstrip("\x00"))
+        archivo.seek(inicio_audio)
+        bloque = archivo.read(64 * 1024)
+
+    for posicion in range(len(bloque) - 4):
+        if bloque[posicion] != 0xFF or (bloque[posicion + 1] & 0xE0) != 0xE0:
+            continue
+        b2, b3, b4 = bloque[posicion + 1], bloque[posicion + 2], bloque[posicion + 3]
+        version, capa = (b2 >> 3) & 3, (b2 >> 1) & 3
+        indice_bitrate, indice_frecuencia = b3 >> 4, (b3 >> 2) & 3
+        if version == 1 or capa != 1 or indice_bitrate in (0, 15) or indice_frecuencia == 3:
+            continue  # no es una trama de MPEG capa III válida
+        mpeg1 = version == 3
+        bitrate = (BITRATES_MPEG1 if mpeg1 else BITRATES_MPEG2)[indice_bitrate]
+        frecuencia = FRECUENCIAS[version][indice_frecuencia]
+        muestras_por_trama = 1152 if mpeg1 else 576
+        mono = (b4 >> 6) == 3
+        bytes_audio = tamaño_archivo - inicio_audio - posicion
+
+        # Cabecera Xing/Info (VBR): número total de tramas
+        desplazamiento = posicion + 4 + ((17 if mono else 32) if mpeg1 else (9 if mono else 17))
+        marca = bloque[desplazamiento:desplazamiento + 4]
+        if marca in (b"Xing", b"Info") and len(bloque) >= desplazamiento + 12:
+            banderas, tramas = struct.unpack(">II", bloque[desplazamiento + 4:desplazamiento + 12])
+            if banderas & 1 and tramas:
+                datos["duracion"] = tramas * muestras_por_trama / frecuencia
+                datos["bitrate"] = round(bytes_audio * 8 / datos["duracion"] / 1000)
+                break
+        datos["bitrate"] = bitrate
+        datos["duracion"] = bytes_audio * 8 / (bitrate * 1000)
+        break
+    return datos
+
+def leer_datos_audio(ruta):
+    """Metadatos de un archivo de audio; el título cae al nombre si no hay etiqueta"""
+    datos = {"titulo": None, "id_fuente": None, "duracion": None, "bitrate": None}
+    if ruta.lower().endswith(".mp3"):
+        try:
+            datos = leer_datos_mp3(ruta)
+        except (OSError, ValueError, struct.error):
+            pass
+    nombre = os.path.splitext(os.path.basename(ruta))[0]
+    coincidencia = PATRON_ID_EN_NOMBRE.search(nombre)
+    if coincidencia and not datos["id_fuente"]:
+        datos["id_fuente"] = f"youtube:{coincidencia.group(1)}"
+    if not datos["titulo"]:
+        datos["titulo"] = PATRON_ID_EN_NOMBRE.sub("", nombre).strip()
+    return datos
+
+# =========================
+# Índice
+# =========================
+class BibliotecaMusical:
+    """Índice SQLite de los archivos de audio de la carpeta de descargas
+
+    actualizar() solo vuelve a leer los archivos cuyo tamaño o mtime
+    cambió, y no lista las carpetas cuyo mtime sigue igual (añadir, borrar o
+    renombrar un archivo cambia el mtime de su carpeta; editarlo en el sitio
+    no, para eso está completo=True). Las descargas nuevas se añaden con
+    agregar() sin recorrer nada.
+    """
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._bloqueo = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, timeout=30, check_same_thread=False)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.executescript("""
+            CREATE TABLE IF NOT EXISTS pistas (
+                ruta TEXT PRIMARY KEY,
+                carpeta TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                tamaño INTEGER NOT NULL,
+                titulo TEXT,
+                id_fuente TEXT,
+                duracion REAL,
+                bitrate INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS idx_pistas_carpeta ON pistas(carpeta);
+            CREATE INDEX IF NOT EXISTS idx_pistas_id_fuente ON pistas(id_fuente);
+            CREATE INDEX IF NOT EXISTS idx_pistas_titulo ON pistas(titulo COLLATE NOCASE);
+            CREATE TABLE IF NOT EXISTS carpetas (
+                ruta TEXT PRIMARY KEY,
+                padre TEXT,
+                mtime_ns INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_carpetas_padre ON carpetas(padre);
+        """)
+        self._conexion.commit()
+
+    def _guardar_pista(self, ruta, estado, datos):
+        # Un id conocido (p. ej. el que dio la descarga) no se pierde al releer el archivo
+        self._conexion.execute("""
+            INSERT INTO pistas (ruta, carpeta, mtime_ns, tamaño, titulo, id_fuente, duracion, bitrate)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(ruta) DO UPDATE SET
+                mtime_ns = excluded.mtime_ns, tamaño = excluded.tamaño, titulo = excluded.titulo,
+                id_fuente = COALESCE(excluded.id_fuente, pistas.id_fuente),
+                duracion = excluded.duracion, bitrate = excluded.bitrate
+        """, (ruta, os.path.dirname(ruta), estado.st_mtime_ns, estado.st_size,
+              datos["titulo"], datos["id_fuente"], datos["duracion"], datos["bitrate"]))
+
+    def _borrar_arbol(self, carpeta):
+        prefijo = carpeta + os.sep
+        self._conexion.execute(
+            "DELETE FROM pistas WHERE carpeta = ? OR substr(carpeta, 1, ?) = ?", (carpeta, len(prefijo), prefijo)
+        )
+        self._conexion.execute(
+            "DELETE FROM carpetas WHERE ruta = ? OR substr(ruta, 1, ?) = ?", (carpeta, len(prefijo), prefijo)
+        )
+
+    def agregar(self, ruta, titulo=None, id_fuente=None):
+        """Indexa un archivo recién descargado; titulo e id_fuente tienen prioridad sobre la etiqueta"""
+        ruta = os.path.abspath(ruta)
+        estado = os.stat(ruta)
+        datos = leer_datos_audio(ruta)
+        datos["titulo"] = titulo or datos["titulo"]
+        datos["id_fuente"] = id_fuente or datos["id_fuente"]
+        with self._bloqueo:
+            with self._conexion:
+                self._guardar_pista(ruta, estado, datos)
+
+    def actualizar(self, directorio, completo=False):
+        """Pone el índice al día con el disco y devuelve qué cambió"""
+        raiz = os.path.abspath(directorio)
+        cambios = {"nuevas": 0, "actualizadas": 0, "borradas": 0, "carpetas_sin_cambios": 0}
+        with self._bloqueo:
+            prefijo = raiz + os.sep
+            carpetas = {}
+            hijas = {}
+            for ruta, padre, mtime_ns in self._conexion.execute(
+                "SELECT ruta, padre, mtime_ns FROM carpetas WHERE ruta = ? OR substr(ruta, 1, ?) = ?",
+                (raiz, len(prefijo), prefijo)
+            ):
+                carpetas[ruta] = mtime_ns
+                hijas.setdefault(padre, []).append(ruta)
+
+        pila = [raiz]
+        while pila:
+            carpeta = pila.pop()
+            try:
+                mtime_carpeta = os.stat(carpeta).st_mtime_ns
+                if not completo and carpetas.get(carpeta) == mtime_carpeta:
+                    cambios["carpetas_sin_cambios"] += 1
+                    pila.extend(hijas.get(carpeta, ()))
+                    continue
+                entradas = list(os.scandir(carpeta))
+            except OSError:
+                with self._bloqueo, self._conexion:
+                    self._borrar_arbol(carpeta)
+                continue
+
+            with self._bloqueo:
+                conocidas = {
+                    ruta: (mtime_ns, tamaño) for ruta, mtime_ns, tamaño in self._conexion.execute(
+                        "SELECT ruta, mtime_ns, tamaño FROM pistas WHERE carpeta = ?", (carpeta,)
+                    )
+                }
+            subcarpetas = []
+            leidas = []
+            for entrada in entradas:
+                try:
+                    if entrada.is_dir(follow_symlinks=False):
+                        subcarpetas.append(entrada.path)
+                        continue
+                    if os.path.splitext(entrada.name)[1].lower() not in EXTENSIONES_AUDIO:
+                        continue
+                    estado = entrada.stat()
+                except OSError:
+                    continue
+                previa = conocidas.pop(entrada.path, None)
+                if previa == (estado.st_mtime_ns, estado.st_size):
+                    continue
+                leidas.append((entrada.path, estado, leer_datos_audio(entrada.path)))
+                cambios["actualizadas" if previa else "nuevas"] += 1
+
+            with self._bloqueo, self._conexion:
+                for ruta, estado, datos in leidas:
+                    self._guardar_pista(ruta, estado, datos)
+                self._conexion.executemany("DELETE FROM pistas WHERE ruta = ?", [(r,) for r in conocidas])
+                for desaparecida in set(hijas.get(carpeta, ())) - set(subcarpetas):
+                    self._borrar_arbol(desaparecida)
+                self._conexion.execute(
+                    "INSERT OR REPLACE INTO carpetas (ruta, padre, mtime_ns) VALUES (?, ?, ?)",
+                    (carpeta, os.path.dirname(carpeta), mtime_carpeta)
+                )
+            cambios["borradas"] += len(conocidas)
+            pila.extend(subcarpetas)
+        return cambios
+
+    def _consultar(self, sql, parametros=()):
+        with self._bloqueo:
+            cursor = self._conexion.execute(sql, parametros)
+            columnas = [c[0] for c in cursor.description]
+            return [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+
+    def buscar(self, texto, limite=100):
+        """Pistas cuyo título o ruta contienen el texto (sin distinguir mayúsculas)"""
+        patron = f"%{texto.strip()}%"
+        return self._consultar(
+            "SELECT ruta, titulo, id_fuente, duracion, bitrate FROM pistas "
+            "WHERE titulo LIKE ? OR ruta LIKE ? ORDER BY titulo COLLATE NOCASE LIMIT ?",
+            (patron, patron, limite)
+        )
+
+    def buscar_por_id_fuente(self, id_fuente):
+        """Archivos en disco que vienen de un video dado"""
+        return self._consultar(
+            "SELECT ruta, titulo, id_fuente, duracion, bitrate FROM pistas WHERE id_fuente = ?", (id_fuente,)
+        )
+
+    def claves(self, directorio=None):
+        """Claves de origen de las pistas indexadas (bajo directorio, si se indica)"""
+        if directorio is None:
+            filas = self._consultar("SELECT DISTINCT id_fuente FROM pistas WHERE id_fuente IS NOT NULL")
+        else:
+            raiz = os.path.abspath(directorio)
+            prefijo = raiz + os.sep
+            filas = self._consultar(
+                "SELECT DISTINCT id_fuente FROM pistas WHERE id_fuente IS NOT NULL "
+                "AND (carpeta = ? OR substr(carpeta, 1, ?) = ?)", (raiz, len(prefijo), prefijo)
+            )
+        return [f["id_fuente"] for f in filas]
+
+    def estadisticas(self):
+        """Número de pistas, duración total (s) y tamaño total (bytes)"""
+        return self._consultar(
+            "SELECT COUNT(*) AS pistas, COALESCE(SUM(duracion), 0) AS segundos, "
+            "COALESCE(SUM(tamaño), 0) AS bytes FROM pistas"
+        )[0]
+
+    def cerrar(self):
+        with self._bloqueo:
+            self._conexion.close()
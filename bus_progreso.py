@@ -0,0 +1,37 @@
+import threading
+
+class BusProgreso:
+    """Canal entre los hilos de descarga y el hilo de la interfaz
+
+    Los trabajadores publican eventos sin tocar widgets; la interfaz los
+    vacía con un temporizador. Los eventos con la misma clave se fusionan y
+    solo sobrevive el último, así que cien callbacks por segundo de un mismo
+    trabajo cuestan una sola actualización por cuadro. Las acciones puntuales
+    (diálogos, habilitar botones) se encolan en orden y nunca se fusionan.
+    """
+    def __init__(self):
+        self._bloqueo = threading.Lock()
+        self._eventos = {}
+        self._acciones = []
+
+    def publicar(self, clave, valor):
+        """Guarda el último valor para la clave, reemplazando al anterior
+
+        La clave pasa al final: vaciar() entrega los eventos en el orden de su
+        última publicación (un 'lote' nuevo queda detrás de las filas viejas).
+        """
+        with self._bloqueo:
+            self._eventos.pop(clave, None)
+            self._eventos[clave] = valor
+
+    def en_ui(self, funcion, *args, **kwargs):
+        """Pide ejecutar funcion(*args, **kwargs) en el hilo de la interfaz"""
+        with self._bloqueo:
+            self._acciones.append((funcion, args, kwargs))
+
+    def vaciar(self):
+        """Devuelve (eventos, acciones) pendientes y deja el bus vacío"""
+        with self._bloqueo:
+            eventos, self._eventos = self._eventos, {}
+            acciones, self._acciones = self._acciones, []
+        return eventos, acciones
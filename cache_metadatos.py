@@ -0,0 +1,106 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+class CacheMetadatos:
+    """Caché en disco de resultados de extracción, con TTL y expulsión LRU
+
+    Cada entrada se guarda comprimida en SQLite junto con su tamaño y la
+    última vez que se leyó. Las entradas caducan a los `ttl` segundos porque
+    las URLs de streaming que contienen dejan de ser válidas; cuando se
+    superan `max_entradas` o `max_bytes` se expulsan las menos usadas.
+    """
+    def __init__(self, ruta, ttl=3600, max_entradas=2000, max_bytes=100 * 1024 * 1024):
+        self.ruta = ruta
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.aciertos = 0
+        self.fallos = 0
+        self.invalidadas = 0
+        self._bloqueo = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute("""
+            CREATE TABLE IF NOT EXISTS metadatos (
+                clave TEXT PRIMARY KEY,
+                datos BLOB NOT NULL,
+                bytes INTEGER NOT NULL,
+                creado REAL NOT NULL,
+                accedido REAL NOT NULL
+            )
+        """)
+        self._conexion.execute("CREATE INDEX IF NOT EXISTS idx_metadatos_accedido ON metadatos(accedido)")
+        self._conexion.commit()
+
+    def obtener(self, clave):
+        """Devuelve el dict guardado para la clave o None si falta o caducó"""
+        ahora = time.time()
+        with self._bloqueo:
+            fila = self._conexion.execute(
+                "SELECT datos, creado FROM metadatos WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila is None or ahora - fila[1] > self.ttl:
+                if fila is not None:
+                    self._conexion.execute("DELETE FROM metadatos WHERE clave = ?", (clave,))
+                    self._conexion.commit()
+                self.fallos += 1
+                return None
+            self._conexion.execute("UPDATE metadatos SET accedido = ? WHERE clave = ?", (ahora, clave))
+            self._conexion.commit()
+            self.aciertos += 1
+        return json.loads(zlib.decompress(fila[0]))
+
+    def guardar(self, clave, info):
+        """Guarda un dict serializable en JSON y aplica los límites de tamaño"""
+        datos = zlib.compress(json.dumps(info).encode("utf-8"))
+        ahora = time.time()
+        with self._bloqueo:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO metadatos (clave, datos, bytes, creado, accedido) VALUES (?, ?, ?, ?, ?)",
+                (clave, datos, len(datos), ahora, ahora)
+            )
+            self._expulsar()
+            self._conexion.commit()
+
+    def invalidar(self, clave):
+        """Borra la entrada de la clave, p. ej. si sus URLs de streaming ya no sirven"""
+        with self._bloqueo:
+            borradas = self._conexion.execute("DELETE FROM metadatos WHERE clave = ?", (clave,)).rowcount
+            self._conexion.commit()
+            self.invalidadas += borradas
+
+    def _expulsar(self):
+        self._conexion.execute("DELETE FROM metadatos WHERE creado < ?", (time.time() - self.ttl,))
+        entradas, total_bytes = self._conexion.execute(
+            "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM metadatos"
+        ).fetchone()
+        if entradas <= self.max_entradas and total_bytes <= self.max_bytes:
+            return
+        a_borrar = []
+        for clave, tamaño in self._conexion.execute("SELECT clave, bytes FROM metadatos ORDER BY accedido"):
+            if entradas <= self.max_entradas and total_bytes <= self.max_bytes:
+                break
+            a_borrar.append((clave,))
+            entradas -= 1
+            total_bytes -= tamaño
+        self._conexion.executemany("DELETE FROM metadatos WHERE clave = ?", a_borrar)
+
+    def estadisticas(self):
+        """Aciertos, fallos, invalidaciones, número de entradas y bytes ocupados"""
+        with self._bloqueo:
+            entradas, total_bytes = self._conexion.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM metadatos"
+            ).fetchone()
+        return {
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "invalidadas": self.invalidadas,
+            "entradas": entradas,
+            "bytes": total_bytes,
+        }
+
+    def cerrar(self):
+        with self._bloqueo:
+            self._conexion.close()
@@ -0,0 +1,101 @@
+"""Descarga un lote de URLs sin interfaz gráfica.
+
+Uso:
+    python cli_descargador.py URL [URL ...]
+    python cli_descargador.py --archivo lista.txt
+    cat lista.txt | python cli_descargador.py
+
+Las listas se leen como flujo: cada línea se normaliza (youtu.be, music.,
+parámetros de rastreo) y se deduplica, y el lote la va leyendo a medida que tiene sitio.
+
+Usa la misma configuración que la aplicación (config_descargador.json).
+"""
+import time
+
+INICIO = time.perf_counter()  # antes de cualquier otro import, para medir el arranque
+
+import argparse
+import sys
+import threading
+
+from descargador import (
+    cargar_configuracion, combinar_resumenes, configurar_registro, importar_lista, reanudar_pendientes,
+    separar_urls, texto_informe, texto_resumen
+)
+from importacion import texto_importacion
+
+def leer_lineas(argumentos):
+    """Líneas de los argumentos y luego del archivo indicado o de stdin, sin leerlos enteros"""
+    for argumento in argumentos.urls:
+        yield from separar_urls(argumento)
+    if argumentos.archivo:
+        flujo = sys.stdin if argumentos.archivo == "-" else open(argumentos.archivo, encoding="utf-8")
+        with flujo:
+            yield from flujo
+    elif not argumentos.urls and not sys.stdin.isatty():
+        yield from sys.stdin
+
+def crear_parser():
+    parser = argparse.ArgumentParser(description="Descargador Musical Pro sin interfaz gráfica")
+    parser.add_argument("urls", nargs="*", help="URLs a descargar")
+    parser.add_argument("-a", "--archivo", help="archivo con una URL por línea ('-' para stdin)")
+    parser.add_argument("-d", "--directorio", help="carpeta de destino (por defecto la de la configuración)")
+    parser.add_argument("-c", "--calidad", help="calidad MP3 en kbps (por defecto la de la configuración)")
+    parser.add_argument("-p", "--paralelas", type=int, help="descargas simultáneas")
+    parser.add_argument("-r", "--reanudar", action="store_true",
+                        help="reanudar los lotes que quedaron sin terminar antes de descargar las URLs nuevas")
+    parser.add_argument("-v", "--detallado", action="store_true", help="mostrar los mensajes informativos de yt-dlp")
+    parser.add_argument("--perfilar", metavar="ARCHIVO",
+                        help="perfil cProfile del primer hilo de descarga (verlo con python -m pstats ARCHIVO)")
+    return parser
+
+def main(argv=None):
+    argumentos = crear_parser().parse_args(argv)
+    config = cargar_configuracion()
+    if argumentos.paralelas:
+        config['descargas_paralelas'] = argumentos.paralelas
+    if argumentos.detallado:
+        config['nivel_registro'] = "INFO"
+    if argumentos.perfilar:
+        config['perfil_lote'] = argumentos.perfilar
+    configurar_registro(config)
+    directorio = argumentos.directorio or config['directorio_descargas']
+
+    print(f"Arranque en {(time.perf_counter() - INICIO) * 1000:.0f} ms", file=sys.stderr)
+
+    bloqueo_salida = threading.Lock()
+
+    def al_cambiar(trabajo, pool):
+        if trabajo.estado not in ("completado", "error"):
+            return
+        terminados = pool.contar("completado") + pool.contar("error")
+        with bloqueo_salida:
+            if trabajo.estado == "completado":
+                print(f"[{terminados}/{pool.total}] ✓ {trabajo.titulo}")
+            else:
+                print(f"[{terminados}/{pool.total}] ⚠ {trabajo.url} ({trabajo.tipo_error})")
+
+    resumenes = []
+    if argumentos.reanudar:
+        resumenes.extend(reanudar_pendientes(config, al_cambiar))
+    # La lista se lee como flujo: el lote toma URLs a medida que tiene sitio
+    importacion, resumenes_lista = importar_lista(
+        leer_lineas(argumentos), directorio, config, argumentos.calidad, al_cambiar=al_cambiar
+    )
+    resumenes.extend(resumenes_lista)
+    if importacion['validas'] or importacion['duplicadas'] or importacion['rechazadas']:
+        print(texto_importacion(importacion), file=sys.stderr)
+        for numero_linea, texto in importacion['ejemplos_rechazadas']:
+            print(f"  línea {numero_linea} rechazada: {texto}", file=sys.stderr)
+    if not importacion['validas'] and not argumentos.reanudar:
+        print("No se indicaron URLs.", file=sys.stderr)
+        return 2
+    if resumenes:
+        print(texto_resumen(combinar_resumenes(resumenes)))
+    informe = texto_informe(resumenes)
+    if informe:
+        print(informe, file=sys.stderr)
+    return 1 if any(resumen['errores'] for resumen in resumenes) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
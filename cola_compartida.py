@@ -0,0 +1,153 @@
+import sqlite3
+import threading
+import time
+
+class ColaCompartida:
+    """Cola de trabajos en SQLite compartida por varios procesos o equipos
+
+    Cada toma lleva una concesión (lease) que se renueva con latidos; tras
+    `max_tomas` tomas sin terminar el trabajo se da por perdido.
+    """
+    def __init__(self, ruta, max_tomas=3):
+        self.ruta = ruta
+        self.max_tomas = max_tomas
+        self._bloqueo = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, timeout=60, isolation_level=None, check_same_thread=False)
+        # WAL necesita memoria compartida y no funciona sobre un sistema de archivos de red
+        self._conexion.execute("PRAGMA journal_mode=DELETE")
+        self._conexion.executescript("""
+            CREATE TABLE IF NOT EXISTS cola (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL,
+                directorio TEXT NOT NULL,
+                calidad TEXT,
+                estado TEXT NOT NULL DEFAULT 'pendiente',
+                trabajador TEXT,
+                vence REAL,
+                tomas INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                creado REAL NOT NULL,
+                actualizado REAL NOT NULL,
+                UNIQUE (url, directorio)
+            );
+            CREATE INDEX IF NOT EXISTS idx_cola_estado ON cola(estado, directorio, calidad);
+        """)
+
+    def encolar(self, urls, directorio, calidad=None):
+        """Añade URLs pendientes y devuelve cuántas entraron
+
+        Una URL que ya está en la cola para el mismo directorio no se repite
+        (así dos equipos no la descargan a la vez); si había terminado con
+        error vuelve a quedar pendiente.
+        """
+        ahora = time.time()
+        filas = [(url, directorio, calidad, ahora, ahora) for url in urls]
+        with self._bloqueo:
+            antes = self._conexion.total_changes
+            self._conexion.execute("BEGIN IMMEDIATE")
+            try:
+                self._conexion.executemany(
+                    "INSERT INTO cola (url, directorio, calidad, creado, actualizado) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (url, directorio) DO UPDATE SET estado = 'pendiente', calidad = excluded.calidad, "
+                    "trabajador = NULL, vence = NULL, tomas = 0, error = NULL, actualizado = excluded.actualizado "
+                    "WHERE estado = 'error'", filas
+                )
+                self._conexion.execute("COMMIT")
+            except BaseException:
+                self._conexion.execute("ROLLBACK")
+                raise
+            return self._conexion.total_changes - antes
+
+    def tomar(self, trabajador, concesion, grupo=None):
+        """Reclama un trabajo libre o con la concesión vencida; devuelve (id, url, directorio, calidad) o None
+
+        Con grupo=(directorio, calidad) solo se toman trabajos de ese destino,
+        para seguir alimentando el lote en curso.
+        """
+        filtro, parametros = "", ()
+        if grupo is not None:
+            filtro, parametros = " AND directorio = ? AND calidad IS ?", tuple(grupo)
+        with self._bloqueo:
+            while True:
+                # Si el trabajador murió su concesión vence y la fila vuelve a estar libre. Es la hora
+                # de cada equipo: la concesión debe ser mucho más larga que el desfase entre relojes
+                ahora = time.time()
+                # BEGIN IMMEDIATE toma el bloqueo de escritura: dos trabajadores no pueden leer la misma fila libre
+                self._conexion.execute("BEGIN IMMEDIATE")
+                try:
+                    fila = self._conexion.execute(
+                        "SELECT id, url, directorio, calidad, tomas FROM cola "
+                        "WHERE (estado = 'pendiente' OR (estado = 'tomado' AND vence < ?))" + filtro +
+                        " ORDER BY id LIMIT 1", (ahora,) + parametros
+                    ).fetchone()
+                    if fila is None:
+                        self._conexion.execute("COMMIT")
+                        return None
+                    id_trabajo, url, directorio, calidad, tomas = fila
+                    if tomas >= self.max_tomas:
+                        self._conexion.execute(
+                            "UPDATE cola SET estado = 'error', error = ?, actualizado = ? WHERE id = ?",
+                            (f"abandonado tras {tomas} tomas sin terminar", ahora, id_trabajo)
+                        )
+                        self._conexion.execute("COMMIT")
+                        continue
+                    self._conexion.execute(
+                        "UPDATE cola SET estado = 'tomado', trabajador = ?, vence = ?, tomas = tomas + 1, "
+                        "actualizado = ? WHERE id = ?",
+                        (trabajador, ahora + concesion, ahora, id_trabajo)
+                    )
+                    self._conexion.execute("COMMIT")
+                    return id_trabajo, url, directorio, calidad
+                except BaseException:
+                    self._conexion.execute("ROLLBACK")
+                    raise
+
+    def renovar(self, trabajador, ids, concesion):
+        """Latido: extiende las concesiones propias; devuelve cuántas seguían siendo nuestras"""
+        if not ids:
+            return 0
+        marcadores = ",".join("?" * len(ids))
+        with self._bloqueo:
+            cursor = self._conexion.execute(
+                f"UPDATE cola SET vence = ? WHERE estado = 'tomado' AND trabajador = ? AND id IN ({marcadores})",
+                (time.time() + concesion, trabajador, *ids)
+            )
+            return cursor.rowcount
+
+    def terminar(self, id_trabajo, trabajador, estado, error=None):
+        """Cierra un trabajo propio como 'completado', 'omitido' o 'error'
+
+        Devuelve False si la concesión se perdió y otro trabajador lo tiene.
+        """
+        with self._bloqueo:
+            cursor = self._conexion.execute(
+                "UPDATE cola SET estado = ?, error = ?, vence = NULL, actualizado = ? "
+                "WHERE id = ? AND estado = 'tomado' AND trabajador = ?",
+                (estado, error, time.time(), id_trabajo, trabajador)
+            )
+            return cursor.rowcount == 1
+
+    def liberar(self, trabajador, ids=None):
+        """Devuelve a la cola los trabajos tomados (todos o los indicados) al salir limpiamente"""
+        filtro, parametros = "", ()
+        if ids is not None:
+            if not ids:
+                return 0
+            filtro = f" AND id IN ({','.join('?' * len(ids))})"
+            parametros = tuple(ids)
+        with self._bloqueo:
+            cursor = self._conexion.execute(
+                "UPDATE cola SET estado = 'pendiente', trabajador = NULL, vence = NULL, tomas = MAX(tomas - 1, 0), "
+                "actualizado = ? WHERE estado = 'tomado' AND trabajador = ?" + filtro,
+                (time.time(), trabajador) + parametros
+            )
+            return cursor.rowcount
+
+    def estadisticas(self):
+        """Número de trabajos por estado"""
+        with self._bloqueo:
+            return dict(self._conexion.execute("SELECT estado, COUNT(*) FROM cola GROUP BY estado").fetchall())
+
+    def cerrar(self):
+        with self._bloqueo:
+            self._conexion.close()
@@ -0,0 +1,154 @@
+import errno
+import json
+import os
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+TAMAÑO_LECTURA = 256 * 1024
+BYTES_ENTRE_ESTADOS = 4 * 1024 * 1024  # por segmento, entre guardados del estado
+
+class RangosNoSoportados(Exception):
+    """El servidor no respeta Range: el archivo se baja por la vía normal"""
+
+def sondear(url, cabeceras=None, timeout=30):
+    """(tamaño total o None, acepta Range) pidiendo solo el primer byte"""
+    peticion = urllib.request.Request(url, headers={**(cabeceras or {}), "Range": "bytes=0-0"})
+    with urllib.request.urlopen(peticion, timeout=timeout) as respuesta:
+        rango = respuesta.headers.get("Content-Range", "")
+        if respuesta.status != 206 or "/" not in rango:
+            return int(respuesta.headers.get("Content-Length") or 0) or None, False
+        total = rango.rsplit("/", 1)[1]
+        return (int(total) if total.isdigit() else None), True
+
+class DescargaSegmentada:
+    """Un archivo HTTP grande bajado en varios rangos a la vez, reanudable por segmento
+
+    al_avanzar(nuevos, descargados) corre en los hilos de los segmentos;
+    si lanza, la descarga se detiene con el estado guardado.
+    """
+    def __init__(self, url, ruta, tamaño, cabeceras=None, al_avanzar=None, timeout=30):
+        self.url = url
+        self.ruta = ruta
+        self.tamaño = tamaño
+        self.cabeceras = cabeceras or {}
+        self.al_avanzar = al_avanzar
+        self.timeout = timeout
+        # Nombres propios: un .part de yt-dlp se reanuda como contiguo y este tiene huecos
+        self.parcial = ruta + ".segmentos.part"
+        self.ruta_estado = ruta + ".segmentos.json"
+        self.descargados = 0
+        self._segmentos = []
+        self._bloqueo = threading.Lock()
+        self._detener = threading.Event()
+
+    def _cargar_estado(self):
+        try:
+            with open(self.ruta_estado, encoding="utf-8") as archivo:
+                estado = json.load(archivo)
+            if estado["tamaño"] == self.tamaño and os.path.getsize(self.parcial) == self.tamaño:
+                return estado["segmentos"]
+        except (OSError, ValueError, KeyError):
+            pass
+        return None
+
+    def _guardar_estado(self):
+        with self._bloqueo:
+            contenido = json.dumps({"tamaño": self.tamaño, "segmentos": self._segmentos})
+            with open(self.ruta_estado + ".tmp", "w", encoding="utf-8") as archivo:
+                archivo.write(contenido)
+            os.replace(self.ruta_estado + ".tmp", self.ruta_estado)
+
+    def _preasignar(self):
+        with open(self.parcial, "wb") as archivo:
+            archivo.truncate(self.tamaño)
+            if hasattr(os, "posix_fallocate"):
+                # Reserva el espacio ya: si el disco no alcanza se sabe antes de bajar nada
+                try:
+                    os.posix_fallocate(archivo.fileno(), 0, self.tamaño)
+                except OSError as e:
+                    if e.errno == errno.ENOSPC:
+                        raise
+
+    def _bajar_segmento(self, segmento):
+        inicio, fin = segmento[0], segmento[1]
+        if inicio + segmento[2] > fin:
+            return
+        peticion = urllib.request.Request(
+            self.url, headers={**self.cabeceras, "Range": f"bytes={inicio + segmento[2]}-{fin}"}
+        )
+        # Sin búfer: lo que cuenta el estado ya está en el sistema operativo
+        with urllib.request.urlopen(peticion, timeout=self.timeout) as respuesta, \
+                open(self.parcial, "r+b", buffering=0) as archivo:
+            rango = respuesta.headers.get("Content-Range", "")
+            if respuesta.status != 206 or not rango.startswith(f"bytes {inicio + segmento[2]}-"):
+                raise RangosNoSoportados(f"Respuesta sin el rango pedido: {respuesta.status} {rango!r}")
+            archivo.seek(inicio + segmento[2])
+            sin_guardar = 0
+            while not self._detener.is_set():
+                bloque = respuesta.read(min(TAMAÑO_LECTURA, fin + 1 - inicio - segmento[2]))
+                if not bloque:
+                    break
+                archivo.write(bloque)
+                with self._bloqueo:
+                    segmento[2] += len(bloque)
+                    self.descargados += len(bloque)
+                    descargados = self.descargados
+                sin_guardar += len(bloque)
+                if sin_guardar >= BYTES_ENTRE_ESTADOS:
+                    self._guardar_estado()
+                    sin_guardar = 0
+                if self.al_avanzar:
+                    self.al_avanzar(len(bloque), descargados)
+        if not self._detener.is_set() and inicio + segmento[2] <= fin:
+            raise ConnectionError(f"La conexión se cerró con el segmento {inicio}-{fin} a medias")
+
+    def _segmento_vigilado(self, segmento):
+        try:
+            self._bajar_segmento(segmento)
+        except BaseException:
+            self._detener.set()  # un segmento que falla para a los demás
+            raise
+
+    def descargar(self, segmentos=4):
+        """Baja el archivo en `segmentos` conexiones y lo deja en self.ruta; devuelve la ruta"""
+        # Muchos servidores limitan cada conexión: N rangos a la vez bajan más rápido. Cada segmento
+        # escribe su tramo del .part preasignado y su avance queda en el .json, así que tras un corte,
+        # un reintento o una pausa sigue desde su último byte guardado
+        self._segmentos = self._cargar_estado()
+        if self._segmentos is None:
+            paso = -(-self.tamaño // max(1, segmentos))
+            # [inicio, fin, bytes hechos]
+            self._segmentos = [[inicio, min(inicio + paso, self.tamaño) - 1, 0]
+                               for inicio in range(0, self.tamaño, paso)]
+            self._preasignar()
+            self._guardar_estado()
+        self.descargados = sum(segmento[2] for segmento in self._segmentos)
+        self._detener.clear()
+
+        error = None
+        pendientes = [s for s in self._segmentos if s[0] + s[2] <= s[1]]
+        if pendientes:
+            with ThreadPoolExecutor(max_workers=len(pendientes), thread_name_prefix="segmento") as ejecutor:
+                for futuro in [ejecutor.submit(self._segmento_vigilado, s) for s in pendientes]:
+                    try:
+                        futuro.result()
+                    except BaseException as e:
+                        error = error or e
+        self._guardar_estado()
+        if error is not None:
+            raise error
+
+        # Solo se renombra si cada segmento y el archivo tienen el tamaño anunciado
+        incompletos = [s for s in self._segmentos if s[0] + s[2] != s[1] + 1]
+        if incompletos or os.path.getsize(self.parcial) != self.tamaño:
+            raise ConnectionError(f"Descarga segmentada incompleta: {self.descargados} de {self.tamaño} bytes")
+        os.replace(self.parcial, self.ruta)
+        os.remove(self.ruta_estado)
+        return self.ruta
+
+    def descartar(self):
+        """Borra el .part y el estado (p. ej. al volver a la descarga normal)"""
+        for ruta in (self.parcial, self.ruta_estado):
+            if os.path.exists(ruta):
+                os.remove(ruta)
@@ -0,0 +1,1201 @@
+import collections
+import contextlib
+import copy
+import cProfile
+import functools
+import itertools
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from urllib.parse import urlparse
+
+from archivo_descargas import ArchivoDescargas
+from biblioteca import BibliotecaMusical
+from cache_metadatos import CacheMetadatos
+from descarga_segmentada import DescargaSegmentada, RangosNoSoportados, sondear
+from diario_trabajos import DiarioTrabajos
+from formatos import CODEC_SIN_RECODIFICAR, SelectorFormatos, bytes_estimados, codec_de
+from historial import HistorialDescargas
+from importacion import ImportadorUrls
+from limitador import CuboTokens, LimitadorConexiones, MedidorRendimiento
+from metricas import MetricasEtapas
+from normalizacion import normalizar_a_mp3
+from planificador import PlanificadorTrabajos, TrabajoInterrumpido
+from portadas import CachePortadas, incrustar_portada, url_miniatura
+from reintentos import (
+    TIPOS_ERROR, InterruptorCircuito, PoliticaReintentos, clasificar_error, ejecutar_con_reintentos, informe_errores
+)
+from transcodificacion import EtapaTranscodificacion, transcodificar_a_mp3
+from utilidades_url import clave_canonica, es_url_de_lista
+
+# yt_dlp es pesado de importar: se carga solo cuando un lote lo necesita.
+# Este módulo no depende de tkinter ni de PIL para poder usarse sin interfaz.
+
+ARCHIVO_CONFIG = "config_descargador.json"
+
+registro = logging.getLogger("descargador")
+
+# =========================
+# Configuración
+# =========================
+def cargar_configuracion():
+    """Carga la configuración desde archivo"""
+    valores_por_defecto = {
+        "directorio_descargas": os.path.expanduser("~/Música"),
+        "calidad_audio": "192",
+        "modo_oscuro": False,
+        "intentos_maximos": 5,
+        "espera_base_segundos": 2,
+        "espera_maxima_segundos": 60,
+        "fallos_para_abrir_circuito": 5,
+        "enfriamiento_circuito_segundos": 60,
+        "descargas_paralelas": 1,
+        "fragmentos_concurrentes": 1,
+        "segmentos_por_descarga": 4,  # conexiones Range para un archivo progresivo grande (1 = no)
+        "umbral_segmentos_mb": 50,
+        "cache_ttl_segundos": 3600,
+        "cache_max_entradas": 2000,
+        "cache_max_mb": 100,
+        "omitir_descargados": True,
+        "escanear_directorio_destino": False,
+        "indexar_biblioteca": True,
+        "expandir_listas": False,
+        "bloque_importacion": 500,
+        "mas_cortas_primero": False,  # ordenar cada lote por la duración de los metadatos
+        "transcodificacion_separada": True,
+        "puntuar_formatos": True,  # el formato más pequeño que alcanza la calidad, en vez de bestaudio
+        "procesos_transcodificacion": 0,
+        "normalizacion": "no",  # no, etiquetas (ReplayGain) o aplicar
+        "objetivo_lufs": -14,
+        "portadas": False,
+        "lado_portada": 600,
+        "limite_kib_s": 0,  # KiB/s para todo el proceso (kbps en este archivo son kilobits de audio)
+        "conexiones_por_host": 8,
+        "nivel_registro": "WARNING",
+        "exportar_metricas": True,
+        "intervalo_metricas_segundos": 10,
+        "perfil_lote": "",
+        "cola_compartida": "",  # ruta del SQLite de trabajador.py; vacío = junto a la configuración
+        "concesion_cola_segundos": 120
+    }
+    
+    try:
+        if os.path.exists(ARCHIVO_CONFIG):
+            with open(ARCHIVO_CONFIG, 'r') as f:
+                config = json.load(f)
+                if "limite_kbps" in config:
+                    # Nombre anterior: el valor siempre fue en KiB/s
+                    config.setdefault("limite_kib_s", config.pop("limite_kbps"))
+                return {**valores_por_defecto, **config}
+    except Exception:
+        pass
+    
+    return valores_por_defecto
+
+def guardar_configuracion(config):
+    """Guarda la configuración en archivo"""
+    try:
+        with open(ARCHIVO_CONFIG, 'w') as f:
+            json.dump(config, f, indent=2)
+    except Exception:
+        pass
+
+def limpiar_porcentaje(cadena_porcentaje):
+    """Extrae el porcentaje de diferentes formatos de cadena"""
+    if not cadena_porcentaje:
+        return 0.0
+    coincidencia = re.search(r'(\d+(?:\.\d+)?)\s*%', str(cadena_porcentaje))
+    return float(coincidencia.group(1)) if coincidencia else 0.0
+
+# =========================
+# Pool de Descargas
+# =========================
+ESTADOS_TERMINALES = ("completado", "error", "cancelado")
+
+class TrabajoDescarga:
+    """Estado de una URL dentro de un lote de descargas"""
+    def __init__(self, indice, url):
+        self.indice = indice
+        self.url = url
+        self.estado = "en_cola"  # ver ESTADOS_TERMINALES; además pausado, descargando, reintentando, procesando...
+        self.id_diario = None
+        self.bytes_descargados = 0
+        self.tiempos = {}  # segundos por etapa: extraccion, descarga, transcodificacion
+        self.titulo = None
+        self.porcentaje = 0.0
+        self.error = None
+        self.tipo_error = None  # ver reintentos.TIPOS_ERROR
+        self.intentos = 0  # reintentos ya hechos
+        self.prioridad = 0  # mayor se descarga antes
+        self.duracion_estimada = None  # segundos de audio según los metadatos
+        self.accion = None  # "pausar" o "cancelar" pedido durante la descarga
+        self.inicio = None
+        self.fin = None
+
+    @property
+    def duracion(self):
+        """Segundos transcurridos desde que el trabajo empezó"""
+        if self.inicio is None:
+            return 0.0
+        return (self.fin or time.monotonic()) - self.inicio
+
+    def instantanea(self):
+        """Copia del estado visible, segura para pasar a otro hilo"""
+        return {
+            "indice": self.indice,
+            "titulo": self.titulo or self.url,
+            "estado": self.estado,
+            "porcentaje": self.porcentaje,
+            "tipo_error": self.tipo_error,
+        }
+
+class PoolDescargas:
+    """Ejecuta un lote de URLs con un número acotado de trabajadores concurrentes
+
+    Cada trabajador reutiliza una sesión de crear_sesion(ranura) y el orden
+    lo decide un PlanificadorTrabajos; los trabajos se pueden pausar,
+    reanudar, cancelar o repriorizar desde cualquier hilo mientras el lote corre.
+    """
+    def __init__(self, funcion_descarga, num_trabajadores=1, al_cambiar=None, crear_sesion=None, perfilar=False,
+                 capacidad=None, mas_cortas_primero=False, estimar_duracion=None, preparar=None):
+        self.funcion_descarga = funcion_descarga
+        self.preparar = preparar
+        self.crear_sesion = crear_sesion
+        self.num_trabajadores = max(1, int(num_trabajadores))
+        self.al_cambiar = al_cambiar
+        self.perfilar = perfilar
+        self.estimar_duracion = estimar_duracion
+        self.perfil = None
+        # Solo se guardan los trabajos sin terminar y los fallidos: un lote de 100k URLs no crece en memoria
+        self.activos = {}  # indice -> trabajo
+        self.fallidos = []
+        self.total = 0
+        self.inicio = None
+        self.fin = None
+        # capacidad: URLs leídas por adelantado de un generador (por defecto el doble de trabajadores; 0 = todas)
+        self._planificador = PlanificadorTrabajos(
+            self.num_trabajadores * 2 if capacidad is None else capacidad, mas_cortas_primero
+        )
+        self._por_estimar = queue.Queue()
+        self._bloqueo_trabajos = threading.Lock()
+        self._por_estado = collections.Counter()
+        self._en_marcha = {}  # indice -> último estado avisado de los que ya salieron de la cola
+        self._prioridad_maxima = 0
+        self._en_etapa = 0
+        self._condicion = threading.Condition()
+
+    def _notificar(self, trabajo):
+        with self._bloqueo_trabajos:
+            # Los subestados que solo van a al_progresar (procesando, reintentando) cuentan como el último aviso
+            self._por_estado[self._en_marcha.pop(trabajo.indice, "en_cola")] -= 1
+            self._por_estado[trabajo.estado] += 1
+            if trabajo.estado in ESTADOS_TERMINALES:
+                self.activos.pop(trabajo.indice, None)
+                if trabajo.estado == "error":
+                    self.fallidos.append(trabajo)
+            elif trabajo.estado != "en_cola":
+                self._en_marcha[trabajo.indice] = trabajo.estado
+        if self.al_cambiar:
+            self.al_cambiar(trabajo)
+
+    def _perfilar(self, pila):
+        # Un solo perfilador por proceso: desde Python 3.12 un segundo lanza ValueError
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError as e:
+            registro.warning("Lote sin perfil: %s", e)
+            return
+        pila.callback(perfil.disable)
+        self.perfil = perfil
+
+    def _trabajador(self, perfilar=False):
+        ranura = {"trabajo": None}
+        with contextlib.ExitStack() as pila:
+            if perfilar:
+                self._perfilar(pila)
+            sesion = None
+            while True:
+                trabajo = self._planificador.tomar()
+                if trabajo is None:
+                    break
+                ranura["trabajo"] = trabajo
+                try:
+                    if sesion is None and self.crear_sesion:
+                        try:
+                            sesion = pila.enter_context(self.crear_sesion(ranura))
+                        except Exception as e:
+                            # Sin sesión el trabajo falla con su error en vez de quedar tomado para siempre
+                            self._terminar(trabajo, e)
+                            continue
+                    self._procesar(trabajo, sesion)
+                finally:
+                    ranura["trabajo"] = None
+                    self._planificador.hecho()
+
+    def _estimar(self):
+        # Un solo hilo, por delante de los trabajadores: sus metadatos quedan en la caché para la descarga
+        with contextlib.ExitStack() as pila:
+            sesion = None
+            while True:
+                trabajo = self._por_estimar.get()
+                if trabajo is None:
+                    break
+                if trabajo.estado != "en_cola":
+                    continue
+                if sesion is None and self.crear_sesion:
+                    sesion = pila.enter_context(self.crear_sesion({"trabajo": None}))
+                try:
+                    trabajo.duracion_estimada = self.estimar_duracion(trabajo, sesion)
+                except Exception as e:
+                    # La descarga volverá a intentarlo e informará del error
+                    registro.debug("Sin duración para %s: %s", trabajo.url, e)
+
+    def _procesar(self, trabajo, sesion):
+        trabajo.estado = "descargando"
+        trabajo.inicio = trabajo.inicio or time.monotonic()
+        self._notificar(trabajo)
+        try:
+            # Una pausa o cancelación pedida mientras tomar() lo sacaba de la cola se atiende antes de empezar
+            if trabajo.accion:
+                raise TrabajoInterrumpido(f"Descarga interrumpida: {trabajo.accion}")
+            resultado = self.funcion_descarga(trabajo, sesion)
+        except Exception as e:
+            if trabajo.accion == "pausar":
+                # El .part queda en disco: al reanudar yt-dlp continúa donde iba
+                trabajo.estado = "pausado"
+                self._planificador.aparcar(trabajo)
+                self._notificar(trabajo)
+            elif trabajo.accion == "cancelar":
+                self._cancelado(trabajo)
+            else:
+                self._terminar(trabajo, e)
+            return
+        if isinstance(resultado, Future):
+            # La conversión sigue en la etapa de CPU y el trabajador queda libre para la siguiente URL
+            trabajo.estado = "transcodificando"
+            self._notificar(trabajo)
+            with self._condicion:
+                self._en_etapa += 1
+            resultado.add_done_callback(lambda futuro: self._terminar_etapa(trabajo, futuro))
+        else:
+            self._terminar(trabajo)
+
+    def _terminar(self, trabajo, error=None):
+        if error is None:
+            trabajo.estado = "completado"
+            trabajo.porcentaje = 100.0
+        else:
+            trabajo.estado = "error"
+            trabajo.error = str(error)
+            trabajo.tipo_error = clasificar_error(error)
+        trabajo.fin = time.monotonic()
+        self._notificar(trabajo)
+
+    def _cancelado(self, trabajo):
+        trabajo.estado = "cancelado"
+        trabajo.fin = time.monotonic()
+        self._notificar(trabajo)
+
+    def _terminar_etapa(self, trabajo, futuro):
+        self._terminar(trabajo, futuro.exception())
+        with self._condicion:
+            self._en_etapa -= 1
+            self._condicion.notify_all()
+
+    def ejecutar(self, urls):
+        """Descarga las URLs (lista o generador) y bloquea hasta que el lote termina"""
+        self.inicio = time.monotonic()
+        # Solo se perfila el primer trabajador: los demás repiten el mismo código
+        hilos = [threading.Thread(target=self._trabajador, args=(self.perfilar and i == 0,), daemon=True)
+                 for i in range(self.num_trabajadores)]
+        for hilo in hilos:
+            hilo.start()
+        hilo_estimacion = None
+        if self.estimar_duracion:
+            hilo_estimacion = threading.Thread(target=self._estimar, daemon=True)
+            hilo_estimacion.start()
+
+        try:
+            for url in urls:
+                self._planificador.poner(self._nuevo_trabajo(url))
+        finally:
+            self._planificador.cerrar()
+            for hilo in hilos:
+                hilo.join()
+            if hilo_estimacion:
+                self._por_estimar.put(None)
+                hilo_estimacion.join()
+            with self._condicion:
+                self._condicion.wait_for(lambda: self._en_etapa == 0)
+
+        self.fin = time.monotonic()
+
+    def _nuevo_trabajo(self, url, prioridad=0):
+        with self._bloqueo_trabajos:
+            self.total += 1
+            trabajo = TrabajoDescarga(self.total, url)
+            trabajo.prioridad = prioridad
+            self.activos[trabajo.indice] = trabajo
+            self._por_estado["en_cola"] += 1
+            self._prioridad_maxima = max(self._prioridad_maxima, prioridad)
+        self._notificar(trabajo)
+        if self.estimar_duracion:
+            self._por_estimar.put(trabajo)
+        return trabajo
+
+    def agregar(self, urls, prioridad=0):
+        """Suma URLs al lote en curso; devuelve los trabajos nuevos o None si el lote ya terminó
+
+        Pasan por preparar(urls), el mismo filtro que las URLs iniciales
+        (listas, repetidas, ya descargadas), que puede tocar la red: no
+        llamarla desde el hilo de la interfaz.
+        """
+        trabajos = []
+        for url in self.preparar(urls) if self.preparar else urls:
+            if self._planificador.terminado:
+                return None
+            trabajo = self._nuevo_trabajo(url, prioridad)
+            if not self._planificador.poner(trabajo, esperar=False):
+                self._cancelado(trabajo)
+                return None
+            trabajos.append(trabajo)
+        return trabajos
+
+    def pausar(self, trabajo):
+        """Pausa un trabajo en cola o corta su descarga; se retoma con reanudar()"""
+        if trabajo.estado == "en_cola" and self._planificador.pausar(trabajo):
+            trabajo.estado = "pausado"
+            self._notificar(trabajo)
+        elif trabajo.estado in ("en_cola", "descargando", "reintentando"):
+            # Si ya no estaba en la cola un trabajador lo tomó: se pausa al empezar o en la descarga
+            trabajo.accion = "pausar"
+
+    def reanudar(self, trabajo):
+        """Devuelve a la cola un trabajo pausado"""
+        if trabajo.estado != "pausado":
+            return
+        trabajo.accion = None
+        if self._planificador.reanudar(trabajo):
+            trabajo.estado = "en_cola"
+            self._notificar(trabajo)
+
+    def cancelar(self, trabajo):
+        """Cancela un trabajo en cola, pausado o descargando; la conversión en curso ya no se corta"""
+        if trabajo.estado in ("en_cola", "pausado") and self._planificador.retirar(trabajo):
+            self._cancelado(trabajo)
+        elif trabajo.estado in ("en_cola", "descargando", "reintentando"):
+            trabajo.accion = "cancelar"
+
+    def priorizar(self, trabajo, prioridad):
+        """Cambia la prioridad de un trabajo que aún no empezó"""
+        trabajo.prioridad = prioridad
+        with self._bloqueo_trabajos:
+            self._prioridad_maxima = max(self._prioridad_maxima, prioridad)
+
+    def prioridad_maxima(self):
+        """La mayor prioridad del lote, para colocar algo por delante de todo"""
+        return self._prioridad_maxima
+
+    def contar(self, estado):
+        """Número de trabajos en un estado dado, según su último aviso a al_cambiar"""
+        return self._por_estado[estado]
+
+    def progreso_global(self):
+        """Porcentaje del lote completo (0-100)"""
+        with self._bloqueo_trabajos:
+            if not self.total:
+                return 0.0
+            terminados = sum(self._por_estado[estado] for estado in ESTADOS_TERMINALES)
+            parcial = sum(self.activos[indice].porcentaje for indice in self._en_marcha)
+            return (terminados * 100.0 + parcial) / self.total
+
+    def resumen(self):
+        """Resumen del lote: totales, errores y tiempo transcurrido"""
+        return {
+            "total": self.total,
+            "completados": self.contar("completado"),
+            "cancelados": self.contar("cancelado"),
+            "errores": [(t.url, t.error) for t in self.fallidos],
+            "fallidos": [
+                {"url": t.url, "titulo": t.titulo, "error": t.error, "tipo": t.tipo_error, "intentos": t.intentos}
+                for t in self.fallidos
+            ],
+            "segundos": ((self.fin or time.monotonic()) - self.inicio) if self.inicio else 0.0,
+        }
+
+def formatear_duracion(segundos):
+    """Convierte segundos a un texto corto tipo 3m12s"""
+    minutos, segundos = divmod(int(segundos), 60)
+    return f"{minutos}m{segundos:02d}s" if minutos else f"{segundos}s"
+
+# Límites compartidos por todos los lotes del proceso (GUI, CLI o servicio)
+limitador_ancho_banda = CuboTokens()
+limitador_conexiones = LimitadorConexiones()
+medidor_rendimiento = MedidorRendimiento()
+interruptor_circuito = InterruptorCircuito()
+metricas = MetricasEtapas()
+_ultima_exportacion = 0.0
+
+def exportar_metricas(config, forzar=False):
+    """Escribe metricas.json y metricas.prom junto a ARCHIVO_CONFIG
+
+    Sin forzar, como mucho una vez cada intervalo_metricas_segundos, para
+    poder llamarla en cada cambio de estado de un lote.
+    """
+    global _ultima_exportacion
+    if not config['exportar_metricas']:
+        return
+    ahora = time.monotonic()
+    if not forzar and ahora - _ultima_exportacion < config['intervalo_metricas_segundos']:
+        return
+    _ultima_exportacion = ahora
+    directorio_config = os.path.dirname(ARCHIVO_CONFIG)
+    try:
+        metricas.exportar(
+            os.path.join(directorio_config, "metricas.json"),
+            os.path.join(directorio_config, "metricas.prom"),
+        )
+    except Exception as e:
+        registro.warning("No se pudieron exportar las métricas: %s", e)
+
+def configurar_registro(config):
+    """Registro con niveles en stderr para los puntos de entrada"""
+    logging.basicConfig(
+        level=getattr(logging, str(config['nivel_registro']).upper(), logging.WARNING),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+
+def aplicar_limites(config):
+    """Ajusta los límites globales a la configuración actual"""
+    limitador_ancho_banda.ajustar(config['limite_kib_s'] * 1024)
+    limitador_conexiones.ajustar(config['conexiones_por_host'])
+    interruptor_circuito.ajustar(config['fallos_para_abrir_circuito'], config['enfriamiento_circuito_segundos'])
+
+def formatear_velocidad(bytes_por_segundo):
+    """Texto corto para una tasa, p. ej. '3.4 MB/s'"""
+    if bytes_por_segundo >= 1e6:
+        return f"{bytes_por_segundo / 1e6:.1f} MB/s"
+    return f"{bytes_por_segundo / 1e3:.0f} kB/s"
+
+def hook_progreso(d, trabajo, al_progresar=None):
+    """Callback de yt-dlp: actualiza el porcentaje y el estado del trabajo
+
+    También descuenta los bytes recibidos del límite global de ancho de
+    banda: el hook corre en el hilo que descarga, así que esperar aquí
+    frena esa descarga.
+    """
+    if trabajo.accion:
+        # Lanzar desde el hook corta la descarga en curso (el .part se conserva)
+        raise TrabajoInterrumpido(f"Descarga interrumpida: {trabajo.accion}")
+    if d.get('status') == 'downloading':
+        trabajo.porcentaje = limpiar_porcentaje(d.get('_percent_str', '0%'))
+        descargados = d.get('downloaded_bytes') or 0
+        # Al empezar otro archivo del mismo trabajo el contador vuelve a cero
+        nuevos = descargados - trabajo.bytes_descargados if descargados >= trabajo.bytes_descargados else descargados
+        trabajo.bytes_descargados = descargados
+        medidor_rendimiento.sumar(nuevos)
+        limitador_ancho_banda.consumir(nuevos)
+    elif d.get('status') == 'finished':
+        trabajo.porcentaje = 100.0
+        trabajo.estado = "procesando"
+    else:
+        return
+    if al_progresar:
+        al_progresar(trabajo)
+
+def host_de(url):
+    """Host de una URL sin el prefijo www., para los límites por servidor"""
+    return (urlparse(url).hostname or "").removeprefix("www.")
+
+def separar_urls(texto):
+    """Separa URLs por coma, punto y coma o nueva línea"""
+    return [u.strip() for u in re.split(r'[,;\n]', texto) if u.strip()]
+
+def construir_opciones_ydl(config, directorio_descarga, calidad=None):
+    """Opciones de yt-dlp para un lote, a partir de la configuración
+
+    Con transcodificacion_separada yt-dlp solo descarga; la conversión a MP3
+    la hace EtapaTranscodificacion fuera de los hilos de descarga. Con
+    normalización tampoco convierte yt-dlp: medir y codificar van en una
+    sola pasada de ffmpeg.
+    """
+    opciones = {
+        'format': 'bestaudio/best',
+        # Con el id, dos pistas del mismo título en paralelo no comparten el .part
+        'outtmpl': os.path.join(directorio_descarga, '%(title)s [%(id)s].%(ext)s'),
+        'noplaylist': True,
+        'quiet': True,
+        'ignoreerrors': False,
+        # Los reintentos de la descarga los lleva PoliticaReintentos; sumarle los de yt-dlp los multiplica
+        'retries': 0,
+        'continuedl': True,  # reanuda los .part que quedaron de un lote interrumpido
+        'fragment_retries': 10,
+        'concurrent_fragment_downloads': config['fragmentos_concurrentes'],
+        'windowsfilenames': True,
+        'postprocessors': [{
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': 'mp3',
+            'preferredquality': calidad or config['calidad_audio'],
+        }],
+        'extractor_args': {
+            'youtube': {
+                'player_client': ['android'],
+                'skip': ['dash', 'hls']
+            }
+        },
+        'logger': RegistradorYDL(),
+    }
+    if config['puntuar_formatos']:
+        opciones['format'] = SelectorFormatos(calidad or config['calidad_audio'])
+    if config['transcodificacion_separada'] or config['normalizacion'] in ("etiquetas", "aplicar"):
+        opciones['postprocessors'] = []
+    return opciones
+
+def expandir_listas(urls, ydl, profundidad_maxima=3):
+    """Genera URLs de video, abriendo listas y canales a medida que se recorren
+
+    Usa extracción plana: las entradas de una lista llegan como referencias
+    sin resolver, de una en una, así que una lista de miles de videos empieza
+    a producir URLs en segundos y nunca se guarda entera en memoria. Si una
+    lista falla se devuelve su URL tal cual para que el error quede en su
+    propio trabajo.
+    """
+    for url in urls:
+        if not es_url_de_lista(url):
+            yield url
+            continue
+        try:
+            info = ydl.extract_info(url, download=False, process=False)
+        except Exception:
+            yield url
+            continue
+        yield from _urls_de_entradas(info, ydl, profundidad_maxima)
+
+def _urls_de_entradas(info, ydl, profundidad):
+    if not info or info.get('_type') not in ('playlist', 'multi_video'):
+        url = info and (info.get('webpage_url') or info.get('url'))
+        if url:
+            yield url
+        return
+    for entrada in info.get('entries') or ():
+        if not entrada:
+            continue
+        url = entrada.get('url') or entrada.get('webpage_url')
+        if entrada.get('_type') in ('playlist', 'multi_video'):
+            yield from _urls_de_entradas(entrada, ydl, profundidad - 1)
+        elif url and es_url_de_lista(url) and profundidad > 0:
+            # Pestañas de un canal (videos, shorts...) llegan como enlaces a otra lista
+            yield from expandir_listas([url], ydl, profundidad - 1)
+        elif url:
+            yield url
+
+def filtrar_pendientes(urls, archivo, contadores, claves_lote=None, bloqueo=None, al_omitir=None):
+    """Omite URLs repetidas en el lote o ya presentes en el archivo de descargas
+
+    claves_lote y bloqueo se comparten entre los filtros de un mismo lote
+    (las URLs iniciales y las que se suman mientras corre).
+    """
+    claves_lote = set() if claves_lote is None else claves_lote
+    bloqueo = bloqueo or threading.Lock()
+    for url in urls:
+        clave = clave_canonica(url)
+        with bloqueo:
+            repetida = clave in claves_lote or archivo.contiene(clave)
+            if repetida:
+                contadores['omitidos'] += 1
+            else:
+                claves_lote.add(clave)
+        if not repetida:
+            yield url
+        elif al_omitir:
+            al_omitir(url)
+
+def ejecutar_lote(urls, directorio_descarga, config, calidad=None, al_cambiar=None, al_progresar=None):
+    """Descarga un lote completo y devuelve su resumen (bloquea hasta terminar)
+
+    urls puede ser una lista o cualquier iterable. al_cambiar(trabajo, pool)
+    se llama cuando un trabajo entra en cola o cambia de estado y
+    al_progresar(trabajo) en cada avance de yt-dlp; ambos pueden correr en
+    los hilos de descarga.
+    """
+    import yt_dlp
+
+    aplicar_limites(config)
+    os.makedirs(directorio_descarga, exist_ok=True)
+    opciones_ydl = construir_opciones_ydl(config, directorio_descarga, calidad)
+
+    def crear_sesion(ranura):
+        # Una sesión por trabajador: conexiones y cookies se reutilizan en todo el lote
+        opciones = dict(opciones_ydl, progress_hooks=[
+            lambda d: hook_progreso(d, ranura['trabajo'], al_progresar)
+        ])
+        return yt_dlp.YoutubeDL(opciones)
+
+    limites_cache = dict(
+        ttl=config['cache_ttl_segundos'],
+        max_entradas=config['cache_max_entradas'],
+        max_bytes=config['cache_max_mb'] * 1024 * 1024,
+    )
+    try:
+        cache = CacheMetadatos(os.path.join(os.path.dirname(ARCHIVO_CONFIG), "cache_metadatos.sqlite"), **limites_cache)
+    except sqlite3.Error as e:
+        # Un archivo dañado o bloqueado no impide descargar: el lote usa una caché en memoria
+        registro.warning("No se pudo abrir la caché de metadatos: %s", e)
+        cache = CacheMetadatos(":memory:", **limites_cache)
+
+    portadas = None
+    if config['portadas']:
+        portadas = CachePortadas(
+            os.path.join(os.path.dirname(ARCHIVO_CONFIG), "cache_portadas"), config['lado_portada']
+        )
+
+    convertir = transcodificar_a_mp3
+    if config['normalizacion'] in ("etiquetas", "aplicar"):
+        convertir = functools.partial(
+            normalizar_a_mp3, modo=config['normalizacion'], objetivo_lufs=config['objetivo_lufs']
+        )
+
+    etapa = None
+    if config['transcodificacion_separada']:
+        etapa = EtapaTranscodificacion(config['procesos_transcodificacion'] or None, convertir=convertir)
+    descargado = {'archivos': 0, 'bytes': 0}
+    bloqueo_descargado = threading.Lock()
+    selector = opciones_ydl['format'] if callable(opciones_ydl['format']) else None
+    # Frente a lo que habría bajado 'bestaudio/best'
+    ahorro = {'bytes': 0, 'sin_recodificar': 0, 'recodificaciones_evitadas': 0}
+    se_recodifica_siempre = config['normalizacion'] == "aplicar"
+    politica = PoliticaReintentos(
+        config['intentos_maximos'], config['espera_base_segundos'], config['espera_maxima_segundos']
+    )
+
+    def anotar_ahorro(elegido, referencia, tamaño, duracion):
+        copia = codec_de(elegido) == CODEC_SIN_RECODIFICAR and not se_recodifica_siempre
+        bytes_referencia = bytes_estimados(referencia, duracion) if referencia is not elegido else None
+        with bloqueo_descargado:
+            if bytes_referencia:
+                ahorro['bytes'] += bytes_referencia - tamaño
+            if copia:
+                ahorro['sin_recodificar'] += 1
+                if codec_de(referencia) != CODEC_SIN_RECODIFICAR:
+                    ahorro['recodificaciones_evitadas'] += 1
+
+    def obtener_info(trabajo, ydl, clave):
+        # Extraer una sola vez (o reutilizar la caché); si SQLite falla se extrae sin caché
+        try:
+            info = cache.obtener(clave)
+        except sqlite3.Error as e:
+            registro.warning("Caché de metadatos no disponible para %s: %s", trabajo.url, e)
+            info = None
+        if info is not None:
+            info.setdefault('original_url', trabajo.url)
+            return info
+        with metricas.medir('extract_info'):
+            info = ydl.extract_info(trabajo.url, download=False, process=False)
+            if not info:
+                raise ValueError("No se pudo obtener información del video")
+        if info.get('_type', 'video') == 'video':
+            try:
+                cache.guardar(clave, ydl.sanitize_info(info, remove_private_keys=True))
+            except sqlite3.Error as e:
+                registro.warning("No se pudo guardar %s en la caché de metadatos: %s", trabajo.url, e)
+        return info
+
+    def invalidar_info(clave):
+        try:
+            cache.invalidar(clave)
+        except sqlite3.Error as e:
+            registro.warning("No se pudo invalidar %s en la caché de metadatos: %s", clave, e)
+
+    def descargar_por_segmentos(trabajo, ydl, info, host):
+        # Si el formato elegido es un archivo HTTP único y grande se baja antes por rangos;
+        # yt-dlp lo encuentra ya descargado y solo sigue con el posproceso
+        resuelto = ydl.process_ie_result(copy.deepcopy(info), download=False)
+        if (resuelto.get('requested_formats') or resuelto.get('fragments') or not resuelto.get('url')
+                or resuelto.get('protocol') not in ('http', 'https')):
+            return
+        umbral = config['umbral_segmentos_mb'] * 1024 * 1024
+        anunciado = resuelto.get('filesize') or resuelto.get('filesize_approx')
+        if anunciado and anunciado < umbral:
+            return
+        ruta = ydl.prepare_filename(resuelto)
+        if os.path.exists(ruta):
+            return
+        cabeceras = resuelto.get('http_headers') or {}
+        tamaño, acepta_rangos = sondear(resuelto['url'], cabeceras)
+        if not acepta_rangos or not tamaño or tamaño < umbral:
+            return
+
+        def al_avanzar(nuevos, descargados):
+            # Lo mismo que hook_progreso para yt-dlp: pausa/cancelación, límites y progreso
+            if trabajo.accion:
+                raise TrabajoInterrumpido(f"Descarga interrumpida: {trabajo.accion}")
+            trabajo.bytes_descargados = descargados
+            trabajo.porcentaje = descargados * 100.0 / tamaño
+            medidor_rendimiento.sumar(nuevos)
+            limitador_ancho_banda.consumir(nuevos)
+            if al_progresar:
+                al_progresar(trabajo)
+
+        descarga = DescargaSegmentada(resuelto['url'], ruta, tamaño, cabeceras, al_avanzar)
+        registro.info("Descarga segmentada de %s (%.0f MB, %d segmentos)", trabajo.url, tamaño / 1e6,
+                      config['segmentos_por_descarga'])
+        with limitador_conexiones.ocupar(host, config['segmentos_por_descarga']):
+            try:
+                descarga.descargar(config['segmentos_por_descarga'])
+            except RangosNoSoportados as e:
+                registro.info("Sin descarga segmentada para %s: %s", trabajo.url, e)
+                descarga.descartar()
+
+    def descargar_trabajo(trabajo, ydl):
+        # Los errores de red y de límite se reintentan con espera; el resto falla a la primera
+        def al_reintentar(error, tipo, espera):
+            trabajo.intentos += 1
+            trabajo.estado = "reintentando"
+            trabajo.error = str(error)
+            metricas.sumar_reintento()
+            registro.warning("Reintento %d de %s en %.1f s (%s): %s", trabajo.intentos, trabajo.url, espera, tipo, error)
+            if al_progresar:
+                al_progresar(trabajo)
+
+        return ejecutar_con_reintentos(
+            lambda: descargar_una_vez(trabajo, ydl),
+            host_de(trabajo.url), politica, interruptor_circuito, al_reintentar
+        )
+
+    def descargar_una_vez(trabajo, ydl):
+        trabajo.estado = "descargando"
+        trabajo.error = None
+        clave = clave_canonica(trabajo.url)
+        marca = time.monotonic()
+        info = obtener_info(trabajo, ydl, clave)
+        trabajo.titulo = info.get('title') or trabajo.url
+        trabajo.tiempos['extraccion'] = time.monotonic() - marca
+        if trabajo.accion:
+            raise TrabajoInterrumpido(f"Descarga interrumpida: {trabajo.accion}")
+        # La portada se descarga y recorta mientras baja el audio
+        miniatura = url_miniatura(info) if portadas else None
+        futuro_portada = portadas.solicitar(miniatura) if miniatura else None
+        if al_progresar:
+            al_progresar(trabajo)
+        host = host_de(info.get('webpage_url') or trabajo.url)
+        marca = time.monotonic()
+        # Sin etapa separada, la conversión de yt-dlp cuenta dentro de 'download'
+        try:
+            with metricas.medir('download'):
+                if config['segmentos_por_descarga'] > 1:
+                    descargar_por_segmentos(trabajo, ydl, info, host)
+                with limitador_conexiones.ocupar(host, config['fragmentos_concurrentes']):
+                    info = ydl.process_ie_result(info, download=True)
+        except Exception:
+            # Las URLs firmadas de la caché pueden haber caducado o estar ligadas a otra IP:
+            # el reintento (o reintentar fallidos) vuelve a extraer
+            if not trabajo.accion:
+                invalidar_info(clave)
+            raise
+        trabajo.tiempos['descarga'] = time.monotonic() - marca
+
+        ruta = (info.get('requested_downloads') or [{}])[0].get('filepath')
+        if ruta and os.path.exists(ruta):
+            tamaño = os.path.getsize(ruta)
+            metricas.sumar_bytes('download', tamaño)
+            with bloqueo_descargado:
+                descargado['archivos'] += 1
+                descargado['bytes'] += tamaño
+            elegido, referencia = selector.ultima() if selector else (None, None)
+            if elegido is not None:
+                anotar_ahorro(elegido, referencia, tamaño, info.get('duration'))
+
+        marca = time.monotonic()
+
+        def registrar(ruta_final=None):
+            if etapa is not None:
+                trabajo.tiempos['transcodificacion'] = time.monotonic() - marca
+                metricas.observar('postprocess', trabajo.tiempos['transcodificacion'],
+                                  os.path.getsize(ruta_final) if ruta_final and os.path.exists(ruta_final) else 0)
+            ruta_audio = ruta_final or ruta
+            if futuro_portada and ruta_audio and ruta_audio.lower().endswith(".mp3"):
+                try:
+                    with metricas.medir('cover_art'):
+                        incrustar_portada(ruta_audio, futuro_portada.result())
+                except Exception as e:
+                    registro.warning("Sin portada para %s: %s", trabajo.url, e)
+            # Registrar descarga exitosa
+            registrar_descarga(info['title'], trabajo.url, directorio_descarga, clave_canonica(trabajo.url, info),
+                               ruta_audio if config['indexar_biblioteca'] else None)
+
+        if etapa is None or not ruta:
+            if ruta and convertir is not transcodificar_a_mp3 and os.path.exists(ruta):
+                # Sin etapa separada yt-dlp no convirtió: se normaliza y codifica aquí, una sola vez
+                ruta = convertir(ruta, calidad or config['calidad_audio'])
+            registrar()
+            return None
+        # La conversión sigue en la etapa de CPU; este hilo pasa a la siguiente URL
+        def anotar_fallo(futuro):
+            if futuro.exception() is not None:
+                metricas.observar('postprocess', time.monotonic() - marca, error=True)
+
+        futuro = etapa.enviar(ruta, calidad or config['calidad_audio'], despues=registrar)
+        futuro.add_done_callback(anotar_fallo)
+        return futuro
+
+    def estimar_duracion(trabajo, ydl):
+        # Los mismos metadatos que usará la descarga, guardados en la caché
+        return obtener_info(trabajo, ydl, clave_canonica(trabajo.url)).get('duration')
+
+    with contextlib.ExitStack() as pila:
+        pila.callback(cache.cerrar)
+        if portadas:
+            pila.callback(portadas.cerrar)
+        if etapa:
+            pila.callback(etapa.cerrar)
+
+        contadores = {'omitidos': 0}
+        archivo = None
+        if config['omitir_descargados']:
+            archivo = obtener_archivo()
+            if config['escanear_directorio_destino']:
+                # Solo se releen las carpetas y archivos que cambiaron desde la última vez
+                biblioteca = obtener_biblioteca()
+                biblioteca.actualizar(directorio_descarga)
+                archivo.agregar(*biblioteca.claves(directorio_descarga))
+        claves_lote = set()
+        bloqueo_claves = threading.Lock()
+
+        # Cada URL queda en el diario al leerla de la entrada, antes de que el pool la tome:
+        # si el proceso muere, reanudar_pendientes conoce todo lo que faltaba
+        diario = obtener_diario()
+        ids_diario = collections.defaultdict(collections.deque)
+        bloqueo_diario = threading.Lock()
+
+        def anotar_en_diario(urls):
+            ids = diario.agregar_varios(urls, directorio_descarga, calidad or config['calidad_audio'])
+            with bloqueo_diario:
+                for url, id_trabajo in zip(urls, ids):
+                    ids_diario[url].append(id_trabajo)
+
+        def anotar_al_leer(urls):
+            for url in urls:
+                anotar_en_diario([url])
+                yield url
+
+        def tomar_id_diario(url):
+            with bloqueo_diario:
+                ids = ids_diario.get(url)
+                if not ids:
+                    return None
+                id_trabajo = ids.popleft()
+                if not ids:
+                    del ids_diario[url]
+                return id_trabajo
+
+        def cerrar_en_diario(url, estado):
+            id_trabajo = tomar_id_diario(url)
+            if id_trabajo is not None:
+                diario.actualizar(id_trabajo, estado)
+
+        def expandir_anotando(urls, ydl_plano):
+            for url in urls:
+                if not es_url_de_lista(url):
+                    yield url
+                    continue
+                yield from anotar_al_leer(expandir_listas([url], ydl_plano))
+                # Sus entradas ya están en el diario; si el proceso muere antes, se vuelve a abrir
+                cerrar_en_diario(url, "expandida")
+
+        def preparar(urls, ydl_plano):
+            # Abrir listas y omitir lo ya descargado o repetido antes de tocar la red
+            completa = isinstance(urls, (list, tuple))
+            if completa:
+                anotar_en_diario(urls)
+            else:
+                urls = anotar_al_leer(urls)
+            if ydl_plano is not None:
+                urls = expandir_anotando(urls, ydl_plano)
+            if archivo is not None:
+                urls = filtrar_pendientes(
+                    urls, archivo, contadores, claves_lote, bloqueo_claves,
+                    al_omitir=lambda url: cerrar_en_diario(url, "omitido")
+                )
+            # Filtrar una lista no toca la red: se resuelve ya para planificar el lote entero
+            return list(urls) if completa and ydl_plano is None else urls
+
+        def preparar_agregadas(urls):
+            # Otro hilo: YoutubeDL no se comparte entre hilos, así que cada tanda abre el suyo
+            if not config['expandir_listas']:
+                yield from preparar(urls, None)
+                return
+            with yt_dlp.YoutubeDL(dict(opciones_ydl, extract_flat='in_playlist', noplaylist=False)) as ydl_plano:
+                yield from preparar(urls, ydl_plano)
+
+        # Las listas se abren en este hilo mientras los trabajadores ya descargan
+        ydl_plano = None
+        if config['expandir_listas']:
+            ydl_plano = pila.enter_context(yt_dlp.YoutubeDL(
+                dict(opciones_ydl, extract_flat='in_playlist', noplaylist=False)
+            ))
+        pendientes = preparar(urls, ydl_plano)
+
+        def anotar_y_avisar(trabajo):
+            # Cada cambio de estado queda en el diario para poder reanudar tras un cierre
+            if trabajo.id_diario is None:
+                # Primer aviso (en cola): la fila ya se anotó al leer la URL
+                trabajo.id_diario = tomar_id_diario(trabajo.url)
+                if trabajo.id_diario is None:
+                    trabajo.id_diario = diario.agregar(
+                        trabajo.url, directorio_descarga, calidad or config['calidad_audio']
+                    )
+            else:
+                diario.actualizar(trabajo.id_diario, trabajo.estado, trabajo.error)
+            exportar_metricas(config)
+            if al_cambiar:
+                al_cambiar(trabajo, pool)
+
+        ruta_perfil = config['perfil_lote']
+        pool = PoolDescargas(
+            descargar_trabajo, config['descargas_paralelas'], anotar_y_avisar, crear_sesion,
+            perfilar=bool(ruta_perfil),
+            # Una lista pegada se planifica entera (orden, pausa y cancelación llegan a todo);
+            # las listas expandidas y las importaciones se leen a medida que hay sitio
+            capacidad=0 if isinstance(pendientes, list) else None,
+            mas_cortas_primero=config['mas_cortas_primero'],
+            estimar_duracion=estimar_duracion if config['mas_cortas_primero'] else None,
+            preparar=preparar_agregadas,
+        )
+        pool.ejecutar(pendientes)
+        diario.limpiar_terminados()
+
+    if ruta_perfil and pool.perfil:
+        pool.perfil.dump_stats(ruta_perfil)
+        registro.info("Perfil del lote guardado en %s", ruta_perfil)
+    exportar_metricas(config, forzar=True)
+
+    resumen = pool.resumen()
+    resumen['omitidos'] = contadores['omitidos']
+    for fallido in resumen['fallidos']:
+        fallido.update(directorio=directorio_descarga, calidad=calidad or config['calidad_audio'])
+    resumen['etapas'] = {
+        'descarga': dict(descargado),
+        'cache': {'aciertos': cache.aciertos, 'fallos': cache.fallos, 'invalidadas': cache.invalidadas},
+    }
+    if selector:
+        resumen['etapas']['formatos'] = dict(ahorro)
+        recodificados = etapa.archivos - ahorro['sin_recodificar'] if etapa else 0
+        if ahorro['recodificaciones_evitadas'] and recodificados > 0:
+            # Lo que costó de media cada conversión real de este lote
+            resumen['etapas']['formatos']['segundos_cpu_ahorrados'] = (
+                ahorro['recodificaciones_evitadas'] * etapa.segundos / recodificados
+            )
+    if portadas:
+        resumen['etapas']['portadas'] = {
+            'descargadas': portadas.descargadas, 'recortadas': portadas.recortadas,
+            'reutilizadas': portadas.reutilizadas
+        }
+    if etapa:
+        resumen['etapas']['transcodificacion'] = {
+            'archivos': etapa.archivos, 'segundos': etapa.segundos, 'procesos': etapa.procesos
+        }
+    return resumen
+
+def texto_etapas(resumen):
+    """Rendimiento por etapa del lote: MB/s descargados y archivos/min convertidos"""
+    etapas = resumen.get('etapas')
+    segundos = resumen.get('segundos') or 0
+    if not etapas or segundos <= 0:
+        return ""
+    partes = [f"descarga {etapas['descarga']['bytes'] / segundos / 1e6:.1f} MB/s"]
+    if 'transcodificacion' in etapas:
+        partes.append(f"transcodificación {etapas['transcodificacion']['archivos'] * 60 / segundos:.0f} archivos/min")
+    cache = etapas.get('cache')
+    if cache and cache['aciertos']:
+        partes.append(f"caché {cache['aciertos']}/{cache['aciertos'] + cache['fallos']} aciertos")
+    formatos = etapas.get('formatos')
+    if formatos and (formatos['bytes'] or formatos['sin_recodificar']):
+        detalles = []
+        if formatos['bytes']:
+            detalles.append(f"{abs(formatos['bytes']) / 1e6:.1f} MB {'menos' if formatos['bytes'] > 0 else 'más'}")
+        if formatos['sin_recodificar']:
+            detalles.append(f"{formatos['sin_recodificar']} sin recodificar")
+        if formatos.get('segundos_cpu_ahorrados'):
+            detalles.append(f"≈{formatos['segundos_cpu_ahorrados']:.0f} s de CPU menos")
+        partes.append("formatos " + ", ".join(detalles))
+    return " · " + ", ".join(partes)
+
+def combinar_resumenes(resumenes):
+    """Un solo resumen para varios lotes (p. ej. los bloques de una importación)"""
+    return {
+        "total": sum(r['total'] for r in resumenes),
+        "completados": sum(r['completados'] for r in resumenes),
+        "cancelados": sum(r.get('cancelados', 0) for r in resumenes),
+        "errores": [e for r in resumenes for e in r['errores']],
+        "fallidos": [f for r in resumenes for f in r.get('fallidos', ())],
+        "segundos": sum(r['segundos'] for r in resumenes),
+        "omitidos": sum(r.get('omitidos', 0) for r in resumenes),
+    }
+
+def texto_resumen(resumen):
+    """Línea de estado para el final de un lote"""
+    texto_omitidos = f" · {resumen['omitidos']} duplicadas omitidas" if resumen.get('omitidos') else ""
+    if resumen.get('cancelados'):
+        texto_omitidos += f" · {resumen['cancelados']} canceladas"
+    texto_omitidos += texto_etapas(resumen)
+    if resumen['errores']:
+        tipos = {}
+        for fallido in resumen.get('fallidos', ()):
+            tipos[fallido['tipo']] = tipos.get(fallido['tipo'], 0) + 1
+        texto_tipos = " (" + ", ".join(f"{n} {TIPOS_ERROR.get(t, t)}" for t, n in tipos.items()) + ")" if tipos else ""
+        return (
+            f"⚠ {resumen['completados']}/{resumen['total']} completadas, "
+            f"{len(resumen['errores'])} con error{texto_tipos} en {formatear_duracion(resumen['segundos'])}"
+            f"{texto_omitidos}"
+        )
+    if resumen.get('cancelados'):
+        return (
+            f"✓ {resumen['completados']}/{resumen['total']} completadas en "
+            f"{formatear_duracion(resumen['segundos'])}{texto_omitidos}"
+        )
+    return (
+        f"✓ Todas las descargas completadas exitosamente "
+        f"({resumen['total']} en {formatear_duracion(resumen['segundos'])}){texto_omitidos}"
+    )
+
+# =========================
+# Registro e Historial
+# =========================
+class RegistradorYDL:
+    """Adapta los mensajes de yt-dlp al logger 'descargador.yt_dlp'
+
+    yt-dlp manda por debug() tanto su depuración ('[debug] ...') y las líneas
+    de progreso como los mensajes informativos; sus avisos de reintento
+    (fragmentos, extractores) se cuentan aparte en las métricas.
+    """
+    registro = logging.getLogger("descargador.yt_dlp")
+
+    def debug(self, msg):
+        if msg.startswith("[debug] ") or (msg.startswith("[download] ") and "%" in msg):
+            self.registro.debug(msg)
+        else:
+            self.registro.info(msg)
+
+    def info(self, msg):
+        self.registro.info(msg)
+
+    def warning(self, msg):
+        if "Retrying" in msg:
+            metricas.sumar_reintento_yt_dlp()
+        if "URL could be a direct video link" not in msg:  # Ignorar advertencia común
+            self.registro.warning(msg)
+
+    def error(self, msg):
+        self.registro.error(msg)
+
+_historial = None
+_bloqueo_historial = threading.Lock()
+
+def obtener_historial():
+    """Abre (una sola vez) el historial SQLite y migra el JSON antiguo si existe"""
+    global _historial
+    with _bloqueo_historial:
+        if _historial is None:
+            directorio_config = os.path.dirname(ARCHIVO_CONFIG)
+            _historial = HistorialDescargas(os.path.join(directorio_config, "historial_descargas.sqlite"))
+            try:
+                _historial.migrar_json(os.path.join(directorio_config, "historial_descargas.json"))
+            except Exception:
+                pass
+        return _historial
+
+_archivo = None
+
+def obtener_archivo():
+    """Índice en memoria de videos ya descargados, cargado desde el historial"""
+    global _archivo
+    historial = obtener_historial()
+    with _bloqueo_historial:
+        if _archivo is None:
+            _archivo = ArchivoDescargas.desde_historial(historial)
+        return _archivo
+
+_diario = None
+
+def obtener_diario():
+    """Diario de trabajos junto a ARCHIVO_CONFIG, abierto una sola vez"""
+    global _diario
+    with _bloqueo_historial:
+        if _diario is None:
+            _diario = DiarioTrabajos(os.path.join(os.path.dirname(ARCHIVO_CONFIG), "diario_trabajos.sqlite"))
+        return _diario
+
+_biblioteca = None
+
+def obtener_biblioteca():
+    """Índice de la biblioteca musical junto a ARCHIVO_CONFIG, abierto una sola vez"""
+    global _biblioteca
+    with _bloqueo_historial:
+        if _biblioteca is None:
+            _biblioteca = BibliotecaMusical(os.path.join(os.path.dirname(ARCHIVO_CONFIG), "biblioteca.sqlite"))
+        return _biblioteca
+
+def reanudar_pendientes(config, al_cambiar=None, al_progresar=None):
+    """Vuelve a ejecutar los lotes que quedaron sin terminar y devuelve sus resúmenes
+
+    Las URLs completadas se omiten por el archivo de descargas; las demás
+    continúan desde su .part o desde el archivo ya descargado.
+    """
+    resumenes = []
+    diario = obtener_diario()
+    for directorio, calidad, urls, ids in diario.pendientes():
+        resumenes.append(ejecutar_lote(urls, directorio, config, calidad, al_cambiar, al_progresar))
+        diario.marcar_reanudados(ids)
+    return resumenes
+
+def importar_lista(lineas, directorio_descarga, config, calidad=None, al_cambiar=None, al_progresar=None):
+    """Descarga una lista larga leída como flujo; devuelve (informe de importación, resúmenes)
+
+    lineas puede ser un archivo abierto o stdin: se normaliza y deduplica
+    línea a línea y va a un solo lote como generador, que el pool lee a
+    medida que tiene sitio. Sin URLs válidas no hay lote ni resumen.
+    """
+    importador = ImportadorUrls()
+    urls = importador.urls(lineas)
+    primera = next(urls, None)
+    if primera is None:
+        return importador.informe(), []
+    resumen = ejecutar_lote(
+        itertools.chain([primera], urls), directorio_descarga, config, calidad, al_cambiar, al_progresar
+    )
+    return importador.informe(), [resumen]
+
+def reintentar_fallidos(fallidos, config, al_cambiar=None, al_progresar=None):
+    """Vuelve a lanzar las URLs con error de lotes anteriores, agrupadas por destino
+
+    fallidos es la lista resumen['fallidos'] de uno o varios lotes.
+    """
+    grupos = {}
+    for fallido in fallidos:
+        grupos.setdefault((fallido['directorio'], fallido['calidad']), []).append(fallido['url'])
+    return [
+        ejecutar_lote(list(dict.fromkeys(urls)), directorio, config, calidad, al_cambiar, al_progresar)
+        for (directorio, calidad), urls in grupos.items()
+    ]
+
+def texto_informe(resumenes):
+    """Informe de errores de uno o varios lotes ('' si no hubo errores)"""
+    return informe_errores([f for resumen in resumenes for f in resumen.get('fallidos', ())])
+
+def registrar_descarga(titulo, url, directorio, id_video=None, ruta=None):
+    """Registra descargas exitosas para historial (y en la biblioteca si se da la ruta)"""
+    try:
+        with metricas.medir('registrar_descarga'):
+            obtener_historial().registrar(titulo, url, directorio, id_video or clave_canonica(url))
+            obtener_archivo().agregar(id_video, clave_canonica(url))
+            if ruta and os.path.exists(ruta):
+                obtener_biblioteca().agregar(ruta, titulo, id_video or clave_canonica(url))
+    except Exception as e:
+        registro.error("No se pudo registrar %s en el historial: %s", url, e)
@@ -0,0 +1,107 @@
+import sqlite3
+import threading
+import time
+
+ESTADOS_PENDIENTES = ("en_cola", "pausado", "descargando", "reintentando", "procesando", "transcodificando")
+
+class DiarioTrabajos:
+    """Diario persistente del estado de cada trabajo de descarga
+
+    Cada cambio de estado se confirma en SQLite en el momento, así que si la
+    aplicación se cierra a mitad de un lote el diario sabe qué URLs faltan.
+    Al reanudar, los trabajos sin terminar se vuelven a encolar; yt-dlp
+    continúa los archivos .part y los que ya se descargaron pero no se
+    convirtieron van directos a la transcodificación.
+    """
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._bloqueo = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, timeout=30, check_same_thread=False)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.executescript("""
+            CREATE TABLE IF NOT EXISTS trabajos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL,
+                directorio TEXT NOT NULL,
+                calidad TEXT,
+                estado TEXT NOT NULL,
+                error TEXT,
+                creado REAL NOT NULL,
+                actualizado REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_trabajos_estado ON trabajos(estado);
+        """)
+        self._conexion.commit()
+
+    def agregar(self, url, directorio, calidad=None):
+        """Anota un trabajo nuevo en cola y devuelve su id"""
+        return self.agregar_varios([url], directorio, calidad)[0]
+
+    def agregar_varios(self, urls, directorio, calidad=None):
+        """Anota varios trabajos en cola en una sola transacción y devuelve sus ids en orden"""
+        ahora = time.time()
+        with self._bloqueo:
+            ids = [
+                self._conexion.execute(
+                    "INSERT INTO trabajos (url, directorio, calidad, estado, creado, actualizado) "
+                    "VALUES (?, ?, ?, 'en_cola', ?, ?)",
+                    (url, directorio, calidad, ahora, ahora)
+                ).lastrowid
+                for url in urls
+            ]
+            self._conexion.commit()
+            return ids
+
+    def actualizar(self, id_trabajo, estado, error=None):
+        with self._bloqueo:
+            self._conexion.execute(
+                "UPDATE trabajos SET estado = ?, error = ?, actualizado = ? WHERE id = ?",
+                (estado, error, time.time(), id_trabajo)
+            )
+            self._conexion.commit()
+
+    def pendientes(self):
+        """Trabajos sin terminar como [(directorio, calidad, urls, ids)]
+
+        Una URL que quedó pendiente dos veces (por ejemplo, tras interrumpir
+        también la reanudación) aparece una sola vez en urls, pero todos sus
+        ids se devuelven para poder marcarlos juntos.
+        """
+        marcadores = ",".join("?" * len(ESTADOS_PENDIENTES))
+        with self._bloqueo:
+            filas = self._conexion.execute(
+                f"SELECT id, url, directorio, calidad FROM trabajos WHERE estado IN ({marcadores}) ORDER BY id",
+                ESTADOS_PENDIENTES
+            ).fetchall()
+        grupos = {}
+        for id_trabajo, url, directorio, calidad in filas:
+            urls, ids = grupos.setdefault((directorio, calidad), ({}, []))
+            urls.setdefault(url, None)
+            ids.append(id_trabajo)
+        return [(directorio, calidad, list(urls), ids) for (directorio, calidad), (urls, ids) in grupos.items()]
+
+    def marcar_reanudados(self, ids):
+        """Marca como 'reanudado' los trabajos viejos cuyo lote ya se volvió a ejecutar
+
+        Se llama cuando termina el lote de reanudación, no antes: si ese lote
+        también se interrumpe, los trabajos originales siguen pendientes.
+        """
+        ahora = time.time()
+        with self._bloqueo:
+            self._conexion.executemany(
+                "UPDATE trabajos SET estado = 'reanudado', actualizado = ? WHERE id = ?",
+                [(ahora, id_trabajo) for id_trabajo in ids]
+            )
+            self._conexion.commit()
+
+    def limpiar_terminados(self):
+        """Borra los trabajos terminados sin error (y las URLs omitidas o ya expandidas); los errores se conservan"""
+        with self._bloqueo:
+            self._conexion.execute(
+                "DELETE FROM trabajos WHERE estado IN ('completado', 'cancelado', 'reanudado', 'omitido', 'expandida')"
+            )
+            self._conexion.commit()
+
+    def cerrar(self):
+        with self._bloqueo:
+            self._conexion.close()
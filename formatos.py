@@ -0,0 +1,107 @@
+import math
+import threading
+
+# Calidad percibida por kbps respecto a MP3: un AAC de 128 kbps suena como un
+# MP3 de unos 166. Valores conservadores, porque después se recodifica.
+EFICIENCIA_CODEC = {
+    "mp3": 1.0,
+    "aac": 1.3,
+    "vorbis": 1.3,
+    "opus": 1.5,
+    "flac": math.inf,
+    "alac": math.inf,
+    "pcm": math.inf,
+}
+CODEC_POR_EXTENSION = {"mp3": "mp3", "m4a": "aac", "aac": "aac", "ogg": "vorbis", "opus": "opus",
+                       "webm": "opus", "flac": "flac", "wav": "pcm"}
+CODEC_SIN_RECODIFICAR = "mp3"  # la salida es MP3: solo esa entrada se copia tal cual
+
+def codec_de(formato):
+    """Familia del códec de audio de un formato de yt-dlp (mp3, aac, opus...) o None"""
+    acodec = (formato.get("acodec") or "").lower()
+    if acodec in ("", "none"):
+        return None if acodec == "none" else CODEC_POR_EXTENSION.get(formato.get("ext"))
+    if acodec.startswith("mp4a") or acodec == "aac":
+        return "aac"
+    if acodec.startswith("pcm"):
+        return "pcm"
+    return acodec.split(".")[0]
+
+def kbps_de(formato):
+    """Bitrate de audio en kbps; el total solo cuenta si el formato no trae video"""
+    if formato.get("abr"):
+        return formato["abr"]
+    if formato.get("vcodec") == "none":
+        return formato.get("tbr")
+    return None
+
+def calidad_efectiva(formato):
+    """kbps de MP3 equivalentes, o None si no se sabe el bitrate"""
+    kbps = kbps_de(formato)
+    eficiencia = EFICIENCIA_CODEC.get(codec_de(formato))
+    if eficiencia == math.inf:
+        return math.inf
+    if not kbps or eficiencia is None:
+        return None
+    return kbps * eficiencia
+
+def bytes_estimados(formato, duracion):
+    """Tamaño del formato según yt-dlp o, si no lo da, por bitrate y duración"""
+    tamaño = formato.get("filesize") or formato.get("filesize_approx")
+    if tamaño:
+        return tamaño
+    kbps = formato.get("abr") or formato.get("tbr")
+    return int(kbps * 125 * duracion) if kbps and duracion else None
+
+def elegir_formato(formatos, objetivo_kbps):
+    """(elegido, referencia) entre los formatos de yt-dlp para un MP3 de objetivo_kbps
+
+    referencia es el que tomaría 'bestaudio/best'. De los que alcanzan el
+    objetivo se prefiere uno MP3, que no hay que recodificar, y entre
+    iguales el de menor bitrate: el archivo más pequeño que basta. Si
+    ninguno llega, el de mayor calidad efectiva. yt-dlp entrega la lista
+    de peor a mejor, así que a igualdad decide su orden.
+    """
+    con_audio = [f for f in formatos if f.get("acodec") != "none"]
+    solo_audio = [f for f in con_audio if f.get("vcodec") == "none"]
+    candidatos = solo_audio or con_audio
+    if not candidatos:
+        return None, None
+    referencia = candidatos[-1]
+    posicion = {id(f): i for i, f in enumerate(candidatos)}
+
+    def prefiere_directo(f):
+        # A igual calidad, una descarga HTTP directa antes que HLS/DASH por fragmentos
+        return 0 if (f.get("protocol") or "https").startswith("http") else 1
+
+    alcanzan = [f for f in candidatos if (calidad_efectiva(f) or 0) >= objetivo_kbps]
+    if alcanzan:
+        elegido = min(alcanzan, key=lambda f: (
+            codec_de(f) != CODEC_SIN_RECODIFICAR, kbps_de(f) or math.inf, prefiere_directo(f), -posicion[id(f)]
+        ))
+    else:
+        elegido = max(candidatos, key=lambda f: (calidad_efectiva(f) or -1, -prefiere_directo(f), posicion[id(f)]))
+    return elegido, referencia
+
+class SelectorFormatos:
+    """Selector para la opción 'format' de yt-dlp que puntúa por códec, bitrate y tamaño
+
+    yt-dlp lo llama en el hilo que descarga; la última elección de cada hilo
+    queda en ultima() para que el lote sume bytes y recodificaciones
+    ahorrados frente a 'bestaudio/best'.
+    """
+    def __init__(self, objetivo_kbps):
+        self.objetivo_kbps = float(objetivo_kbps)
+        self._local = threading.local()
+
+    def __call__(self, ctx):
+        elegido, referencia = elegir_formato(ctx["formats"], self.objetivo_kbps)
+        self._local.ultima = (elegido, referencia)
+        if elegido is not None:
+            yield elegido
+
+    def ultima(self):
+        """(elegido, referencia) de la última selección en este hilo, y la olvida"""
+        ultima = getattr(self._local, "ultima", (None, None))
+        self._local.ultima = (None, None)
+        return ultima
@@ -0,0 +1,116 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from utilidades_url import clave_canonica
+
+class HistorialDescargas:
+    """Historial de descargas en SQLite, de solo inserción y con índices
+
+    Reemplaza al antiguo historial_descargas.json: cada descarga es una fila
+    nueva, así que registrar cuesta lo mismo con diez entradas que con cien
+    mil, y un cierre inesperado no puede dejar el archivo a medio escribir.
+    El modo WAL permite que varios hilos o procesos escriban a la vez.
+    """
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._bloqueo = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, timeout=30, check_same_thread=False)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.executescript("""
+            CREATE TABLE IF NOT EXISTS descargas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fecha TEXT NOT NULL,
+                titulo TEXT,
+                url TEXT NOT NULL,
+                id_video TEXT,
+                directorio TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_descargas_url ON descargas(url);
+            CREATE INDEX IF NOT EXISTS idx_descargas_id_video ON descargas(id_video);
+            CREATE INDEX IF NOT EXISTS idx_descargas_fecha ON descargas(fecha);
+            CREATE INDEX IF NOT EXISTS idx_descargas_directorio ON descargas(directorio);
+        """)
+        self._conexion.commit()
+
+    def registrar(self, titulo, url, directorio, id_video=None, fecha=None):
+        """Añade una descarga al historial"""
+        with self._bloqueo:
+            self._conexion.execute(
+                "INSERT INTO descargas (fecha, titulo, url, id_video, directorio) VALUES (?, ?, ?, ?, ?)",
+                (fecha or datetime.now().isoformat(), titulo, url, id_video, directorio)
+            )
+            self._conexion.commit()
+
+    def migrar_json(self, ruta_json):
+        """Importa un historial_descargas.json antiguo y lo renombra a .migrado
+
+        Devuelve el número de entradas importadas. Si el archivo no existe
+        no hace nada, así que es seguro llamarlo en cada arranque.
+        """
+        if not os.path.exists(ruta_json):
+            return 0
+        with open(ruta_json, 'r') as f:
+            entradas = json.load(f)
+
+        filas = [
+            (e.get("fecha") or datetime.now().isoformat(), e.get("titulo"), e.get("url", ""),
+             clave_canonica(e.get("url", "")), e.get("directorio"))
+            for e in entradas if isinstance(e, dict)
+        ]
+        with self._bloqueo:
+            with self._conexion:
+                self._conexion.executemany(
+                    "INSERT INTO descargas (fecha, titulo, url, id_video, directorio) VALUES (?, ?, ?, ?, ?)",
+                    filas
+                )
+        os.replace(ruta_json, ruta_json + ".migrado")
+        return len(filas)
+
+    def _consultar(self, sql, parametros=()):
+        with self._bloqueo:
+            cursor = self._conexion.execute(sql, parametros)
+            columnas = [c[0] for c in cursor.description]
+            return [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+
+    def recientes(self, limite=50):
+        """Últimas descargas, de la más nueva a la más antigua"""
+        return self._consultar(
+            "SELECT fecha, titulo, url, id_video, directorio FROM descargas ORDER BY fecha DESC LIMIT ?",
+            (limite,)
+        )
+
+    def buscar_por_url(self, url):
+        """Todas las descargas de una URL exacta"""
+        return self._consultar(
+            "SELECT fecha, titulo, url, id_video, directorio FROM descargas WHERE url = ? ORDER BY fecha DESC",
+            (url,)
+        )
+
+    def buscar_por_id_video(self, id_video):
+        """Todas las descargas de un video, sin importar la variante de URL"""
+        return self._consultar(
+            "SELECT fecha, titulo, url, id_video, directorio FROM descargas WHERE id_video = ? ORDER BY fecha DESC",
+            (id_video,)
+        )
+
+    def claves_video(self):
+        """Conjunto de todos los id_video registrados"""
+        with self._bloqueo:
+            return {fila[0] for fila in self._conexion.execute(
+                "SELECT DISTINCT id_video FROM descargas WHERE id_video IS NOT NULL"
+            )}
+
+    def estadisticas_por_directorio(self):
+        """Número de descargas y fecha de la última por cada directorio"""
+        return self._consultar(
+            "SELECT directorio, COUNT(*) AS descargas, MAX(fecha) AS ultima "
+            "FROM descargas GROUP BY directorio ORDER BY descargas DESC"
+        )
+
+    def cerrar(self):
+        with self._bloqueo:
+            self._conexion.close()
@@ -0,0 +1,84 @@
+import re
+
+from utilidades_url import PATRON_ID_YOUTUBE, extraer_id_video, url_canonica
+
+# Una línea puede traer varias URLs (CSV, texto pegado); lo demás se descarta
+PATRON_URL_EN_LINEA = re.compile(r'(?:https?://|(?:www\.|m\.|music\.)?youtu(?:\.be|be\.com)/)[^\s,;"\'<>]+')
+MAX_RECHAZADAS_EN_INFORME = 20
+
+class ImportadorUrls:
+    """Normaliza y deduplica una lista de URLs a medida que se lee
+
+    urls() consume las líneas de cualquier iterable (un archivo abierto,
+    stdin) sin cargarlo entero y genera cada URL canónica una sola vez:
+    youtu.be, music., shorts/ y las variantes con parámetros de rastreo
+    cuentan como duplicadas. En memoria solo queda el conjunto de claves ya
+    vistas. Una línea con solo un id de YouTube también vale.
+    """
+    def __init__(self):
+        self._vistas = set()
+        self.validas = 0
+        self.duplicadas = 0
+        self.rechazadas = 0
+        self.ejemplos_rechazadas = []
+
+    def _rechazar(self, numero_linea, texto):
+        self.rechazadas += 1
+        if len(self.ejemplos_rechazadas) < MAX_RECHAZADAS_EN_INFORME:
+            self.ejemplos_rechazadas.append((numero_linea, texto[:200]))
+
+    def urls(self, lineas):
+        """Genera las URLs nuevas, ya canónicas, de un iterable de líneas"""
+        for numero_linea, linea in enumerate(lineas, 1):
+            linea = linea.strip()
+            if not linea or linea.startswith("#"):
+                continue
+            candidatas = PATRON_URL_EN_LINEA.findall(linea)
+            if not candidatas and PATRON_ID_YOUTUBE.match(linea):
+                candidatas = [f"https://youtu.be/{linea}"]
+            if not candidatas:
+                self._rechazar(numero_linea, linea)
+                continue
+            for candidata in candidatas:
+                # Un solo análisis por URL: la clave de un video sale directa de su id
+                id_video = extraer_id_video(candidata)
+                if id_video:
+                    url, clave = f"https://www.youtube.com/watch?v={id_video}", f"youtube:{id_video}"
+                else:
+                    url = clave = url_canonica(candidata)
+                if url is None:
+                    self._rechazar(numero_linea, candidata)
+                    continue
+                if clave in self._vistas:
+                    self.duplicadas += 1
+                    continue
+                self._vistas.add(clave)
+                self.validas += 1
+                yield url
+
+    def informe(self):
+        """Recuento de la importación hasta ahora"""
+        return {
+            "validas": self.validas,
+            "duplicadas": self.duplicadas,
+            "rechazadas": self.rechazadas,
+            "ejemplos_rechazadas": list(self.ejemplos_rechazadas),
+        }
+
+def en_bloques(iterable, tamaño):
+    """Agrupa un iterable en listas de como mucho `tamaño` elementos, sin leerlo entero"""
+    bloque = []
+    for elemento in iterable:
+        bloque.append(elemento)
+        if len(bloque) >= tamaño:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+def texto_importacion(informe):
+    """Línea de resumen de una importación"""
+    return (
+        f"{informe['validas']} URLs válidas, {informe['duplicadas']} duplicadas, "
+        f"{informe['rechazadas']} líneas rechazadas"
+    )
@@ -0,0 +1,102 @@
+import collections
+import contextlib
+import threading
+import time
+
+class CuboTokens:
+    """Limitador de ancho de banda compartido por todos los hilos del proceso
+
+    Los hilos de descarga llaman a consumir() con los bytes que acaban de
+    recibir; si se agotó el cupo, el hilo duerme hasta que el cubo se
+    rellena. Con tasa 0 no se limita nada.
+    """
+    def __init__(self, tasa=0, rafaga_segundos=1.0):
+        self._bloqueo = threading.Lock()
+        self.rafaga_segundos = rafaga_segundos
+        self.ajustar(tasa)
+
+    def ajustar(self, tasa):
+        """Cambia la tasa en bytes por segundo (0 = sin límite)"""
+        with self._bloqueo:
+            self.tasa = max(0, tasa)
+            self.capacidad = self.tasa * self.rafaga_segundos
+            self._tokens = self.capacidad
+            self._ultima = time.monotonic()
+
+    def consumir(self, cantidad):
+        """Descuenta cantidad bytes, esperando lo necesario para respetar la tasa"""
+        if cantidad <= 0:
+            return
+        with self._bloqueo:
+            if not self.tasa:
+                return
+            ahora = time.monotonic()
+            self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultima) * self.tasa)
+            self._ultima = ahora
+            # Se permite quedar en negativo: la deuda se paga durmiendo fuera del bloqueo
+            self._tokens -= cantidad
+            espera = -self._tokens / self.tasa if self._tokens < 0 else 0.0
+        if espera:
+            time.sleep(espera)
+
+class LimitadorConexiones:
+    """Máximo de conexiones simultáneas por host, repartido entre trabajos
+
+    Cada trabajo pide tantas unidades como conexiones va a abrir (por ejemplo
+    los fragmentos concurrentes de yt-dlp). Con máximo 0 no se limita nada.
+    """
+    def __init__(self, maximo_por_host=0):
+        self.maximo_por_host = maximo_por_host
+        self._condicion = threading.Condition()
+        self._en_uso = collections.Counter()
+
+    def ajustar(self, maximo_por_host):
+        with self._condicion:
+            self.maximo_por_host = max(0, maximo_por_host)
+            self._condicion.notify_all()
+
+    @contextlib.contextmanager
+    def ocupar(self, host, conexiones=1):
+        """Bloquea hasta que host tenga sitio para `conexiones` y las libera al salir"""
+        with self._condicion:
+            if self.maximo_por_host:
+                # Un trabajo que pide más que el máximo entra solo, en vez de esperar siempre
+                conexiones = min(conexiones, self.maximo_por_host)
+                self._condicion.wait_for(
+                    lambda: not self.maximo_por_host
+                    or self._en_uso[host] + conexiones <= self.maximo_por_host
+                )
+            self._en_uso[host] += conexiones
+        try:
+            yield
+        finally:
+            with self._condicion:
+                self._en_uso[host] -= conexiones
+                if self._en_uso[host] <= 0:
+                    del self._en_uso[host]
+                self._condicion.notify_all()
+
+class MedidorRendimiento:
+    """Bytes por segundo agregados de todas las descargas en una ventana móvil"""
+    def __init__(self, ventana_segundos=3.0):
+        self.ventana_segundos = ventana_segundos
+        self._bloqueo = threading.Lock()
+        self._muestras = collections.deque()
+        self._total = 0
+
+    def sumar(self, cantidad):
+        ahora = time.monotonic()
+        with self._bloqueo:
+            self._muestras.append((ahora, cantidad))
+            self._total += cantidad
+            self._descartar(ahora)
+
+    def _descartar(self, ahora):
+        while self._muestras and ahora - self._muestras[0][0] > self.ventana_segundos:
+            self._total -= self._muestras.popleft()[1]
+
+    def tasa(self):
+        """Bytes por segundo en la ventana reciente"""
+        with self._bloqueo:
+            self._descartar(time.monotonic())
+            return self._total / self.ventana_segundos
@@ -0,0 +1,126 @@
+import collections
+import contextlib
+import json
+import os
+import threading
+import time
+
+ETAPAS = ("extract_info", "download", "postprocess", "registrar_descarga")
+CUANTILES = (0.5, 0.9, 0.99)
+
+class MetricasEtapas:
+    """Duraciones, bytes, reintentos y errores por etapa del pipeline
+
+    Los contadores son acumulados desde que arrancó el proceso; los
+    cuantiles se calculan sobre las últimas `ventana` observaciones de cada
+    etapa. exportar() escribe la foto actual como JSON y como texto de
+    Prometheus (apto para el textfile collector de node_exporter).
+    """
+    def __init__(self, ventana=1000):
+        self._bloqueo = threading.Lock()
+        self._duraciones = collections.defaultdict(lambda: collections.deque(maxlen=ventana))
+        self._conteos = collections.Counter()
+        self._sumas = collections.Counter()
+        self._bytes = collections.Counter()
+        self._errores = collections.Counter()
+        self.reintentos = 0  # los de PoliticaReintentos en el pipeline
+        self.reintentos_yt_dlp = 0  # los internos de yt-dlp, que el pipeline no ve
+
+    def observar(self, etapa, segundos, bytes_=0, error=False):
+        with self._bloqueo:
+            self._duraciones[etapa].append(segundos)
+            self._conteos[etapa] += 1
+            self._sumas[etapa] += segundos
+            self._bytes[etapa] += bytes_
+            if error:
+                self._errores[etapa] += 1
+
+    @contextlib.contextmanager
+    def medir(self, etapa):
+        """Mide el bloque como una observación de la etapa; cuenta el error si lanza"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.observar(etapa, time.perf_counter() - inicio, error=True)
+            raise
+        self.observar(etapa, time.perf_counter() - inicio)
+
+    def sumar_bytes(self, etapa, cantidad):
+        with self._bloqueo:
+            self._bytes[etapa] += cantidad
+
+    def sumar_reintento(self):
+        with self._bloqueo:
+            self.reintentos += 1
+
+    def sumar_reintento_yt_dlp(self):
+        with self._bloqueo:
+            self.reintentos_yt_dlp += 1
+
+    def foto(self):
+        """Estado actual como dict serializable"""
+        with self._bloqueo:
+            etapas = {}
+            for etapa in sorted(set(ETAPAS) | set(self._conteos)):
+                recientes = sorted(self._duraciones.get(etapa, ()))
+                etapas[etapa] = {
+                    "conteo": self._conteos[etapa],
+                    "segundos_total": round(self._sumas[etapa], 6),
+                    "bytes_total": self._bytes[etapa],
+                    "errores_total": self._errores[etapa],
+                    "cuantiles": {
+                        str(q): round(recientes[min(len(recientes) - 1, int(q * len(recientes)))], 6)
+                        for q in CUANTILES
+                    } if recientes else {},
+                }
+            return {
+                "generado": time.time(),
+                "reintentos_total": self.reintentos,
+                "reintentos_yt_dlp_total": self.reintentos_yt_dlp,
+                "etapas": etapas,
+            }
+
+    def texto_prometheus(self, foto=None):
+        """Foto en formato de exposición de texto de Prometheus"""
+        foto = foto or self.foto()
+        lineas = [
+            "# HELP descargador_etapa_segundos Duración de cada etapa del pipeline.",
+            "# TYPE descargador_etapa_segundos summary",
+        ]
+        for etapa, datos in foto["etapas"].items():
+            for q, valor in datos["cuantiles"].items():
+                lineas.append(f'descargador_etapa_segundos{{etapa="{etapa}",quantile="{q}"}} {valor}')
+            lineas.append(f'descargador_etapa_segundos_sum{{etapa="{etapa}"}} {datos["segundos_total"]}')
+            lineas.append(f'descargador_etapa_segundos_count{{etapa="{etapa}"}} {datos["conteo"]}')
+        lineas += [
+            "# HELP descargador_etapa_bytes_total Bytes procesados por etapa.",
+            "# TYPE descargador_etapa_bytes_total counter",
+        ]
+        lineas += [f'descargador_etapa_bytes_total{{etapa="{e}"}} {d["bytes_total"]}' for e, d in foto["etapas"].items()]
+        lineas += [
+            "# HELP descargador_etapa_errores_total Observaciones que terminaron en error.",
+            "# TYPE descargador_etapa_errores_total counter",
+        ]
+        lineas += [f'descargador_etapa_errores_total{{etapa="{e}"}} {d["errores_total"]}' for e, d in foto["etapas"].items()]
+        lineas += [
+            "# HELP descargador_reintentos_total Reintentos de descarga tras un error de red o de límite.",
+            "# TYPE descargador_reintentos_total counter",
+            f"descargador_reintentos_total {foto['reintentos_total']}",
+            "# HELP descargador_reintentos_yt_dlp_total Reintentos internos de yt-dlp (fragmentos, extractores).",
+            "# TYPE descargador_reintentos_yt_dlp_total counter",
+            f"descargador_reintentos_yt_dlp_total {foto['reintentos_yt_dlp_total']}",
+        ]
+        return "\n".join(lineas) + "\n"
+
+    def exportar(self, ruta_json, ruta_prometheus):
+        """Escribe ambos archivos de forma atómica (temporal + os.replace)"""
+        foto = self.foto()
+        for ruta, contenido in (
+            (ruta_json, json.dumps(foto, indent=2)),
+            (ruta_prometheus, self.texto_prometheus(foto)),
+        ):
+            temporal = ruta + ".tmp"
+            with open(temporal, "w", encoding="utf-8") as archivo:
+                archivo.write(contenido)
+            os.replace(temporal, ruta)
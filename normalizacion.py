@@ -0,0 +1,121 @@
+import logging
+import math
+import subprocess
+
+from transcodificacion import transcodificar_a_mp3
+
+# numpy se importa al medir la primera pista: la etapa es opcional
+
+FRECUENCIA = 48000
+SEGUNDOS_POR_LECTURA = 10
+REFERENCIA_REPLAYGAIN = -18.0  # LUFS, la de ReplayGain 2.0
+PICO_MAXIMO_DB = -1.0  # margen que se deja al aplicar ganancia
+
+# Ponderación K de EBU R128 (estante alto + paso alto) con los filtros de ffmpeg;
+# el audio sin filtrar va en los canales 0-1 (pico) y el ponderado en 2-3
+FILTRO_ANALISIS = (
+    "[0:a:0]aresample={frecuencia},aformat=sample_fmts=flt:channel_layouts=stereo,asplit=2[original][k];"
+    "[k]highshelf=f=1681.97:g=4:t=q:w=0.7072,highpass=f=38.13:t=q:w=0.5[ponderado];"
+    "[original][ponderado]amerge=inputs=2[salida]"
+)
+
+registro = logging.getLogger("descargador.normalizacion")
+
+def medir_flujo(flujo, frecuencia=FRECUENCIA, segundos_por_lectura=SEGUNDOS_POR_LECTURA):
+    """Sonoridad integrada (LUFS) y pico de un flujo PCM float32 de 4 canales
+
+    Lee bloques de tamaño fijo, así que la memoria no depende de la
+    duración: de cada lectura solo se guarda la potencia de cada tramo de
+    100 ms (un float, 36 000 por hora). Al final se arman los bloques de
+    400 ms con solape del 75 % y se aplican las puertas absoluta (-70 LUFS)
+    y relativa (-10 LU) de EBU R128.
+    """
+    import numpy as np
+
+    paso = frecuencia // 10
+    bytes_por_lectura = frecuencia * segundos_por_lectura * 4 * 4
+    potencias = []
+    resto = np.empty((0, 2), dtype=np.float32)
+    pico = 0.0
+    muestras_totales = 0
+    while True:
+        datos = flujo.read(bytes_por_lectura)
+        if not datos:
+            break
+        muestras = np.frombuffer(datos, dtype="<f4", count=len(datos) // 16 * 4).reshape(-1, 4)
+        if not len(muestras):
+            continue
+        muestras_totales += len(muestras)
+        pico = max(pico, float(np.abs(muestras[:, :2]).max()))
+        ponderadas = np.concatenate((resto, muestras[:, 2:])) if len(resto) else muestras[:, 2:]
+        completas = len(ponderadas) // paso * paso
+        cuadrados = np.square(ponderadas[:completas], dtype=np.float64)
+        potencias.append(cuadrados.reshape(-1, paso, 2).mean(axis=1).sum(axis=1))
+        resto = ponderadas[completas:]
+
+    resultado = {
+        "lufs": None,
+        "pico": pico,
+        "pico_db": 20 * math.log10(pico) if pico > 0 else -math.inf,
+        "segundos": muestras_totales / frecuencia,
+    }
+    tramos = np.concatenate(potencias) if potencias else np.empty(0)
+    if len(tramos) < 4:
+        return resultado
+    bloques = np.convolve(tramos, np.full(4, 0.25), mode="valid")
+    sonoridad = -0.691 + 10 * np.log10(np.maximum(bloques, 1e-20))
+    sobre_absoluta = sonoridad > -70
+    if not sobre_absoluta.any():
+        return resultado
+    umbral_relativo = -0.691 + 10 * math.log10(bloques[sobre_absoluta].mean()) - 10
+    resultado["lufs"] = -0.691 + 10 * math.log10(bloques[sobre_absoluta & (sonoridad > umbral_relativo)].mean())
+    return resultado
+
+def analizar_volumen(ruta):
+    """Decodifica la pista con ffmpeg por un pipe y la mide con medir_flujo()"""
+    proceso = subprocess.Popen(
+        ["ffmpeg", "-v", "error", "-i", ruta, "-vn",
+         "-filter_complex", FILTRO_ANALISIS.format(frecuencia=FRECUENCIA),
+         "-map", "[salida]", "-f", "f32le", "pipe:1"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    try:
+        resultado = medir_flujo(proceso.stdout)
+    finally:
+        proceso.stdout.close()
+        error = proceso.stderr.read()
+        proceso.stderr.close()
+        proceso.wait()
+    if proceso.returncode != 0:
+        detalle = error.decode("utf-8", "replace").strip().splitlines()
+        raise RuntimeError(f"ffmpeg falló al analizar: {detalle[-1] if detalle else proceso.returncode}")
+    return resultado
+
+def ganancia_hacia(medida, objetivo_lufs):
+    """dB para llevar la pista al objetivo sin que el pico pase de PICO_MAXIMO_DB"""
+    if medida["lufs"] is None:
+        return 0.0
+    return min(objetivo_lufs - medida["lufs"], PICO_MAXIMO_DB - medida["pico_db"])
+
+def normalizar_a_mp3(ruta_entrada, calidad, modo="etiquetas", objetivo_lufs=-14.0):
+    """Mide la pista y la convierte a MP3 con etiquetas ReplayGain o con la ganancia aplicada
+
+    Es un reemplazo de transcodificar_a_mp3 para la etapa de CPU: la
+    ganancia se aplica en la misma codificación, sin una pasada extra. Si la
+    medida falla (p. ej. sin numpy) se convierte sin normalizar.
+    """
+    try:
+        medida = analizar_volumen(ruta_entrada)
+    except Exception as e:
+        registro.warning("No se pudo medir el volumen de %s: %s", ruta_entrada, e)
+        return transcodificar_a_mp3(ruta_entrada, calidad)
+    if medida["lufs"] is None:
+        return transcodificar_a_mp3(ruta_entrada, calidad)
+
+    registro.info("%s: %.1f LUFS, pico %.1f dBFS", ruta_entrada, medida["lufs"], medida["pico_db"])
+    if modo == "aplicar":
+        return transcodificar_a_mp3(ruta_entrada, calidad, filtro=f"volume={ganancia_hacia(medida, objetivo_lufs):.2f}dB")
+    return transcodificar_a_mp3(ruta_entrada, calidad, metadatos={
+        "REPLAYGAIN_TRACK_GAIN": f"{REFERENCIA_REPLAYGAIN - medida['lufs']:.2f} dB",
+        "REPLAYGAIN_TRACK_PEAK": f"{medida['pico']:.6f}",
+    })
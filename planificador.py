@@ -0,0 +1,107 @@
+import itertools
+import math
+import threading
+
+class TrabajoInterrumpido(Exception):
+    """El usuario pausó o canceló un trabajo mientras se descargaba"""
+
+class PlanificadorTrabajos:
+    """Cola de trabajos por prioridad, con pausa y cancelación
+
+    capacidad acota los trabajos listos que poner() admite (0 = sin límite).
+    """
+    def __init__(self, capacidad=0, mas_cortas_primero=False):
+        # Con capacidad los generadores se leen a medida que hay sitio
+        self.capacidad = capacidad
+        self.mas_cortas_primero = mas_cortas_primero
+        self.terminado = False
+        self._listos = {}  # trabajo -> orden de llegada
+        self._pausados = set()
+        self._en_curso = 0
+        self._cerrado = False
+        self._llegadas = itertools.count()
+        self._condicion = threading.Condition()
+
+    def _clave(self, trabajo):
+        # A igual prioridad, lo corto primero baja la espera media por pista sin alargar el lote;
+        # los que aún no tienen duración van detrás y el desempate es el orden de llegada
+        orden = 0
+        if self.mas_cortas_primero:
+            orden = math.inf if trabajo.duracion_estimada is None else trabajo.duracion_estimada
+        return -trabajo.prioridad, orden, self._listos[trabajo]
+
+    def poner(self, trabajo, esperar=True):
+        """Encola un trabajo; devuelve False si el lote ya terminó"""
+        with self._condicion:
+            if esperar and self.capacidad:
+                self._condicion.wait_for(lambda: len(self._listos) < self.capacidad)
+            if self.terminado:
+                return False
+            self._listos[trabajo] = next(self._llegadas)
+            self._condicion.notify_all()
+            return True
+
+    def tomar(self):
+        """El siguiente trabajo a descargar, o None cuando el lote terminó (bloquea)"""
+        with self._condicion:
+            # Los pausados mantienen el lote abierto hasta reanudarlos o cancelarlos
+            self._condicion.wait_for(
+                lambda: self._listos or (self._cerrado and not self._pausados and not self._en_curso)
+            )
+            if not self._listos:
+                self.terminado = True
+                self._condicion.notify_all()
+                return None
+            # Un mínimo lineal basta para lotes de cientos y, como la prioridad se lee aquí,
+            # cambiarla en caliente no obliga a reordenar nada
+            trabajo = min(self._listos, key=self._clave)
+            del self._listos[trabajo]
+            self._en_curso += 1
+            self._condicion.notify_all()
+            return trabajo
+
+    def hecho(self):
+        """El trabajo tomado dejó el hilo de descarga (terminado, aparcado o en otra etapa)"""
+        with self._condicion:
+            self._en_curso -= 1
+            self._condicion.notify_all()
+
+    def pausar(self, trabajo):
+        """Saca de la cola un trabajo listo; False si no estaba esperando"""
+        with self._condicion:
+            if self._listos.pop(trabajo, None) is None:
+                return False
+            self._pausados.add(trabajo)
+            self._condicion.notify_all()
+            return True
+
+    def aparcar(self, trabajo):
+        """Deja en pausa un trabajo interrumpido en plena descarga"""
+        with self._condicion:
+            self._pausados.add(trabajo)
+
+    def reanudar(self, trabajo):
+        """Devuelve a la cola un trabajo pausado; False si no lo estaba"""
+        with self._condicion:
+            if trabajo not in self._pausados:
+                return False
+            self._pausados.discard(trabajo)
+            self._listos[trabajo] = next(self._llegadas)
+            self._condicion.notify_all()
+            return True
+
+    def retirar(self, trabajo):
+        """Quita un trabajo listo o pausado para cancelarlo; False si ya se estaba descargando"""
+        with self._condicion:
+            if self._listos.pop(trabajo, None) is None:
+                if trabajo not in self._pausados:
+                    return False
+                self._pausados.discard(trabajo)
+            self._condicion.notify_all()
+            return True
+
+    def cerrar(self):
+        """No llegarán más trabajos: los trabajadores salen al vaciarse la cola"""
+        with self._condicion:
+            self._cerrado = True
+            self._condicion.notify_all()
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import sqlite3
+import subprocess
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# PIL se importa al recortar la primera portada: la etapa es opcional
+
+def incrustar_portada(ruta_audio, ruta_imagen):
+    """Incrusta la imagen como portada (APIC) de un MP3 sin recodificar el audio"""
+    base, extension = os.path.splitext(ruta_audio)
+    temporal = base + ".portada" + extension
+    proceso = subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-i", ruta_audio, "-i", ruta_imagen,
+         "-map", "0:a", "-map", "1:0", "-c", "copy", "-id3v2_version", "3",
+         "-metadata:s:v", "title=Album cover", "-metadata:s:v", "comment=Cover (front)", temporal],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    if proceso.returncode != 0:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        detalle = proceso.stderr.decode("utf-8", "replace").strip().splitlines()
+        raise RuntimeError(f"ffmpeg falló al incrustar la portada: {detalle[-1] if detalle else proceso.returncode}")
+    os.replace(temporal, ruta_audio)
+
+def url_miniatura(info):
+    """La miniatura preferida de un info de yt-dlp (la lista va de peor a mejor)"""
+    if info.get('thumbnail'):
+        return info['thumbnail']
+    miniaturas = [m for m in info.get('thumbnails') or () if m.get('url')]
+    return miniaturas[-1]['url'] if miniaturas else None
+
+class CachePortadas:
+    """Portadas cuadradas de `lado` píxeles listas para incrustar, con caché por contenido"""
+    def __init__(self, directorio, lado=600, hilos=2):
+        self.directorio = directorio
+        self.lado = lado
+        os.makedirs(directorio, exist_ok=True)
+        self._bloqueo = threading.Lock()
+        self._conexion = sqlite3.connect(os.path.join(directorio, "portadas.sqlite"), timeout=30,
+                                         check_same_thread=False)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        # url -> hash de la imagen: una URL ya vista no se vuelve a descargar, tampoco entre sesiones
+        self._conexion.execute("CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, hash TEXT NOT NULL)")
+        self._conexion.commit()
+        # Descarga y recorte van en un pool propio mientras el audio se sigue descargando
+        self._ejecutor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="portadas")
+        self._por_url = {}
+        self._por_hash = {}
+        self.descargadas = 0
+        self.recortadas = 0
+        self.reutilizadas = 0
+
+    def _ruta_original(self, hash_imagen):
+        return os.path.join(self.directorio, hash_imagen[:2], hash_imagen)
+
+    def _ruta_cuadrada(self, hash_imagen):
+        return os.path.join(self.directorio, hash_imagen[:2], f"{hash_imagen}_{self.lado}.jpg")
+
+    def solicitar(self, url):
+        """Future con la ruta del JPEG cuadrado para la miniatura de url"""
+        with self._bloqueo:
+            futuro = self._por_url.get(url)
+            if futuro is None:
+                futuro = self._por_url[url] = self._ejecutor.submit(self._preparar, url)
+            else:
+                self.reutilizadas += 1
+        return futuro
+
+    def _preparar(self, url):
+        with self._bloqueo:
+            fila = self._conexion.execute("SELECT hash FROM urls WHERE url = ?", (url,)).fetchone()
+        hash_imagen = fila[0] if fila else None
+        if hash_imagen is None or not os.path.exists(self._ruta_original(hash_imagen)):
+            with urllib.request.urlopen(url, timeout=30) as respuesta:
+                contenido = respuesta.read()
+            # Con el hash de los bytes como nombre, los temas de un álbum que comparten portada
+            # reutilizan el mismo archivo aunque lleguen desde URLs distintas
+            hash_imagen = hashlib.sha256(contenido).hexdigest()
+            ruta = self._ruta_original(hash_imagen)
+            if not os.path.exists(ruta):
+                os.makedirs(os.path.dirname(ruta), exist_ok=True)
+                with open(ruta + ".tmp", "wb") as archivo:
+                    archivo.write(contenido)
+                os.replace(ruta + ".tmp", ruta)
+            with self._bloqueo:
+                self.descargadas += 1
+                with self._conexion:
+                    self._conexion.execute("INSERT OR REPLACE INTO urls (url, hash) VALUES (?, ?)", (url, hash_imagen))
+
+        # Misma imagen desde otra URL: se espera al recorte que ya está en marcha
+        with self._bloqueo:
+            evento = self._por_hash.get(hash_imagen)
+            propio = evento is None
+            if propio:
+                evento = self._por_hash[hash_imagen] = threading.Event()
+            else:
+                self.reutilizadas += 1
+        cuadrada = self._ruta_cuadrada(hash_imagen)
+        if propio:
+            try:
+                if os.path.exists(cuadrada):
+                    with self._bloqueo:
+                        self.reutilizadas += 1
+                else:
+                    self._recortar(self._ruta_original(hash_imagen), cuadrada)
+            finally:
+                evento.set()
+        else:
+            evento.wait()
+        if not os.path.exists(cuadrada):
+            raise RuntimeError(f"No se pudo preparar la portada de {url}")
+        return cuadrada
+
+    def _recortar(self, origen, destino):
+        from PIL import Image, ImageOps
+
+        with Image.open(origen) as imagen:
+            cuadrada = ImageOps.fit(imagen.convert("RGB"), (self.lado, self.lado), Image.LANCZOS)
+        cuadrada.save(destino + ".tmp", "JPEG", quality=90)
+        os.replace(destino + ".tmp", destino)
+        with self._bloqueo:
+            self.recortadas += 1
+
+    def cerrar(self):
+        self._ejecutor.shutdown(wait=True)
+        with self._bloqueo:
+            self._conexion.close()
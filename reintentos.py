@@ -0,0 +1,148 @@
+import random
+import threading
+import time
+
+# Tipos de error y cómo se muestran en los informes
+TIPOS_ERROR = {
+    "red": "red",
+    "limite": "límite de peticiones",
+    "no_disponible": "no disponible",
+    "postproceso": "conversión",
+    "desconocido": "otros",
+}
+# Solo estos se reintentan: los demás fallarían igual en el siguiente intento
+REINTENTABLES = ("red", "limite")
+
+PATRONES = (
+    ("postproceso", ("ffmpeg", "postprocessing", "postprocesador")),
+    ("limite", ("http error 429", "too many requests", "rate limit", "rate-limit", "confirm you're not a bot",
+                "confirm you’re not a bot")),
+    ("no_disponible", ("video unavailable", "private video", "not available", "has been removed",
+                       "http error 404", "http error 410", "unsupported url", "members-only", "copyright",
+                       "no se pudo obtener información")),
+    ("red", ("timed out", "timeout", "connection", "temporary failure", "network is unreachable",
+             "urlopen error", "http error 5", "incompleteread", "ssl", "reset by peer", "http error 403",
+             "name or service not known")),
+)
+
+def _cadena_de_errores(error):
+    """El error y los que lo causaron (DownloadError guarda el original en exc_info)"""
+    vistos = []
+    while error is not None and error not in vistos:
+        vistos.append(error)
+        exc_info = getattr(error, "exc_info", None)
+        original = exc_info[1] if isinstance(exc_info, tuple) and len(exc_info) > 1 else None
+        error = original or error.__cause__ or error.__context__
+    return vistos
+
+def clasificar_error(error):
+    """Tipo de un error de descarga: red, limite, no_disponible, postproceso o desconocido"""
+    if error is None:
+        return None
+    cadena = _cadena_de_errores(error)
+    if any(type(e).__name__ in ("PostProcessingError", "FFmpegPostProcessorError") for e in cadena):
+        return "postproceso"
+    texto = " ".join(str(e) for e in cadena).lower()
+    for tipo, patrones in PATRONES:
+        if any(patron in texto for patron in patrones):
+            return tipo
+    if any(isinstance(e, (ConnectionError, TimeoutError)) for e in cadena):
+        return "red"
+    return "desconocido"
+
+class PoliticaReintentos:
+    """Cuántas veces reintentar cada tipo de error y cuánto esperar
+
+    Backoff exponencial con jitter completo: la espera del intento n es un
+    valor al azar entre 0 y min(maximo, base * 2**n), para que los trabajos
+    que fallaron a la vez no vuelvan a golpear el servidor a la vez. Los
+    límites de peticiones parten de una base cuatro veces mayor.
+    """
+    def __init__(self, intentos_maximos=5, espera_base=2.0, espera_maxima=60.0):
+        self.intentos_maximos = intentos_maximos
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+
+    def debe_reintentar(self, tipo, intento):
+        return tipo in REINTENTABLES and intento < self.intentos_maximos
+
+    def espera(self, tipo, intento):
+        base = self.espera_base * (4 if tipo == "limite" else 1)
+        return random.uniform(0, min(self.espera_maxima, base * 2 ** intento))
+
+class InterruptorCircuito:
+    """Corta el paso a un host tras varios fallos de red seguidos
+
+    Abierto, espera() devuelve cuánto falta para volver a probar. Pasado el
+    enfriamiento el siguiente intento sale como prueba: si falla se vuelve a
+    abrir enseguida y si sale bien el host queda limpio.
+    """
+    def __init__(self, fallos_para_abrir=5, enfriamiento=60.0):
+        self.fallos_para_abrir = fallos_para_abrir
+        self.enfriamiento = enfriamiento
+        self._bloqueo = threading.Lock()
+        self._fallos = {}
+        self._abierto_hasta = {}
+
+    def ajustar(self, fallos_para_abrir, enfriamiento):
+        with self._bloqueo:
+            self.fallos_para_abrir = max(1, int(fallos_para_abrir))
+            self.enfriamiento = enfriamiento
+
+    def espera(self, host):
+        with self._bloqueo:
+            return max(0.0, self._abierto_hasta.get(host, 0.0) - time.monotonic())
+
+    def registrar_exito(self, host):
+        with self._bloqueo:
+            self._fallos.pop(host, None)
+            self._abierto_hasta.pop(host, None)
+
+    def registrar_fallo(self, host):
+        with self._bloqueo:
+            self._fallos[host] = self._fallos.get(host, 0) + 1
+            if self._fallos[host] >= self.fallos_para_abrir:
+                self._abierto_hasta[host] = time.monotonic() + self.enfriamiento
+
+def ejecutar_con_reintentos(funcion, host, politica, interruptor, al_reintentar=None):
+    """Llama a funcion() hasta que sale bien o su error no admite otro intento
+
+    al_reintentar(error, tipo, espera) se llama antes de cada espera. Los
+    fallos de red y de límite cuentan para el interruptor del host.
+    """
+    intento = 0
+    while True:
+        pausa = interruptor.espera(host)
+        if pausa:
+            time.sleep(pausa)
+        try:
+            resultado = funcion()
+        except Exception as e:
+            tipo = clasificar_error(e)
+            if tipo in REINTENTABLES:
+                interruptor.registrar_fallo(host)
+            if not politica.debe_reintentar(tipo, intento):
+                raise
+            espera = politica.espera(tipo, intento)
+            intento += 1
+            if al_reintentar:
+                al_reintentar(e, tipo, espera)
+            time.sleep(espera)
+            continue
+        interruptor.registrar_exito(host)
+        return resultado
+
+def informe_errores(fallidos):
+    """Texto del informe de fin de lote: recuento por tipo y una línea por URL"""
+    if not fallidos:
+        return ""
+    recuento = {}
+    for fallido in fallidos:
+        recuento[fallido["tipo"]] = recuento.get(fallido["tipo"], 0) + 1
+    lineas = [f"{len(fallidos)} descargas con error: " + ", ".join(
+        f"{cantidad} {TIPOS_ERROR.get(tipo, tipo)}" for tipo, cantidad in sorted(recuento.items(), key=lambda x: -x[1])
+    )]
+    for fallido in fallidos:
+        intentos = f" tras {fallido['intentos'] + 1} intentos" if fallido["intentos"] else ""
+        lineas.append(f"• [{TIPOS_ERROR.get(fallido['tipo'], fallido['tipo'])}] {fallido['url']}{intentos}: {fallido['error']}")
+    return "\n".join(lineas)
@@ -0,0 +1,234 @@
+"""Servicio HTTP local que recibe lotes de descarga y expone su progreso.
+
+Uso:
+    python servicio_http.py [--puerto 8765]
+
+Rutas:
+    POST /trabajos                  {"urls": [...], "directorio": opc., "calidad": opc.}
+    GET  /trabajos                  lista de trabajos y su estado
+    GET  /trabajos/<id>             estado y progreso por URL de un trabajo
+    GET  /historial?limite=N        últimas descargas
+    GET  /historial?url=URL         descargas de una URL
+    GET  /historial/directorios     estadísticas por directorio
+    GET  /metricas                  duraciones, bytes y reintentos por etapa
+    GET  /biblioteca?q=TEXTO        pistas de la biblioteca por título o ruta
+
+Los trabajos esperan en una cola acotada; si está llena, POST responde 429
+con Retry-After en lugar de arrancar más hilos.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
+
+from descargador import (
+    cargar_configuracion, configurar_registro, ejecutar_lote, metricas, obtener_biblioteca, obtener_historial,
+    separar_urls
+)
+from importacion import ImportadorUrls
+
+MAX_CUERPO = 1024 * 1024
+MOTIVOS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large", 429: "Too Many Requests"}
+
+class ServicioDescargas:
+    """Cola acotada de lotes servida por un número fijo de ejecutores"""
+    def __init__(self, config, lotes_simultaneos=1, tamaño_cola=100):
+        self.config = config
+        self.lotes_simultaneos = lotes_simultaneos
+        self.cola = asyncio.Queue(maxsize=tamaño_cola)
+        self.trabajos = {}
+        self._ids = itertools.count(1)
+        self._ejecutor = ThreadPoolExecutor(max_workers=lotes_simultaneos)
+
+    def encolar(self, urls, directorio=None, calidad=None):
+        """Registra un lote y lo pone en cola; lanza asyncio.QueueFull si no cabe"""
+        id_trabajo = str(next(self._ids))
+        registro = {
+            "id": id_trabajo,
+            "estado": "en_cola",
+            "creado": time.time(),
+            "directorio": directorio or self.config['directorio_descargas'],
+            "calidad": calidad,
+            "urls": urls,
+            "progreso": {},
+            "resumen": None,
+            "error": None,
+        }
+        self.cola.put_nowait(registro)
+        self.trabajos[id_trabajo] = registro
+        return registro
+
+    def _ejecutar(self, registro):
+        # Corre en un hilo del ejecutor: solo escribe en el registro del trabajo
+        def al_progresar(trabajo):
+            registro["progreso"][trabajo.indice] = trabajo.instantanea()
+
+        def al_cambiar(trabajo, pool):
+            al_progresar(trabajo)
+
+        return ejecutar_lote(
+            registro["urls"], registro["directorio"], self.config, registro["calidad"],
+            al_cambiar=al_cambiar, al_progresar=al_progresar
+        )
+
+    async def consumidor(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            registro = await self.cola.get()
+            registro["estado"] = "descargando"
+            try:
+                registro["resumen"] = await loop.run_in_executor(self._ejecutor, self._ejecutar, registro)
+                registro["estado"] = "completado"
+            except Exception as e:
+                registro["estado"] = "error"
+                registro["error"] = str(e)
+            finally:
+                self.cola.task_done()
+
+    def vista(self, registro, detalle=False):
+        """Representación JSON de un trabajo"""
+        progreso = list(registro["progreso"].values())
+        vista = {
+            "id": registro["id"],
+            "estado": registro["estado"],
+            "urls": len(registro["urls"]),
+            "completadas": sum(1 for p in progreso if p["estado"] == "completado"),
+            "errores": sum(1 for p in progreso if p["estado"] == "error"),
+            "resumen": registro["resumen"],
+            "error": registro["error"],
+        }
+        if detalle:
+            vista["progreso"] = sorted(progreso, key=lambda p: p["indice"])
+        return vista
+
+    def atender(self, metodo, ruta, cuerpo):
+        """Resuelve una petición y devuelve (código, dict, cabeceras extra)"""
+        partes = urlparse(ruta)
+        consulta = parse_qs(partes.query)
+        segmentos = [s for s in partes.path.split("/") if s]
+
+        if segmentos == ["trabajos"]:
+            if metodo == "GET":
+                return 200, {"trabajos": [self.vista(r) for r in self.trabajos.values()],
+                             "en_cola": self.cola.qsize()}, {}
+            if metodo != "POST":
+                return 405, {"error": "Método no permitido"}, {}
+            try:
+                datos = json.loads(cuerpo or b"{}")
+                urls = datos["urls"]
+                if isinstance(urls, str):
+                    urls = separar_urls(urls)
+                # Misma normalización y deduplicación que la importación de listas
+                importador = ImportadorUrls()
+                urls = list(importador.urls(urls))
+                if not urls:
+                    raise ValueError("ninguna URL válida")
+            except (ValueError, KeyError, TypeError) as e:
+                return 400, {"error": f"Cuerpo inválido: {e}"}, {}
+            try:
+                registro = self.encolar(urls, datos.get("directorio"), datos.get("calidad"))
+            except asyncio.QueueFull:
+                return 429, {"error": "Cola llena, reintenta más tarde"}, {"Retry-After": "30"}
+            return 202, dict(self.vista(registro), importacion=importador.informe()), {}
+
+        if metodo != "GET":
+            return 405, {"error": "Método no permitido"}, {}
+
+        if len(segmentos) == 2 and segmentos[0] == "trabajos":
+            registro = self.trabajos.get(segmentos[1])
+            if registro is None:
+                return 404, {"error": "Trabajo no encontrado"}, {}
+            return 200, self.vista(registro, detalle=True), {}
+
+        if segmentos == ["historial"]:
+            historial = obtener_historial()
+            if "url" in consulta:
+                return 200, {"descargas": historial.buscar_por_url(consulta["url"][0])}, {}
+            limite = int(consulta.get("limite", ["50"])[0])
+            return 200, {"descargas": historial.recientes(limite)}, {}
+
+        if segmentos == ["historial", "directorios"]:
+            return 200, {"directorios": obtener_historial().estadisticas_por_directorio()}, {}
+
+        if segmentos == ["biblioteca"]:
+            biblioteca = obtener_biblioteca()
+            limite = int(consulta.get("limite", ["100"])[0])
+            return 200, {"pistas": biblioteca.buscar(consulta.get("q", [""])[0], limite),
+                         "total": biblioteca.estadisticas()}, {}
+
+        if segmentos == ["metricas"]:
+            return 200, metricas.foto(), {}
+
+        return 404, {"error": "Ruta no encontrada"}, {}
+
+    async def manejar_conexion(self, lector, escritor):
+        try:
+            linea = await lector.readline()
+            metodo, ruta, _ = linea.decode("latin-1").split(" ", 2)
+            cabeceras = {}
+            while True:
+                linea = await lector.readline()
+                if linea in (b"\r\n", b"\n", b""):
+                    break
+                nombre, _, valor = linea.decode("latin-1").partition(":")
+                cabeceras[nombre.strip().lower()] = valor.strip()
+
+            longitud = int(cabeceras.get("content-length", 0))
+            if longitud > MAX_CUERPO:
+                codigo, datos, extra = 413, {"error": "Cuerpo demasiado grande"}, {}
+            else:
+                cuerpo = await lector.readexactly(longitud) if longitud else b""
+                codigo, datos, extra = self.atender(metodo.upper(), ruta, cuerpo)
+        except (ValueError, asyncio.IncompleteReadError):
+            codigo, datos, extra = 400, {"error": "Petición mal formada"}, {}
+
+        respuesta = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+        cabecera = (
+            f"HTTP/1.1 {codigo} {MOTIVOS.get(codigo, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(respuesta)}\r\n"
+            f"Connection: close\r\n"
+            + "".join(f"{k}: {v}\r\n" for k, v in extra.items())
+            + "\r\n"
+        )
+        escritor.write(cabecera.encode("latin-1") + respuesta)
+        try:
+            await escritor.drain()
+        finally:
+            escritor.close()
+
+    async def servir(self, host, puerto):
+        consumidores = [asyncio.create_task(self.consumidor()) for _ in range(self.lotes_simultaneos)]
+        servidor = await asyncio.start_server(self.manejar_conexion, host, puerto)
+        print(f"Servicio escuchando en http://{host}:{puerto}")
+        try:
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            for consumidor in consumidores:
+                consumidor.cancel()
+            self._ejecutor.shutdown(wait=False, cancel_futures=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio HTTP local del Descargador Musical Pro")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--lotes-simultaneos", type=int, default=1,
+                        help="lotes que se descargan a la vez (cada uno usa descargas_paralelas hilos)")
+    parser.add_argument("--cola", type=int, default=100, help="lotes que pueden esperar en cola")
+    argumentos = parser.parse_args(argv)
+
+    config = cargar_configuracion()
+    configurar_registro(config)
+    servicio = ServicioDescargas(config, argumentos.lotes_simultaneos, argumentos.cola)
+    try:
+        asyncio.run(servicio.servir(argumentos.host, argumentos.puerto))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,33 @@
+import time
+
+INICIO_PROCESO = time.perf_counter()  # referencia para medir el tiempo hasta la primera ventana
+
+import collections
 import os
-import re
+import sys
 import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-from PIL import Image, ImageDraw, ImageFilter, ImageOps, ImageTk  # Added ImageTk here
-import yt_dlp
-import json
-from datetime import datetime
 import webbrowser
 
+from bus_progreso import BusProgreso
+from descargador import (
+    ESTADOS_TERMINALES, cargar_configuracion, combinar_resumenes, configurar_registro, ejecutar_lote,
+    formatear_velocidad, guardar_configuracion, importar_lista, medidor_rendimiento, obtener_biblioteca,
+    obtener_diario, reanudar_pendientes, reintentar_fallidos, separar_urls, texto_informe, texto_resumen
+)
+from importacion import ImportadorUrls, texto_importacion
+from reintentos import TIPOS_ERROR
+
 # =========================
 # Constantes y Configuración
 # =========================
 NOMBRE_APP = "Descargador Musical Pro"
 VERSION = "2.1.0"
-ARCHIVO_CONFIG = "config_descargador.json"
 URL_SOPORTE = "https://github.com/tu-repositorio/soporte"
+VERSION_LOGO = 2  # cambiarla regenera los archivos del logo en el siguiente arranque
+INTERVALO_UI_MS = 66  # ~15 cuadros por segundo para refrescar el progreso
+MAX_FILAS_TERMINADAS = 200  # las más antiguas salen de la lista; el informe del lote las sigue contando
 
 # Paleta de colores profesional
 COLORES = {
@@ -33,22 +45,32 @@ COLORES = {
 # =========================
 # Funciones de Utilidad
 # =========================
-def crear_logo_pro(ruta_png="logo_pro.png", ruta_ico="logo_pro.ico"):
-    """Crea un logo profesional con diseño moderno"""
-    if os.path.exists(ruta_png) and os.path.exists(ruta_ico):
-        return ruta_png, ruta_ico
+def crear_logo_pro(ruta_png=None, ruta_ico=None, ruta_png_pequeno=None):
+    """Crea un logo profesional con diseño moderno
+
+    Los archivos llevan la versión del diseño en el nombre: se generan una
+    sola vez y se reutilizan en cada arranque hasta que cambie VERSION_LOGO.
+    También se guarda la miniatura de 64 px que usa "Acerca de", para que
+    Tk la cargue sin pasar por PIL.
+    """
+    ruta_png = ruta_png or f"logo_pro_v{VERSION_LOGO}.png"
+    ruta_ico = ruta_ico or f"logo_pro_v{VERSION_LOGO}.ico"
+    ruta_png_pequeno = ruta_png_pequeno or f"logo_pro_v{VERSION_LOGO}_64.png"
+    if all(os.path.exists(r) for r in (ruta_png, ruta_ico, ruta_png_pequeno)):
+        return ruta_png, ruta_ico, ruta_png_pequeno
+
+    from PIL import Image, ImageDraw, ImageFilter, ImageOps
 
     tamaño = 512
     img = Image.new("RGBA", (tamaño, tamaño), (0, 0, 0, 0))
     
-    # Fondo con gradiente moderno
-    gradiente = Image.new("RGBA", (tamaño, tamaño), (0,0,0,0))
-    dibujar_g = ImageDraw.Draw(gradiente)
-    for y in range(tamaño):
-        r = int(66 + (189 - 66) * (y/tamaño))
-        g = int(133 + (228 - 133) * (y/tamaño))
-        b = int(244 + (255 - 244) * (y/tamaño))
-        dibujar_g.line([(0, y), (tamaño, y)], fill=(r, g, b, 255))
+    # Fondo con gradiente moderno: un gradiente lineal por canal, sin recorrer filas en Python
+    rampa = Image.linear_gradient("L").resize((tamaño, tamaño))
+    canales = [
+        rampa.point(lambda v, a=inicio, b=fin: int(a + (b - a) * v / 256))
+        for inicio, fin in ((66, 189), (133, 228), (244, 255))
+    ]
+    gradiente = Image.merge("RGBA", canales + [Image.new("L", (tamaño, tamaño), 255)])
     
     # Círculo recortado
     mascara = Image.new("L", (tamaño, tamaño), 0)
@@ -77,69 +99,200 @@ def crear_logo_pro(ruta_png="logo_pro.png", ruta_ico="logo_pro.ico"):
 
     # Guardar archivos
     img.save(ruta_png, "PNG")
+    img.resize((64, 64), Image.LANCZOS).save(ruta_png_pequeno, "PNG")
     
     # Crear ícono con múltiples tamaños
     tamaños_ico = [(256,256), (128,128), (64,64), (48,48), (32,32), (16,16)]
     ico = img.copy()
     ico.save(ruta_ico, sizes=tamaños_ico)
 
-    return ruta_png, ruta_ico
-
-def cargar_configuracion():
-    """Carga la configuración desde archivo"""
-    valores_por_defecto = {
-        "directorio_descargas": os.path.expanduser("~/Música"),
-        "calidad_audio": "192",
-        "modo_oscuro": False,
-        "intentos_maximos": 5,
-        "descargas_paralelas": 1
-    }
-    
-    try:
-        if os.path.exists(ARCHIVO_CONFIG):
-            with open(ARCHIVO_CONFIG, 'r') as f:
-                config = json.load(f)
-                return {**valores_por_defecto, **config}
-    except Exception:
-        pass
-    
-    return valores_por_defecto
+    return ruta_png, ruta_ico, ruta_png_pequeno
 
-def guardar_configuracion(config):
-    """Guarda la configuración en archivo"""
+def aplicar_icono():
+    """Genera (si hace falta) y aplica el ícono, ya con la ventana en pantalla"""
+    global ruta_logo_pequeno
     try:
-        with open(ARCHIVO_CONFIG, 'w') as f:
-            json.dump(config, f, indent=2)
+        _, ruta_logo_ico, ruta_logo_pequeno = crear_logo_pro()
+        ventana.iconbitmap(ruta_logo_ico)
     except Exception:
         pass
 
+def precargar_yt_dlp():
+    """Importa yt_dlp en segundo plano para que el primer lote no pague la espera"""
+    def importar():
+        try:
+            import yt_dlp  # noqa: F401
+        except ImportError:
+            pass
+    threading.Thread(target=importar, daemon=True).start()
+
+def al_mostrar_ventana(evento):
+    """Primer cuadro en pantalla: mide el arranque y lanza el trabajo diferido"""
+    if evento.widget is not ventana or getattr(al_mostrar_ventana, "hecho", False):
+        return
+    al_mostrar_ventana.hecho = True
+    milisegundos = (time.perf_counter() - INICIO_PROCESO) * 1000
+    if "--medir-arranque" in sys.argv:
+        print(f"Primera ventana en {milisegundos:.0f} ms")
+        ventana.after_idle(ventana.destroy)
+        return
+    ventana.after(50, aplicar_icono)
+    ventana.after(100, precargar_yt_dlp)
+    ventana.after(200, habilitar_arrastrar_soltar)
+    # Reanudar lo que haya quedado a medias en la sesión anterior
+    ventana.after(500, ofrecer_reanudar)
+
 def seleccionar_carpeta():
     """Abre el diálogo para seleccionar carpeta"""
     carpeta = filedialog.askdirectory(title="Seleccionar carpeta de descarga")
     if carpeta:
         var_carpeta.set(carpeta)
 
-def limpiar_porcentaje(cadena_porcentaje):
-    """Extrae el porcentaje de diferentes formatos de cadena"""
-    if not cadena_porcentaje:
-        return 0.0
-    coincidencia = re.search(r'(\d+(?:\.\d+)?)\s*%', str(cadena_porcentaje))
-    return float(coincidencia.group(1)) if coincidencia else 0.0
-
 # =========================
 # Lógica de Descarga
 # =========================
-def hook_progreso(d):
-    """Callback para actualizar el progreso"""
-    if d.get('status') == 'downloading':
-        porcentaje = limpiar_porcentaje(d.get('_percent_str', '0%'))
-        barra_progreso['value'] = porcentaje
-        etiqueta_estado.config(text=f"Descargando: {porcentaje:.1f}%")
-        ventana.update_idletasks()
-    elif d.get('status') == 'finished':
-        barra_progreso['value'] = 100
-        etiqueta_estado.config(text="Procesando archivo de audio...")
-        ventana.update_idletasks()
+ESTADOS_VISIBLES = {
+    "en_cola": "En cola",
+    "pausado": "⏸ Pausado",
+    "descargando": "Descargando",
+    "reintentando": "Reintentando",
+    "procesando": "Procesando audio",
+    "transcodificando": "Transcodificando",
+    "completado": "✓ Completado",
+    "error": "⚠ Error",
+    "cancelado": "✕ Cancelado",
+}
+
+def drenar_bus_progreso():
+    """Aplica en la interfaz lo publicado por los trabajadores (hilo de Tk)"""
+    ventana.after(INTERVALO_UI_MS, drenar_bus_progreso)
+    eventos, acciones = bus_progreso.vaciar()
+    for clave, valor in eventos.items():
+        if clave == "lote":
+            lista_trabajos.delete(*lista_trabajos.get_children())
+            filas_terminadas.clear()
+        elif clave == "estado":
+            etiqueta_estado.config(text=valor)
+        elif clave[0] == "trabajo":
+            iid = str(valor["indice"])
+            texto_estado = ESTADOS_VISIBLES.get(valor["estado"], valor["estado"])
+            if valor["estado"] == "error" and valor["tipo_error"]:
+                texto_estado += f" ({TIPOS_ERROR.get(valor['tipo_error'], valor['tipo_error'])})"
+            fila = (valor["titulo"], texto_estado, f"{valor['porcentaje']:.0f}%")
+            if lista_trabajos.exists(iid):
+                lista_trabajos.item(iid, values=fila)
+            else:
+                lista_trabajos.insert("", "end", iid=iid, values=fila)
+            if valor["estado"] in ESTADOS_TERMINALES and iid not in filas_terminadas:
+                filas_terminadas[iid] = None
+                if len(filas_terminadas) > MAX_FILAS_TERMINADAS:
+                    lista_trabajos.delete(filas_terminadas.popitem(last=False)[0])
+
+    tasa = medidor_rendimiento.tasa()
+    etiqueta_rendimiento.config(text=f"↓ {formatear_velocidad(tasa)}" if tasa else "")
+
+    # El total crece mientras se abren listas: se mide sobre los trabajos conocidos
+    pool = lote_en_curso['pool']
+    if eventos and pool is not None:
+        barra_progreso['value'] = pool.progreso_global()
+
+    for funcion, args, kwargs in acciones:
+        funcion(*args, **kwargs)
+
+def al_progresar_ui(trabajo):
+    """Publica el estado de un trabajo (hilo de descarga)"""
+    bus_progreso.publicar(("trabajo", trabajo.indice), trabajo.instantanea())
+
+def al_cambiar_ui(trabajo, pool):
+    """Publica el cambio de estado de un trabajo y el resumen del lote (hilo de descarga)"""
+    lote_en_curso['pool'] = pool
+    al_progresar_ui(trabajo)
+    bus_progreso.publicar("estado", (
+        f"Descargando {pool.contar('descargando')} · "
+        f"transcodificando {pool.contar('transcodificando')} · "
+        f"{pool.contar('completado')}/{pool.total} completadas"
+        # Los pausados mantienen el lote abierto hasta reanudarlos o cancelarlos
+        + (f" · {pool.contar('pausado')} en pausa" if pool.contar('pausado') else "")
+    ))
+
+def recordar_resultados(resumenes):
+    """Guarda las URLs fallidas y el informe del lote para las acciones de la interfaz (hilo de descarga)"""
+    fallidos = [f for resumen in resumenes for f in resumen.get('fallidos', ())]
+    informe = texto_informe(resumenes)
+
+    def actualizar():
+        ultimo_lote['fallidos'] = fallidos
+        ultimo_lote['informe'] = informe
+    bus_progreso.en_ui(actualizar)
+
+def mostrar_informe():
+    """Informe de errores del último lote"""
+    messagebox.showinfo("Informe del lote", ultimo_lote['informe'] or "El último lote terminó sin errores.")
+
+def reintentar_fallidas():
+    """Vuelve a lanzar solo las URLs que fallaron en el último lote"""
+    fallidos = ultimo_lote['fallidos']
+    if not fallidos:
+        return
+
+    def tarea():
+        resumenes = reintentar_fallidos(fallidos, config, al_cambiar_ui, al_progresar_ui)
+        recordar_resultados(resumenes)
+        return " | ".join(texto_resumen(resumen) for resumen in resumenes)
+
+    lanzar_en_segundo_plano(tarea)
+
+def trabajos_seleccionados():
+    """El pool del lote en curso y sus trabajos sin terminar marcados en la lista"""
+    pool = lote_en_curso['pool']
+    if pool is None:
+        return None, []
+    trabajos = (pool.activos.get(int(iid)) for iid in lista_trabajos.selection())
+    return pool, [trabajo for trabajo in trabajos if trabajo is not None]
+
+def controlar_seleccion(accion):
+    """Pausa, reanuda o cancela los trabajos seleccionados ('pausar', 'reanudar' o 'cancelar')"""
+    pool, trabajos = trabajos_seleccionados()
+    for trabajo in trabajos:
+        getattr(pool, accion)(trabajo)
+
+def descargar_a_continuacion():
+    """Pone los trabajos seleccionados por delante del resto de la cola"""
+    pool, trabajos = trabajos_seleccionados()
+    if trabajos:
+        prioridad = pool.prioridad_maxima() + 1
+        for trabajo in trabajos:
+            pool.priorizar(trabajo, prioridad)
+
+def lanzar_en_segundo_plano(tarea, directorio=None):
+    """Ejecuta tarea() en un hilo; tarea devuelve el texto final
+
+    La entrada de URLs sigue activa: lo que se descargue mientras tanto se
+    suma al lote en curso (ver descargar_urls).
+    """
+    lote_en_curso.update(activo=True, pool=None, directorio=directorio)
+    boton_reintentar.config(state="disabled")
+    boton_carpeta.config(state="disabled")
+    etiqueta_estado.config(text="Inicializando...")
+    barra_progreso['value'] = 0
+
+    def hilo_descarga():
+        # Este hilo nunca toca widgets: todo pasa por bus_progreso
+        try:
+            bus_progreso.publicar("lote", {})
+            bus_progreso.en_ui(etiqueta_estado.config, text=tarea())
+        except Exception as e:
+            bus_progreso.en_ui(messagebox.showerror, "Error crítico", f"Ocurrió un error grave:\n{str(e)}")
+            bus_progreso.en_ui(etiqueta_estado.config, text="⚠ Falló la descarga")
+        finally:
+            bus_progreso.en_ui(lote_en_curso.update, activo=False, pool=None, directorio=None)
+            bus_progreso.en_ui(lambda: boton_reintentar.config(
+                text=f"Reintentar fallidas ({len(ultimo_lote['fallidos'])})",
+                state="normal" if ultimo_lote['fallidos'] else "disabled"
+            ))
+            bus_progreso.en_ui(boton_carpeta.config, state="normal")
+
+    threading.Thread(target=hilo_descarga, daemon=True).start()
 
 def descargar_urls():
     """Función principal de descarga con manejo de errores"""
@@ -156,121 +309,190 @@ def descargar_urls():
     os.makedirs(directorio_descarga, exist_ok=True)
     
     # Preparar lista de URLs (soporta separadas por coma, punto y coma o nueva línea)
-    urls = [u.strip() for u in re.split(r'[,;\n]', urls_crudas) if u.strip()]
-    
-    # Deshabilitar UI durante la descarga
-    boton_descargar.config(state="disabled")
-    entrada_url.config(state="disabled")
-    boton_carpeta.config(state="disabled")
-    etiqueta_estado.config(text="Inicializando...")
-    barra_progreso['value'] = 0
+    importador = ImportadorUrls()
+    urls = list(importador.urls(separar_urls(urls_crudas)))
+    if not urls:
+        messagebox.showwarning("Entrada requerida", "No se reconoció ninguna URL válida.")
+        return
     
     # Obtener configuración de calidad
     calidad = var_calidad.get()
+
+    if lote_en_curso['activo']:
+        agregar_al_lote_en_curso(urls, directorio_descarga)
+        return
     
-    def hilo_descarga():
-        try:
-            # Opciones profesionales de descarga
-            opciones_ydl = {
-                'format': 'bestaudio/best',
-                'outtmpl': os.path.join(directorio_descarga, '%(title)s.%(ext)s'),
-                'noplaylist': True,
-                'quiet': True,
-                'no_warnings': True,
-                'ignoreerrors': False,
-                'retries': config['intentos_maximos'],
-                'fragment_retries': 10,
-                'concurrent_fragment_downloads': config['descargas_paralelas'],
-                'windowsfilenames': True,
-                'progress_hooks': [hook_progreso],
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': calidad,
-                }],
-                'extractor_args': {
-                    'youtube': {
-                        'player_client': ['android'],
-                        'skip': ['dash', 'hls']
-                    }
-                },
-                'logger': RegistradorYDL(),
-            }
-            
-            for i, url in enumerate(urls, 1):
-                barra_progreso['value'] = 0
-                etiqueta_estado.config(text=f"Procesando URL {i} de {len(urls)}...")
-                ventana.update_idletasks()
-                
-                try:
-                    with yt_dlp.YoutubeDL(opciones_ydl) as ydl:
-                        info = ydl.extract_info(url, download=False)
-                        if info:
-                            etiqueta_estado.config(text=f"Descargando: {info['title']}")
-                            ventana.update_idletasks()
-                            ydl.download([url])
-                            
-                            # Registrar descarga exitosa
-                            registrar_descarga(info['title'], url, directorio_descarga)
-                            
-                            etiqueta_estado.config(text=f"✓ Completado {i}/{len(urls)}")
-                        else:
-                            etiqueta_estado.config(text=f"⚠ No se pudo obtener información del video")
-                except Exception as e:
-                    mensaje_error = f"Error al descargar: {url}\n\nError: {str(e)}"
-                    messagebox.showerror("Error de descarga", mensaje_error)
-                    etiqueta_estado.config(text=f"⚠ Error con URL {i}")
-            
-            etiqueta_estado.config(text="✓ Todas las descargas completadas exitosamente")
-            
-            # Actualizar configuración con el último directorio usado
-            config['directorio_descargas'] = directorio_descarga
-            guardar_configuracion(config)
-            
-        except Exception as e:
-            messagebox.showerror("Error crítico", f"Ocurrió un error grave:\n{str(e)}")
-            etiqueta_estado.config(text="⚠ Falló la descarga")
-        finally:
-            boton_descargar.config(state="normal")
-            entrada_url.config(state="normal")
-            boton_carpeta.config(state="normal")
+    def tarea():
+        resumen = ejecutar_lote(urls, directorio_descarga, config, calidad, al_cambiar_ui, al_progresar_ui)
+        recordar_resultados([resumen])
 
-    threading.Thread(target=hilo_descarga, daemon=True).start()
+        # Actualizar configuración con el último directorio usado
+        config['directorio_descargas'] = directorio_descarga
+        guardar_configuracion(config)
+        return texto_resumen(resumen)
 
-class RegistradorYDL:
-    """Registrador personalizado para yt-dlp"""
-    def debug(self, msg):
-        pass  # Ignorar mensajes de depuración
-    
-    def warning(self, msg):
-        if "URL could be a direct video link" not in msg:  # Ignorar advertencia común
-            print(f"Advertencia: {msg}")
-    
-    def error(self, msg):
-        print(f"Error: {msg}")
-
-def registrar_descarga(titulo, url, directorio):
-    """Registra descargas exitosas para historial"""
-    entrada_registro = {
-        "fecha": datetime.now().isoformat(),
-        "titulo": titulo,
-        "url": url,
-        "directorio": directorio
-    }
-    
-    archivo_registro = os.path.join(os.path.dirname(ARCHIVO_CONFIG), "historial_descargas.json")
+    lanzar_en_segundo_plano(tarea, directorio_descarga)
+
+def agregar_al_lote_en_curso(urls, directorio_descarga):
+    """Suma URLs al lote que se está descargando, por delante de lo que espera en cola"""
+    pool = lote_en_curso['pool']
+    if lote_en_curso['directorio'] != directorio_descarga:
+        messagebox.showinfo("Lote en curso", "Espera a que termine el lote en curso para descargar en otra carpeta.")
+        return
+    if pool is None:
+        messagebox.showinfo("Lote en curso", "El lote aún está arrancando; vuelve a intentarlo en unos segundos.")
+        return
+    prioridad = pool.prioridad_maxima() + 1
+    entrada_url.delete(0, tk.END)
+
+    def agregar():
+        # Abrir listas y consultar el archivo puede tardar: fuera del hilo de Tk
+        trabajos = pool.agregar(urls, prioridad)
+        if trabajos is None:
+            bus_progreso.en_ui(messagebox.showinfo, "Lote en curso",
+                               "El lote en curso está terminando; vuelve a intentarlo en unos segundos.")
+        elif trabajos:
+            bus_progreso.publicar("estado", f"{len(trabajos)} URLs añadidas al lote en curso, por delante de la cola")
+        else:
+            bus_progreso.publicar("estado", "Las URLs añadidas ya estaban descargadas o en el lote")
+
+    threading.Thread(target=agregar, daemon=True).start()
+
+def importar_lista_desde(ruta):
+    """Descarga una lista de URLs leída de un archivo, sin cargarla entera"""
+    if lote_en_curso['activo']:
+        return  # ya hay un lote en marcha
+    directorio_descarga = var_carpeta.get().strip() or config['directorio_descargas']
+    calidad = var_calidad.get()
+    nombre = os.path.basename(ruta)
+
+    def tarea():
+        os.makedirs(directorio_descarga, exist_ok=True)
+        with open(ruta, encoding="utf-8", errors="replace") as archivo:
+            informe, resumenes = importar_lista(
+                archivo, directorio_descarga, config, calidad, al_cambiar_ui, al_progresar_ui
+            )
+        recordar_resultados(resumenes)
+        if not resumenes:
+            return f"{nombre}: {texto_importacion(informe)}"
+        return f"{texto_resumen(combinar_resumenes(resumenes))} · {texto_importacion(informe)}"
+
+    lanzar_en_segundo_plano(tarea, directorio_descarga)
+
+def elegir_lista():
+    """Pide un archivo con una URL por línea y lo importa"""
+    ruta = filedialog.askopenfilename(
+        title="Importar lista de URLs",
+        filetypes=[("Listas de URLs", "*.txt *.csv *.list"), ("Todos los archivos", "*")]
+    )
+    if ruta:
+        importar_lista_desde(ruta)
+
+def habilitar_arrastrar_soltar():
+    """Acepta listas soltadas sobre la ventana si Tk tiene la extensión tkdnd"""
     try:
-        historial = []
-        if os.path.exists(archivo_registro):
-            with open(archivo_registro, 'r') as f:
-                historial = json.load(f)
-        
-        historial.append(entrada_registro)
-        
-        with open(archivo_registro, 'w') as f:
-            json.dump(historial, f, indent=2)
-    except Exception:
-        pass
+        ventana.tk.call("package", "require", "tkdnd")
+    except tk.TclError:
+        return
+
+    def al_soltar(datos):
+        rutas = [r for r in ventana.tk.splitlist(datos) if os.path.isfile(r)]
+        if rutas:
+            importar_lista_desde(rutas[0])
+        return "copy"
+
+    ventana.tk.call("tkdnd::drop_target", "register", ventana._w, "DND_Files")
+    ventana.tk.call("bind", ventana._w, "<<Drop:DND_Files>>", ventana.register(al_soltar) + " %D")
+
+def ofrecer_reanudar():
+    """Si una sesión anterior dejó trabajos sin terminar, propone reanudarlos"""
+    pendientes = obtener_diario().pendientes()
+    total = sum(len(urls) for _, _, urls, _ in pendientes)
+    if not total:
+        return
+    if messagebox.askyesno(
+        "Descargas pendientes",
+        f"Hay {total} descargas sin terminar de una sesión anterior.\n¿Reanudarlas ahora?"
+    ):
+        def tarea():
+            resumenes = reanudar_pendientes(config, al_cambiar_ui, al_progresar_ui)
+            recordar_resultados(resumenes)
+            return " | ".join(texto_resumen(resumen) for resumen in resumenes)
+
+        lanzar_en_segundo_plano(tarea)
+
+# =========================
+# Biblioteca
+# =========================
+def mostrar_biblioteca():
+    """Búsqueda en el índice de la biblioteca musical"""
+    ventana_biblioteca = tk.Toplevel(ventana)
+    ventana_biblioteca.title("Biblioteca")
+    ventana_biblioteca.geometry("640x460")
+    ventana_biblioteca.configure(bg=COLORES['fondo'])
+
+    contenido = tk.Frame(ventana_biblioteca, bg=COLORES['fondo'], padx=15, pady=15)
+    contenido.pack(fill="both", expand=True)
+
+    var_busqueda = tk.StringVar()
+    entrada_busqueda = tk.Entry(contenido, textvariable=var_busqueda, font=("Helvetica", 11))
+    entrada_busqueda.pack(fill="x")
+
+    resultados = ttk.Treeview(contenido, columns=("titulo", "duracion", "bitrate"), show="headings")
+    resultados.heading("titulo", text="Título")
+    resultados.heading("duracion", text="Duración")
+    resultados.heading("bitrate", text="kbps")
+    resultados.column("titulo", width=440)
+    resultados.column("duracion", width=80, anchor="e")
+    resultados.column("bitrate", width=60, anchor="e")
+    resultados.pack(fill="both", expand=True, pady=10)
+
+    pie = tk.Frame(contenido, bg=COLORES['fondo'])
+    pie.pack(fill="x")
+    etiqueta_total = tk.Label(pie, text="", bg=COLORES['fondo'], fg=COLORES['texto_secundario'])
+    etiqueta_total.pack(side="left")
+
+    def mostrar_total():
+        total = obtener_biblioteca().estadisticas()
+        etiqueta_total.config(text=f"{total['pistas']} pistas · {total['segundos'] / 3600:.1f} h")
+
+    def buscar(*_):
+        resultados.delete(*resultados.get_children())
+        for pista in obtener_biblioteca().buscar(var_busqueda.get()):
+            duracion = f"{int(pista['duracion'] // 60)}:{int(pista['duracion'] % 60):02d}" if pista['duracion'] else ""
+            resultados.insert("", "end", values=(pista['titulo'], duracion, pista['bitrate'] or ""))
+
+    def programar_busqueda(*_):
+        # Espera a que se deje de escribir para no consultar en cada tecla
+        if getattr(programar_busqueda, "pendiente", None):
+            ventana_biblioteca.after_cancel(programar_busqueda.pendiente)
+        programar_busqueda.pendiente = ventana_biblioteca.after(200, buscar)
+
+    def actualizar_indice():
+        boton_actualizar.config(state="disabled", text="Actualizando...")
+        directorio = var_carpeta.get().strip() or config['directorio_descargas']
+
+        def al_terminar():
+            if not ventana_biblioteca.winfo_exists():
+                return
+            boton_actualizar.config(state="normal", text="Actualizar índice")
+            mostrar_total()
+            buscar()
+
+        def indexar():
+            try:
+                obtener_biblioteca().actualizar(directorio)
+            finally:
+                bus_progreso.en_ui(al_terminar)
+        threading.Thread(target=indexar, daemon=True).start()
+
+    boton_actualizar = tk.Button(pie, text="Actualizar índice", command=actualizar_indice)
+    boton_actualizar.pack(side="right")
+
+    var_busqueda.trace_add("write", programar_busqueda)
+    entrada_busqueda.focus_set()
+    mostrar_total()
+    buscar()
 
 # =========================
 # Ventana de Configuración
@@ -279,7 +501,7 @@ def mostrar_configuracion():
     """Diálogo profesional de configuración"""
     ventana_config = tk.Toplevel(ventana)
     ventana_config.title("Configuración")
-    ventana_config.geometry("500x400")
+    ventana_config.geometry("520x640")
     ventana_config.resizable(False, False)
     ventana_config.configure(bg=COLORES['fondo'])
     
@@ -309,9 +531,55 @@ def mostrar_configuracion():
     # Descargas Paralelas
     tk.Label(contenido, text="Descargas Paralelas:", bg=COLORES['fondo'], 
              fg=COLORES['texto'], font=("Helvetica", 10)).grid(row=2, column=0, sticky="w", pady=5)
-    spinner_paralelas = tk.Spinbox(contenido, from_=1, to=4, textvariable=var_paralelas, width=5)
+    spinner_paralelas = tk.Spinbox(contenido, from_=1, to=32, textvariable=var_paralelas, width=5)
     spinner_paralelas.grid(row=2, column=1, sticky="w", padx=10, pady=5)
     
+    # Límite global de ancho de banda
+    tk.Label(contenido, text="Límite de Ancho de Banda (KiB/s, 0 = sin límite):", bg=COLORES['fondo'], 
+             fg=COLORES['texto'], font=("Helvetica", 10)).grid(row=3, column=0, sticky="w", pady=5)
+    spinner_limite = tk.Spinbox(contenido, from_=0, to=1000000, increment=256, textvariable=var_limite, width=8)
+    spinner_limite.grid(row=3, column=1, sticky="w", padx=10, pady=5)
+    
+    # Conexiones por Host
+    tk.Label(contenido, text="Conexiones por Servidor:", bg=COLORES['fondo'], 
+             fg=COLORES['texto'], font=("Helvetica", 10)).grid(row=4, column=0, sticky="w", pady=5)
+    spinner_conexiones = tk.Spinbox(contenido, from_=1, to=64, textvariable=var_conexiones, width=5)
+    spinner_conexiones.grid(row=4, column=1, sticky="w", padx=10, pady=5)
+    
+    # Normalización de volumen
+    tk.Label(contenido, text="Normalizar volumen:", bg=COLORES['fondo'],
+             fg=COLORES['texto'], font=("Helvetica", 10)).grid(row=5, column=0, sticky="w", pady=5)
+    menu_normalizacion = ttk.Combobox(contenido, values=["no", "etiquetas", "aplicar"],
+                                      textvariable=var_normalizacion, width=10, state="readonly")
+    menu_normalizacion.grid(row=5, column=1, sticky="w", padx=10, pady=5)
+
+    # Expandir listas y canales
+    check_expandir = tk.Checkbutton(
+        contenido, text="Descargar listas y canales completos", variable=var_expandir,
+        bg=COLORES['fondo'], fg=COLORES['texto'], selectcolor=COLORES['fondo'],
+        activebackground=COLORES['fondo'], activeforeground=COLORES['texto'],
+        font=("Helvetica", 10)
+    )
+    check_expandir.grid(row=6, column=0, columnspan=2, sticky="w", pady=5)
+
+    # Portada del video incrustada en el MP3
+    check_portadas = tk.Checkbutton(
+        contenido, text="Incrustar portada en los MP3", variable=var_portadas,
+        bg=COLORES['fondo'], fg=COLORES['texto'], selectcolor=COLORES['fondo'],
+        activebackground=COLORES['fondo'], activeforeground=COLORES['texto'],
+        font=("Helvetica", 10)
+    )
+    check_portadas.grid(row=7, column=0, columnspan=2, sticky="w", pady=5)
+
+    # Orden de descarga por duración
+    check_mas_cortas = tk.Checkbutton(
+        contenido, text="Descargar primero las pistas más cortas", variable=var_mas_cortas,
+        bg=COLORES['fondo'], fg=COLORES['texto'], selectcolor=COLORES['fondo'],
+        activebackground=COLORES['fondo'], activeforeground=COLORES['texto'],
+        font=("Helvetica", 10)
+    )
+    check_mas_cortas.grid(row=8, column=0, columnspan=2, sticky="w", pady=5)
+
     # Modo Oscuro
     check_modo_oscuro = tk.Checkbutton(
         contenido, text="Activar Modo Oscuro", variable=var_modo_oscuro,
@@ -319,11 +587,11 @@ def mostrar_configuracion():
         activebackground=COLORES['fondo'], activeforeground=COLORES['texto'],
         font=("Helvetica", 10), command=cambiar_modo_oscuro
     )
-    check_modo_oscuro.grid(row=3, column=0, columnspan=2, sticky="w", pady=10)
+    check_modo_oscuro.grid(row=9, column=0, columnspan=2, sticky="w", pady=10)
     
     # Botón Guardar
     marco_guardar = tk.Frame(contenido, bg=COLORES['fondo'])
-    marco_guardar.grid(row=4, column=0, columnspan=2, pady=20)
+    marco_guardar.grid(row=10, column=0, columnspan=2, pady=20)
     tk.Button(
         marco_guardar, text="Guardar Configuración", command=lambda: guardar_config_y_cerrar(ventana_config),
         bg=COLORES['primario'], fg="white", activebackground=COLORES['primario_oscuro'],
@@ -336,6 +604,12 @@ def guardar_config_y_cerrar(ventana_config):
         'calidad_audio': var_calidad.get(),
         'intentos_maximos': var_intentos.get(),
         'descargas_paralelas': var_paralelas.get(),
+        'expandir_listas': var_expandir.get(),
+        'portadas': var_portadas.get(),
+        'mas_cortas_primero': var_mas_cortas.get(),
+        'normalizacion': var_normalizacion.get(),
+        'limite_kib_s': var_limite.get(),
+        'conexiones_por_host': var_conexiones.get(),
         'modo_oscuro': var_modo_oscuro.get()
     })
     guardar_configuracion(config)
@@ -375,6 +649,7 @@ def aplicar_tema():
     etiqueta_url.configure(fg=COLORES['texto'])
     etiqueta_carpeta.configure(fg=COLORES['texto'])
     etiqueta_estado.configure(fg=COLORES['texto'])
+    etiqueta_rendimiento.configure(fg=COLORES['texto'])
     
     entrada_url.configure(
         bg=COLORES['tarjeta'], fg=COLORES['texto'],
@@ -417,7 +692,9 @@ def mostrar_acerca_de():
     contenido.pack(fill="both", expand=True)
     
     # Logo y versión
-    logo_pequeno = ImageTk.PhotoImage(imagen_logo.resize((64,64), Image.LANCZOS))
+    if not os.path.exists(ruta_logo_pequeno):
+        crear_logo_pro()
+    logo_pequeno = tk.PhotoImage(file=ruta_logo_pequeno)
     etiqueta_logo = tk.Label(contenido, image=logo_pequeno, bg=COLORES['fondo'])
     etiqueta_logo.image = logo_pequeno
     etiqueta_logo.pack(pady=10)
@@ -444,22 +721,21 @@ def mostrar_acerca_de():
 # =========================
 # Inicializar configuración
 config = cargar_configuracion()
+configurar_registro(config)
+bus_progreso = BusProgreso()
+filas_terminadas = collections.OrderedDict()  # iid -> None, en el orden en que terminaron
+ultimo_lote = {"fallidos": [], "informe": ""}  # solo se toca desde el hilo de Tk
+# 'pool' lo fija el hilo de descarga con el primer trabajo; lo demás, el hilo de Tk
+lote_en_curso = {"activo": False, "pool": None, "directorio": None}
 
 # Crear ventana principal
 ventana = tk.Tk()
 ventana.title(f"{NOMBRE_APP} v{VERSION}")
-ventana.geometry("720x520")
+ventana.geometry("720x680")
 ventana.minsize(600, 450)
 
-# Crear logo profesional
-ruta_logo_png, ruta_logo_ico = crear_logo_pro()
-try:
-    ventana.iconbitmap(ruta_logo_ico)
-except:
-    pass
-
-# Cargar imagen del logo
-imagen_logo = Image.open(ruta_logo_png)
+# El logo se genera o carga después del primer cuadro (ver al_mostrar_ventana)
+ruta_logo_pequeno = f"logo_pro_v{VERSION_LOGO}_64.png"
 
 # Crear estilo
 estilo = ttk.Style()
@@ -471,6 +747,12 @@ var_calidad = tk.StringVar(value=config['calidad_audio'])
 var_intentos = tk.IntVar(value=config['intentos_maximos'])
 var_paralelas = tk.IntVar(value=config['descargas_paralelas'])
 var_modo_oscuro = tk.BooleanVar(value=config['modo_oscuro'])
+var_expandir = tk.BooleanVar(value=config['expandir_listas'])
+var_portadas = tk.BooleanVar(value=config['portadas'])
+var_mas_cortas = tk.BooleanVar(value=config['mas_cortas_primero'])
+var_normalizacion = tk.StringVar(value=config['normalizacion'])
+var_limite = tk.IntVar(value=config['limite_kib_s'])
+var_conexiones = tk.IntVar(value=config['conexiones_por_host'])
 
 # Encabezado
 marco_encabezado = tk.Frame(ventana, bg=COLORES['primario'], height=80)
@@ -492,6 +774,8 @@ ventana.config(menu=barra_menu)
 # Menú Archivo
 menu_archivo = tk.Menu(barra_menu, tearoff=0)
 barra_menu.add_cascade(label="Archivo", menu=menu_archivo)
+menu_archivo.add_command(label="Importar lista de URLs...", command=elegir_lista)
+menu_archivo.add_command(label="Biblioteca...", command=mostrar_biblioteca)
 menu_archivo.add_command(label="Configuración...", command=mostrar_configuracion)
 menu_archivo.add_separator()
 menu_archivo.add_command(label="Salir", command=ventana.quit)
@@ -578,11 +862,58 @@ etiqueta_estado = tk.Label(
     bg=COLORES['tarjeta'],
     fg=COLORES['texto']
 )
-etiqueta_estado.grid(row=5, column=0, columnspan=2, pady=(0, 20), sticky="w")
+etiqueta_estado.grid(row=5, column=0, pady=(0, 10), sticky="w")
 
-# Botón de Descarga
-boton_descargar = tk.Button(
+# Rendimiento agregado de todas las descargas
+etiqueta_rendimiento = tk.Label(
     marco_tarjeta,
+    text="",
+    font=("Helvetica", 10),
+    bg=COLORES['tarjeta'],
+    fg=COLORES['texto']
+)
+etiqueta_rendimiento.grid(row=5, column=1, pady=(0, 10), sticky="e")
+
+# Lista de trabajos del lote
+marco_lista = tk.Frame(marco_tarjeta, bg=COLORES['tarjeta'])
+marco_lista.grid(row=6, column=0, columnspan=2, sticky="nsew")
+lista_trabajos = ttk.Treeview(
+    marco_lista,
+    columns=("titulo", "estado", "progreso"),
+    show="headings",
+    height=8
+)
+lista_trabajos.heading("titulo", text="Título")
+lista_trabajos.heading("estado", text="Estado")
+lista_trabajos.heading("progreso", text="Progreso")
+lista_trabajos.column("titulo", width=380)
+lista_trabajos.column("estado", width=130)
+lista_trabajos.column("progreso", width=70, anchor="e")
+barra_lista = ttk.Scrollbar(marco_lista, orient="vertical", command=lista_trabajos.yview)
+lista_trabajos.configure(yscrollcommand=barra_lista.set)
+lista_trabajos.pack(side="left", fill="both", expand=True)
+barra_lista.pack(side="right", fill="y")
+marco_tarjeta.grid_rowconfigure(6, weight=1)
+marco_tarjeta.grid_columnconfigure(0, weight=1)
+
+# Control de los trabajos seleccionados mientras el lote corre
+marco_controles = tk.Frame(marco_tarjeta, bg=COLORES['tarjeta'])
+marco_controles.grid(row=7, column=0, columnspan=2, sticky="w", pady=(5, 0))
+for texto_boton, comando in (
+    ("⏸ Pausar", lambda: controlar_seleccion("pausar")),
+    ("▶ Reanudar", lambda: controlar_seleccion("reanudar")),
+    ("✕ Cancelar", lambda: controlar_seleccion("cancelar")),
+    ("⇧ Descargar a continuación", descargar_a_continuacion),
+):
+    tk.Button(marco_controles, text=texto_boton, command=comando, font=("Helvetica", 9), relief="flat",
+              padx=8).pack(side="left", padx=(0, 5))
+
+# Botones de acción
+marco_acciones = tk.Frame(marco_tarjeta, bg=COLORES['tarjeta'])
+marco_acciones.grid(row=8, column=0, columnspan=2, pady=(10, 0))
+
+boton_descargar = tk.Button(
+    marco_acciones,
     text="DESCARGAR MÚSICA",
     command=descargar_urls,
     bg=COLORES['primario'],
@@ -593,7 +924,31 @@ boton_descargar = tk.Button(
     padx=20,
     pady=10
 )
-boton_descargar.grid(row=6, column=0, columnspan=2, pady=(10, 0))
+boton_descargar.pack(side="left")
+
+# Los errores no interrumpen el lote: se revisan y reintentan al final
+boton_reintentar = tk.Button(
+    marco_acciones,
+    text="Reintentar fallidas (0)",
+    command=reintentar_fallidas,
+    state="disabled",
+    font=("Helvetica", 10),
+    relief="flat",
+    padx=10,
+    pady=10
+)
+boton_reintentar.pack(side="left", padx=(10, 0))
+
+boton_informe = tk.Button(
+    marco_acciones,
+    text="Ver informe",
+    command=mostrar_informe,
+    font=("Helvetica", 10),
+    relief="flat",
+    padx=10,
+    pady=10
+)
+boton_informe.pack(side="left", padx=(10, 0))
 
 # Pie de página
 marco_pie = tk.Frame(ventana, bg=COLORES['fondo'], height=30)
@@ -611,5 +966,11 @@ etiqueta_pie.pack()
 # Aplicar tema inicial
 aplicar_tema()
 
+# Refrescar el progreso publicado por los trabajadores
+ventana.after(INTERVALO_UI_MS, drenar_bus_progreso)
+
+# Ícono, yt_dlp y reanudación se difieren hasta que la ventana está en pantalla
+ventana.bind("<Map>", al_mostrar_ventana)
+
 # Iniciar bucle principal
 ventana.mainloop()
\ No newline at end of file
@@ -0,0 +1,214 @@
+"""Trabajador que descarga desde una cola compartida por varios procesos o equipos.
+
+Uso:
+    python trabajador.py --encolar lista.txt [-d carpeta] [-c 320]
+    python trabajador.py [--id nombre] [--continuo]
+    python trabajador.py --estado
+
+Todos los trabajadores apuntan al mismo archivo de cola (--cola o
+cola_compartida en config_descargador.json; en varios equipos, una carpeta
+de red común). Cada uno toma URLs con una concesión que renueva mientras
+descarga: si un proceso muere, sus URLs vuelven a la cola cuando la
+concesión vence. Cada trabajador usa su propia configuración y descarga
+con los mismos lotes que la aplicación.
+
+Para probar en un solo equipo basta con lanzar varios procesos:
+    python trabajador.py --encolar lista.txt
+    for i in 1 2 3; do python trabajador.py --id t$i & done
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import threading
+from collections import defaultdict, deque
+
+from cola_compartida import ColaCompartida
+from descargador import (
+    ARCHIVO_CONFIG, cargar_configuracion, combinar_resumenes, configurar_registro, construir_opciones_ydl,
+    ejecutar_lote, expandir_listas, registro, texto_resumen
+)
+from importacion import ImportadorUrls, en_bloques, texto_importacion
+
+def ruta_cola(argumentos, config):
+    return (argumentos.cola or config['cola_compartida']
+            or os.path.join(os.path.dirname(ARCHIVO_CONFIG), "cola_compartida.sqlite"))
+
+def encolar(cola, lineas, directorio, config, calidad=None):
+    """Normaliza, expande las listas y encola las URLs; devuelve (informe de importación, encoladas)
+
+    Las listas se expanden aquí y no en el trabajador, para que sus entradas
+    se repartan entre todos los trabajadores.
+    """
+    importador = ImportadorUrls()
+    urls = importador.urls(lineas)
+    encoladas = 0
+    ydl_plano = None
+    if config['expandir_listas']:
+        import yt_dlp
+
+        ydl_plano = yt_dlp.YoutubeDL(
+            dict(construir_opciones_ydl(config, directorio, calidad), extract_flat='in_playlist', noplaylist=False)
+        )
+        urls = expandir_listas(urls, ydl_plano)
+    try:
+        for bloque in en_bloques(urls, config['bloque_importacion']):
+            encoladas += cola.encolar(bloque, directorio, calidad or config['calidad_audio'])
+    finally:
+        if ydl_plano is not None:
+            ydl_plano.close()
+    return importador.informe(), encoladas
+
+class Trabajador:
+    """Toma trabajos de la cola y los descarga en lotes agrupados por destino
+
+    Un lote se alimenta de la cola mientras haya trabajos con su mismo
+    directorio y calidad; el pool solo pide una URL cuando tiene sitio, así
+    que cada trabajador tiene tomadas pocas URLs a la vez. Un hilo de latido
+    renueva sus concesiones cada tercio de la duración.
+    """
+    def __init__(self, cola, config, nombre, concesion):
+        self.cola = cola
+        self.config = config
+        self.nombre = nombre
+        self.concesion = concesion
+        self.detener = threading.Event()
+        self._bloqueo = threading.Lock()
+        self._activos = set()
+        self._por_url = defaultdict(deque)
+        self.resumenes = []
+
+    def _latir(self):
+        while not self.detener.wait(self.concesion / 3):
+            with self._bloqueo:
+                ids = list(self._activos)
+            if not ids:
+                continue
+            try:
+                vigentes = self.cola.renovar(self.nombre, ids, self.concesion)
+            except Exception as e:
+                registro.warning("No se pudieron renovar las concesiones: %s", e)
+                continue
+            if vigentes < len(ids):
+                registro.warning("%d trabajos perdieron la concesión y los tomó otro trabajador", len(ids) - vigentes)
+
+    def _generar(self, primero, grupo):
+        # Corre en el hilo productor del pool: toma el siguiente solo cuando hay sitio
+        trabajo = primero
+        while trabajo is not None:
+            id_trabajo, url = trabajo[0], trabajo[1]
+            with self._bloqueo:
+                self._activos.add(id_trabajo)
+                self._por_url[url].append(id_trabajo)
+            yield url
+            if self.detener.is_set():
+                return
+            trabajo = self.cola.tomar(self.nombre, self.concesion, grupo)
+
+    def _al_cambiar(self, trabajo, pool):
+        if trabajo.estado not in ("completado", "error"):
+            return
+        with self._bloqueo:
+            ids = self._por_url.get(trabajo.url)
+            if not ids:
+                return
+            id_trabajo = ids.popleft()
+            if not ids:
+                del self._por_url[trabajo.url]
+            self._activos.discard(id_trabajo)
+        error = f"{trabajo.tipo_error}: {trabajo.error}" if trabajo.estado == "error" else None
+        if not self.cola.terminar(id_trabajo, self.nombre, trabajo.estado, error):
+            registro.warning("El trabajo %d (%s) terminó después de perder su concesión", id_trabajo, trabajo.url)
+        print(f"[{self.nombre}] {'✓' if trabajo.estado == 'completado' else '⚠'} {trabajo.titulo or trabajo.url}")
+
+    def ejecutar(self, continuo=False, espera=5):
+        """Procesa la cola hasta vaciarla (o hasta detener, con continuo=True)"""
+        latido = threading.Thread(target=self._latir, daemon=True)
+        latido.start()
+        try:
+            while not self.detener.is_set():
+                primero = self.cola.tomar(self.nombre, self.concesion)
+                if primero is None:
+                    if not continuo:
+                        break
+                    self.detener.wait(espera)
+                    continue
+                _, _, directorio, calidad = primero
+                self.resumenes.append(ejecutar_lote(
+                    self._generar(primero, (directorio, calidad)), directorio, self.config, calidad,
+                    self._al_cambiar
+                ))
+                # Lo que el lote no convirtió en trabajo ya estaba descargado o repetido
+                with self._bloqueo:
+                    omitidos = [id_trabajo for ids in self._por_url.values() for id_trabajo in ids]
+                    self._por_url.clear()
+                    self._activos.clear()
+                for id_trabajo in omitidos:
+                    self.cola.terminar(id_trabajo, self.nombre, "omitido")
+        finally:
+            self.detener.set()
+            # Al salir antes de tiempo, lo tomado vuelve a la cola sin esperar a que venza
+            liberados = self.cola.liberar(self.nombre)
+            if liberados:
+                registro.warning("%d trabajos devueltos a la cola", liberados)
+        return self.resumenes
+
+def crear_parser():
+    parser = argparse.ArgumentParser(description="Trabajador de la cola de descargas compartida")
+    parser.add_argument("--cola", help="archivo SQLite de la cola (por defecto cola_compartida de la configuración)")
+    parser.add_argument("--id", help="nombre del trabajador (por defecto equipo:pid)")
+    parser.add_argument("-p", "--paralelas", type=int, help="descargas simultáneas de este trabajador")
+    parser.add_argument("--concesion", type=float, help="segundos que dura una concesión sin latido")
+    parser.add_argument("--continuo", action="store_true", help="esperar trabajos nuevos en lugar de salir con la cola vacía")
+    parser.add_argument("--encolar", metavar="ARCHIVO", help="encolar las URLs del archivo ('-' para stdin) y salir")
+    parser.add_argument("-d", "--directorio", help="carpeta de destino de las URLs encoladas")
+    parser.add_argument("-c", "--calidad", help="calidad MP3 de las URLs encoladas")
+    parser.add_argument("--estado", action="store_true", help="mostrar cuántos trabajos hay en cada estado y salir")
+    parser.add_argument("-v", "--detallado", action="store_true", help="mostrar los mensajes informativos de yt-dlp")
+    return parser
+
+def main(argv=None):
+    argumentos = crear_parser().parse_args(argv)
+    config = cargar_configuracion()
+    if argumentos.paralelas:
+        config['descargas_paralelas'] = argumentos.paralelas
+    if argumentos.detallado:
+        config['nivel_registro'] = "INFO"
+    configurar_registro(config)
+    cola = ColaCompartida(ruta_cola(argumentos, config))
+
+    try:
+        if argumentos.estado:
+            for estado, cantidad in sorted(cola.estadisticas().items()):
+                print(f"{estado}: {cantidad}")
+            return 0
+
+        if argumentos.encolar:
+            flujo = sys.stdin if argumentos.encolar == "-" else open(argumentos.encolar, encoding="utf-8")
+            with flujo:
+                informe, encoladas = encolar(
+                    cola, flujo, argumentos.directorio or config['directorio_descargas'], config, argumentos.calidad
+                )
+            print(texto_importacion(informe), file=sys.stderr)
+            print(f"{encoladas} URLs encoladas en {cola.ruta}")
+            return 0 if encoladas or informe['validas'] else 2
+
+        # La cola solo tiene videos sueltos: las listas se expandieron al encolar
+        config['expandir_listas'] = False
+        nombre = argumentos.id or f"{socket.gethostname()}:{os.getpid()}"
+        trabajador = Trabajador(cola, config, nombre, argumentos.concesion or config['concesion_cola_segundos'])
+        # SIGTERM termina los lotes en curso sin tomar más; Ctrl+C devuelve lo tomado y sale ya
+        signal.signal(signal.SIGTERM, lambda *_: trabajador.detener.set())
+        try:
+            resumenes = trabajador.ejecutar(argumentos.continuo)
+        except KeyboardInterrupt:
+            return 130
+        if resumenes:
+            print(texto_resumen(combinar_resumenes(resumenes)))
+        return 1 if any(resumen['errores'] for resumen in resumenes) else 0
+    finally:
+        cola.cerrar()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+def transcodificar_a_mp3(ruta_entrada, calidad, filtro=None, metadatos=None):
+    """Convierte un archivo de audio a MP3 con ffmpeg y borra el original
+
+    Equivale a FFmpegExtractAudio con preferredcodec 'mp3': si la entrada ya
+    es MP3 se deja tal cual, salvo que haya un filtro de audio (se recodifica)
+    o metadatos que añadir (se copia el audio). Devuelve la ruta del MP3
+    resultante.
+    """
+    base, extension = os.path.splitext(ruta_entrada)
+    ya_es_mp3 = extension.lower() == ".mp3"
+    if ya_es_mp3 and not filtro and not metadatos:
+        return ruta_entrada
+    salida = base + ".mp3"
+    temporal = base + ".temp.mp3"
+    comando = ["ffmpeg", "-y", "-loglevel", "error", "-i", ruta_entrada, "-vn"]
+    if filtro:
+        comando += ["-af", filtro]
+    if ya_es_mp3 and not filtro:
+        comando += ["-codec:a", "copy"]
+    else:
+        comando += ["-codec:a", "libmp3lame", "-b:a", f"{calidad}k"]
+    for clave, valor in (metadatos or {}).items():
+        comando += ["-metadata", f"{clave}={valor}"]
+    proceso = subprocess.run(comando + [temporal], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if proceso.returncode != 0:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        detalle = proceso.stderr.decode("utf-8", "replace").strip().splitlines()
+        raise RuntimeError(f"ffmpeg falló: {detalle[-1] if detalle else proceso.returncode}")
+    os.replace(temporal, salida)
+    if not ya_es_mp3:
+        os.remove(ruta_entrada)
+    return salida
+
+class EtapaTranscodificacion:
+    """Etapa de CPU del pipeline: convierte a MP3 fuera de los hilos de descarga
+
+    Cada hueco lanza un proceso ffmpeg, así que el trabajo de CPU ya corre en
+    procesos aparte y basta un hilo por hueco para vigilarlo. La entrega está
+    acotada: si hay `capacidad` archivos esperando o en curso, enviar()
+    bloquea al hilo de descarga hasta que se libere sitio.
+
+    convertir(ruta, calidad) hace la conversión de cada archivo; por defecto
+    transcodificar_a_mp3, o normalizacion.normalizar_a_mp3 para medir y
+    ajustar el volumen en la misma pasada.
+    """
+    def __init__(self, procesos=None, capacidad=None, convertir=transcodificar_a_mp3):
+        self.convertir = convertir
+        self.procesos = procesos or os.cpu_count() or 1
+        self._ejecutor = ThreadPoolExecutor(max_workers=self.procesos, thread_name_prefix="transcodificacion")
+        self._cupos = threading.BoundedSemaphore(capacidad or self.procesos * 2)
+        self._bloqueo = threading.Lock()
+        self.archivos = 0
+        self.segundos = 0.0
+
+    def enviar(self, ruta, calidad, despues=None):
+        """Encola ruta para transcodificar; devuelve un Future con la ruta final
+
+        despues(ruta_mp3) se ejecuta antes de completar el Future, de modo
+        que quien espere el resultado ya ve sus efectos (p. ej. el historial).
+        """
+        self._cupos.acquire()
+        futuro = Future()
+
+        def tarea():
+            inicio = time.monotonic()
+            try:
+                salida = self.convertir(ruta, calidad)
+                with self._bloqueo:
+                    self.archivos += 1
+                    self.segundos += time.monotonic() - inicio
+                if despues:
+                    despues(salida)
+                futuro.set_result(salida)
+            except Exception as e:
+                futuro.set_exception(e)
+            finally:
+                self._cupos.release()
+
+        try:
+            self._ejecutor.submit(tarea)
+        except Exception:
+            self._cupos.release()
+            raise
+        return futuro
+
+    def cerrar(self):
+        """Espera a que terminen las transcodificaciones en curso"""
+        self._ejecutor.shutdown(wait=True)
@@ -0,0 +1,87 @@
+import re
+from urllib.parse import parse_qs, parse_qsl, urlencode, urlparse
+
+# Identificadores de YouTube: 11 caracteres del alfabeto base64 para URLs
+PATRON_ID_YOUTUBE = re.compile(r'^[0-9A-Za-z_-]{11}$')
+
+DOMINIOS_YOUTUBE = {
+    "youtube.com", "www.youtube.com", "m.youtube.com",
+    "music.youtube.com", "youtube-nocookie.com", "www.youtube-nocookie.com",
+}
+
+# Parámetros que solo sirven para rastrear de dónde vino el clic
+PARAMETROS_RASTREO = {"si", "feature", "pp", "fbclid", "gclid", "igshid", "ref", "ref_src", "app"}
+
+def extraer_id_video(url):
+    """Devuelve el id de un video de YouTube sin tocar la red, o None"""
+    try:
+        partes = urlparse(url.strip() if "://" in url else "https://" + url.strip())
+    except ValueError:
+        return None
+    dominio = (partes.hostname or "").lower()
+
+    candidato = None
+    if dominio == "youtu.be":
+        candidato = partes.path.lstrip("/").split("/")[0]
+    elif dominio in DOMINIOS_YOUTUBE:
+        if partes.path == "/watch":
+            candidato = (parse_qs(partes.query).get("v") or [None])[0]
+        else:
+            segmentos = [s for s in partes.path.split("/") if s]
+            if len(segmentos) >= 2 and segmentos[0] in ("shorts", "embed", "v", "live"):
+                candidato = segmentos[1]
+
+    if candidato and PATRON_ID_YOUTUBE.match(candidato):
+        return candidato
+    return None
+
+def url_canonica(url):
+    """Forma única de una URL: watch?v=<id> para videos de YouTube, sin rastreo para el resto
+
+    youtu.be, music., shorts/ y los parámetros de rastreo colapsan en la
+    misma URL. Devuelve None si no es una URL http(s) utilizable.
+    """
+    id_video = extraer_id_video(url)
+    if id_video:
+        return f"https://www.youtube.com/watch?v={id_video}"
+    try:
+        partes = urlparse(url.strip() if "://" in url else "https://" + url.strip())
+    except ValueError:
+        return None
+    if partes.scheme not in ("http", "https") or not partes.hostname or "." not in partes.hostname:
+        return None
+    consulta = [
+        (clave, valor) for clave, valor in parse_qsl(partes.query, keep_blank_values=True)
+        if clave.lower() not in PARAMETROS_RASTREO and not clave.lower().startswith("utm_")
+    ]
+    return partes._replace(query=urlencode(consulta), fragment="").geturl()
+
+def clave_canonica(url, info=None):
+    """Clave estable para una URL: 'youtube:<id>' o la URL limpia si no se reconoce
+
+    Si se pasa el info de yt-dlp ya extraído se usa '<extractor>:<id>', que
+    coincide con la forma de YouTube y cubre los demás sitios.
+    """
+    if info and info.get('id') and info.get('extractor_key'):
+        return f"{info['extractor_key'].lower()}:{info['id']}"
+    id_video = extraer_id_video(url)
+    if id_video:
+        return f"youtube:{id_video}"
+    return url.strip()
+
+def es_url_de_lista(url):
+    """True si la URL es una lista o un canal de YouTube (y no un video concreto)"""
+    if extraer_id_video(url):
+        return False
+    try:
+        partes = urlparse(url.strip() if "://" in url else "https://" + url.strip())
+    except ValueError:
+        return False
+    if (partes.hostname or "").lower() not in DOMINIOS_YOUTUBE:
+        return False
+    segmentos = [s for s in partes.path.split("/") if s]
+    if parse_qs(partes.query).get("list"):
+        return True
+    return bool(segmentos) and (
+        segmentos[0] in ("playlist", "channel", "c", "user") or segmentos[0].startswith("@")
+    )